@@ -2,17 +2,172 @@
 
 # Preconfigured for Raspberry Pi
 # For Orange Pi, change:
-# - import OPi.GPIO (pip install OrangePi.GPIO)
+# - import OPi.GPIO in RFM69backend.HardwareBackend (pip install OrangePi.GPIO)
 # - spiBus = 1
 # - uncomment GPIO.setboard() call and set correct board type
+#
+# SPI and GPIO go through a backend (RFM69backend): spidev/RPi.GPIO on the Pi, or the
+# simulated chips in RFM69sim.
 
 from RFM69registers import *
-import spidev
-import RPi.GPIO as GPIO
+from RFM69profiles import FSTEP
+import RFM69backend
+import collections
+import random
+import threading
 import time
 
+# Writable configuration registers held in the optional shadow copy, mapped to the
+# bits that persist on readback (trigger bits such as ListenAbort and RxRestart read as 0,
+# LNA's LnaCurrentGain follows the AGC).
+# Status/volatile registers (FIFO, IRQ flags, RSSI, AFC/FEI, temperature, OSC1) are excluded.
+SHADOW_REGS = {}
+for _reg in list(range(REG_DATAMODUL, REG_OSC1)) + list(range(REG_AFCCTRL, REG_VERSION)) + \
+            list(range(REG_PALEVEL, REG_AFCFEI)) + [REG_DIOMAPPING1, REG_DIOMAPPING2] + \
+            list(range(REG_RSSITHRESH, REG_PACKETCONFIG2)) + [REG_TESTPA1, REG_TESTPA2, REG_TESTDAGC]:
+    SHADOW_REGS[_reg] = 0xFF
+del _reg
+SHADOW_REGS.update({REG_OPMODE: 0xDF, REG_LNA: 0xC7, REG_PACKETCONFIG2: 0xFB})
+
+# Burst-read commands for the FIFO, indexed by the number of bytes to read
+FIFO_READ_CMDS = [[REG_FIFO & 0x7F] + [0] * n for n in range(67)]
+
+# Per-frame telemetry comes from one burst over AFCMSB..IRQFLAGS2: AFC and FEI, RSSI
+# (frozen by the chip from sync address match until the receiver restarts), the DIO
+# mapping and both IRQ flag registers, so the RX path's flag check costs nothing extra
+TELEMETRY_READ_CMD = [REG_AFCMSB & 0x7F] + [0] * (REG_IRQFLAGS2 - REG_AFCMSB + 1)
+
+# FIFO thresholds used in long-packet mode; FifoLevel is set while more than the threshold
+# is queued. In RX the handler takes LONG_RX_FIFO_THRESHOLD bytes each time it sees
+# FifoLevel, so the rest of the FIFO is slack before an overrun; in TX it tops the FIFO up
+# once FifoLevel clears, leaving LONG_TX_FIFO_THRESHOLD bytes on air before an underrun.
+LONG_RX_FIFO_THRESHOLD = 16
+LONG_TX_FIFO_THRESHOLD = 48
+LONG_SLACK_BYTES = min(LONG_TX_FIFO_THRESHOLD, RF69_FIFO_SIZE - LONG_RX_FIFO_THRESHOLD - 1)
+# Longest the host may go without servicing the FIFO, scheduling stalls included, that
+# setLongPackets() plans for: LONG_SLACK_BYTES of air must outlast it, which on a stock
+# Linux host running Python holds up to about 19.2 kbps
+LONG_HOST_LATENCY_S = 0.02
+
+# What interruptHandler does when the RX queue is full
+RX_OVERFLOW_DROP_OLDEST = "drop_oldest"
+RX_OVERFLOW_DROP_NEWEST = "drop_newest"
+
+# Reset pulse (the SX1231 needs at least 100 us) and how long startRadios() waits for a
+# chip to come back afterwards; it is normally ready about 5 ms after the pulse
+RESET_PULSE_S = 0.0001
+RESET_TIMEOUT_S = 0.1
+
+# Listen-before-talk: a backoff slot covers CSMA_SLOT_BITS bit times (time for another
+# node's preamble to show up in RSSI) plus the host's RX->TX turnaround; the contention
+# window is 2^BE slots with BE running from CSMA_MIN_BE to CSMA_MAX_BE. calibrateCsma()
+# sets the clear-channel threshold CSMA_NOISE_MARGIN dB above the measured noise floor.
+CSMA_SLOT_BITS = 32
+CSMA_TURNAROUND_S = 0.0002
+CSMA_MIN_BE = 2
+CSMA_MAX_BE = 6
+CSMA_NOISE_MARGIN = 10
+
+# sendReliable(): the low bits of the CTL byte carry a sequence number (1..CTL_SEQ_MASK,
+# 0 for frames sent without one) that the ACK echoes back. The retransmission timeout
+# starts at RTO_INITIAL_S and follows the measured RTT within RTO_MIN_S..RTO_MAX_S; the
+# floor covers Linux scheduling jitter on either host, which an RTT of a few ms hides.
+CTL_SEQ_MASK = 0x1F
+RTO_INITIAL_S = 0.1
+RTO_MIN_S = 0.02
+RTO_MAX_S = 2.0
+RTT_SAMPLES = 256
+
+# Bytes on air for an empty ACK at the CONFIG defaults: 3 preamble, 2 sync, length,
+# target, sender, CTL and 2 CRC
+ACK_FRAME_BYTES = 11
+
+class InitTimeoutError(Exception):
+    pass
+
+# A received frame as queued by interruptHandler and returned by RFM69.receive()
+class Frame(object):
+    __slots__ = ("data", "senderID", "targetID", "ctl", "rssi", "timestamp", "band", "fei", "afc")
+
+    def __init__(self, data, senderID, targetID, ctl, rssi, timestamp, band = None, fei = 0.0, afc = 0.0):
+        self.data = data
+        self.senderID = senderID
+        self.targetID = targetID
+        self.ctl = ctl
+        self.rssi = rssi  # dBm, as latched at sync address match
+        self.timestamp = timestamp  # time.monotonic() on entry to the interrupt that drained the frame
+        self.band = band  # freqBand of the radio that received it
+        # frequency error the FEI last measured and the correction AFC applied, in Hz
+        # (AFC only runs with AfcAutoOn set in REG_AFCFEI)
+        self.fei = fei
+        self.afc = afc
+
+    @property
+    def ackReceived(self):
+        return bool(self.ctl & 0x80)
+
+    @property
+    def ackRequested(self):
+        return bool(self.ctl & 0x40) and self.targetID != RF69_BROADCAST_ADDR
+
+    @property
+    def seq(self):
+        return self.ctl & CTL_SEQ_MASK
+
+    def __repr__(self):
+        return "Frame(sender=%d, target=%d, ctl=0x%02x, rssi=%d, len=%d)" % (
+            self.senderID, self.targetID, self.ctl, self.rssi, len(self.data))
+
+# sendReliable() state for one peer: the next sequence number, the RTT estimator of
+# RFC 6298 and the counters behind RFM69.peerStats()
+class PeerLink(object):
+    def __init__(self):
+        self.seq = 0
+        self.srtt = None
+        self.rttvar = None
+        self.rto = RTO_INITIAL_S
+        self.rtts = collections.deque(maxlen = RTT_SAMPLES)
+        self.sent = 0
+        self.acked = 0
+        self.retries = 0
+        self.failures = 0
+        self.staleAcks = 0
+
+    def nextSeq(self):
+        self.seq = self.seq % CTL_SEQ_MASK + 1
+        return self.seq
+
+    def sample(self, rtt):
+        self.rtts.append(rtt)
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.restore()
+
+    # back to the estimate once an exchange completes, undoing backoff()
+    def restore(self):
+        if self.srtt is not None:
+            self.rto = min(RTO_MAX_S, max(RTO_MIN_S, self.srtt + 4 * self.rttvar))
+
+    # no ACK within the RTO: wait twice as long for the retransmission
+    def backoff(self):
+        self.rto = min(RTO_MAX_S, self.rto * 2)
+
+    def stats(self):
+        rtts = sorted(self.rtts)
+
+        def percentile(p):
+            return rtts[min(len(rtts) - 1, int(p / 100.0 * len(rtts)))] if rtts else None
+        return {"sent": self.sent, "acked": self.acked, "retries": self.retries, "failures": self.failures,
+                "staleAcks": self.staleAcks, "rto": self.rto, "srtt": self.srtt,
+                "rttP50": percentile(50), "rttP95": percentile(95), "rttP99": percentile(99)}
+
 class RFM69(object):
-    def __init__(self, freqBand, nodeID, networkID, isRFM69HW = False, intPin = 18, rstPin = 22, spiBus = 0, spiDevice = 0):
+    def __init__(self, freqBand, nodeID, networkID, isRFM69HW = False, intPin = 18, rstPin = 22, spiBus = 0, spiDevice = 0, shadowRegs = False,
+                 rxQueueSize = 16, rxOverflow = RX_OVERFLOW_DROP_OLDEST, init = True, backend = None):
 
         self.freqBand = freqBand
         self.address = nodeID
@@ -23,8 +178,23 @@ class RFM69(object):
         self.spiBus = spiBus
         self.spiDevice = spiDevice
         self.intLock = False
+        # held while the chip is taken through a mode sequence that must not interleave
+        # with another: a send's TX setup and its return to RX, and the RX drain with its
+        # auto-ACK on the interrupt thread. Never held across the wait for PacketSent,
+        # whose edge comes in on the interrupt thread too.
+        self.chipLock = threading.Lock()
         self.mode = ""
+        # restart latency: monotonic time the radio was created, and seconds from then
+        # until the first frame was queued
+        self.startedAt = time.monotonic()
+        self.timeToFirstFrame = None
         self.promiscuousMode = False
+        # chip-side node/broadcast address filtering, see setAddressFiltering()
+        self.hwAddressFilter = False
+        # frames addressed elsewhere: dropped by the chip (only observable in long-packet
+        # mode, where DIO0 fires on SyncAddress) and dropped by acceptTarget() after a FIFO drain
+        self.rxRejectedHw = 0
+        self.rxRejectedSw = 0
         self.DATASENT = False
         self.DATALEN = 0
         self.SENDERID = 0
@@ -32,11 +202,95 @@ class RFM69(object):
         self.PAYLOADLEN = 0
         self.ACK_REQUESTED = 0
         self.ACK_RECEIVED = 0
+        self.SEQ = 0
         self.RSSI = 0
-        self.DATA = []
+        self.DATA = b""
+        # long-packet mode, see setLongPackets()
+        self.longPackets = False
+        self.maxDataLen = RF69_MAX_DATA_LEN
+        self.dio0RxMapping = RF_DIOMAPPING1_DIO0_01
+        # modem profile last applied by setProfile(), None while on the CONFIG defaults
+        self.profile = None
+        # preallocated FIFO write buffer reused by every frame; byte 0 is the burst-write address
+        self.txBuf = bytearray(5 + max(RF69_MAX_DATA_LEN, RF69_MAX_LONG_DATA_LEN))
+        self.txBuf[0] = REG_FIFO | 0x80
+        self.txView = memoryview(self.txBuf)
         self.sendSleepTime = 0.05
+        # TX completion is signalled by DIO0 (PacketSent) rather than polling IRQFLAGS2
+        self.txDone = threading.Event()
+        self.txPending = False
+        self.txTimeout = 1.0  # seconds; covers a full FIFO at 1.2 kbps
+        self.txLatency = 0  # seconds from entering TX to PacketSent, for the last frame
+        self.txTimeouts = 0
+        self.txStrayIrqs = 0  # DIO0 edges during a send that were not PacketSent
+        # carrier sense, see waitForChannel(): clear-channel threshold in dBm, the noise
+        # floor it was calibrated from (None until calibrateCsma()), backoff exponents and
+        # counters of busy CCAs, slots backed off, seconds spent deferring to a busy
+        # channel and sends that gave up after RF69_CSMA_LIMIT_S and went out anyway
+        self.csmaThreshold = CSMA_LIMIT
+        self.noiseFloor = None
+        self.csmaMinBE = CSMA_MIN_BE
+        self.csmaMaxBE = CSMA_MAX_BE
+        self.csmaRandom = random.Random()
+        self.csmaDeferrals = 0
+        self.csmaBackoffSlots = 0
+        self.csmaBusyTime = 0.0
+        self.csmaFailures = 0
+        # sendReliable(): PeerLink per node ID, and the ACK each call is waiting for, keyed
+        # by (peer, seq) (seq 0 for sendAcked()) and completed from queueFrame() on the
+        # interrupt thread
+        self.peerLinks = {}
+        self.ackWaiters = {}
+        self.ackLock = threading.Lock()
+        # auto-ACK, see setAutoAck(): the prebuilt ACK burst (FIFO address, length, target,
+        # sender, CTL), the last sequence number seen from each sender for dropping
+        # retransmissions, and counters. ackTurnaround is seconds from the drained frame's
+        # timestamp to PacketSent of its ACK, for the last one sent.
+        self.autoAck = False
+        self.ackBuf = bytearray([REG_FIFO | 0x80, 3, 0, 0, 0x80])
+        self.lastSeq = {}
+        self.autoAcks = 0
+        self.rxDuplicates = 0
+        self.ackTurnaround = 0
+        # frames drained by interruptHandler, oldest first; rxCond guards the queue and
+        # is notified on every push. receiveDone() and receive() consume from the head.
+        if rxOverflow not in (RX_OVERFLOW_DROP_OLDEST, RX_OVERFLOW_DROP_NEWEST):
+            raise ValueError("rxOverflow must be RX_OVERFLOW_DROP_OLDEST or RX_OVERFLOW_DROP_NEWEST")
+        self.rxCond = threading.Condition()
+        self.rxQueue = collections.deque()
+        self.rxQueueSize = max(1, rxQueueSize)
+        self.rxOverflow = rxOverflow
+        self.rxDropped = 0
+        # optional callable run on the interrupt thread after each frame is queued
+        self.onFrame = None
+        # time.monotonic() on entry to interruptHandler, stamped on the frame it drains
+        self.irqAt = None
+        # timestamp of the last frame drained from the FIFO (queued or not), None before the first
+        self.lastFrameAt = None
+        # optional callable run on the interrupt thread with each drained frame before it is
+        # queued (after any auto-ACK); returns the frame to queue, or None to drop it
+        self.frameHook = None
+        # optional callable the interrupt hands RX edges to instead of draining the FIFO
+        # itself; whoever installs it must call serviceRx()
+        self.irqWorker = None
+        # with irqWorker, optional callable(event, timeout) that waitRx() goes through, so a
+        # call blocked on that worker still gets the edges it is waiting for serviced
+        self.irqWait = None
         self.powerLevel = 31  # default; updated by setPowerLevel()
+        # whether TX turns on the +20 dBm PA_BOOST registers (RFM69HW only), see setOutputPower()
+        self.highPowerRegs = True
+        # dBm last set by setOutputPower(), None while driven through setPowerLevel()
+        self.outputPower = None
+        # opt-in shadow copy of SHADOW_REGS so masked updates skip the readback; None when disabled
+        self.shadowRegs = shadowRegs
+        self.shadow = None
+        # AES key last given to encrypt(), None while encryption is off
+        self.aesKey = None
+        # RFM69dutycycle.Scheduler every send through this radio shares, see schedulerFor()
+        self.scheduler = None
 
+        self.backend = backend if backend is not None else RFM69backend.default()
+        GPIO = self.gpio = self.backend.gpio
         #GPIO.setboard(GPIO.ZERO)   # for Orange Pi, see https://pypi.org/project/OrangePi.GPIO/
         GPIO.setmode(GPIO.BOARD)
         GPIO.setup(self.intPin, GPIO.IN)
@@ -104,46 +358,68 @@ class RFM69(object):
         }
 
         #initialize SPI
-        self.spi = spidev.SpiDev()
-        self.spi.open(self.spiBus, self.spiDevice)
+        self.spi = self.backend.openSpi(self.spiBus, self.spiDevice)
         self.spi.max_speed_hz = 4000000
 
-        # Hard reset the RFM module
-        GPIO.output(self.rstPin, GPIO.HIGH);
-        time.sleep(0.1)
-        GPIO.output(self.rstPin, GPIO.LOW);
-        time.sleep(0.1)
+        # with init=False the chip is left alone; startRadios() resets and configures it
+        if init:
+            # Hard reset the RFM module
+            GPIO.output(self.rstPin, GPIO.HIGH);
+            time.sleep(0.1)
+            GPIO.output(self.rstPin, GPIO.LOW);
+            time.sleep(0.1)
+            self.invalidateShadow()
+            self.begin()
 
-        #verify chip is syncing?
-        while self.readReg(REG_SYNCVALUE1) != 0xAA:
-            self.writeReg(REG_SYNCVALUE1, 0xAA)
+    # Configure the chip after a reset: wait for it to answer on SPI, write CONFIG with
+    # `profile` merged in (so the modem registers are written once, with their final
+    # values), and register the interrupt. With a timeout every wait is bounded and
+    # raises InitTimeoutError; without one it spins like the original driver.
+    def begin(self, profile = None, timeout = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
 
-        while self.readReg(REG_SYNCVALUE1) != 0x55:
-            self.writeReg(REG_SYNCVALUE1, 0x55)
+        def waitFor(what, ready):
+            while not ready():
+                if deadline is not None and time.monotonic() > deadline:
+                    raise InitTimeoutError("RFM69 on SPI %d.%d: no %s within %.3f s" %
+                                           (self.spiBus, self.spiDevice, what, timeout))
+
+        #verify chip is syncing?
+        def syncs(value):
+            if self.readReg(REG_SYNCVALUE1) == value:
+                return True
+            self.writeReg(REG_SYNCVALUE1, value)
+            return False
+        waitFor("SPI response", lambda: syncs(0xAA))
+        waitFor("SPI response", lambda: syncs(0x55))
 
         #write config
-        for value in self.CONFIG.values():
-            self.writeReg(value[0], value[1])
+        config = dict(self.CONFIG)
+        if profile is not None:
+            config.update(profile.config())
+            reg, value = config[0x37]
+            config[0x37] = [reg, (value & 0x9F) | profile.dcFree()]
+        self.writeConfig(config)
+        self.profile = profile
 
         self.encrypt(0)
         self.setHighPower(self.isRFM69HW)
         # Wait for ModeReady
-        while (self.readReg(REG_IRQFLAGS1) & RF_IRQFLAGS1_MODEREADY) == 0x00:
-            pass
+        waitFor("ModeReady", lambda: self.readReg(REG_IRQFLAGS1) & RF_IRQFLAGS1_MODEREADY)
 
-        GPIO.remove_event_detect(self.intPin)
-        GPIO.add_event_detect(self.intPin, GPIO.RISING, callback=self.interruptHandler)
+        self.gpio.remove_event_detect(self.intPin)
+        self.gpio.add_event_detect(self.intPin, self.gpio.RISING, callback=self.interruptHandler)
 
     def setFrequency(self, freqHz):
         step = 61.03515625
         freq = int(round(freqHz / step))
-        self.writeReg(REG_FRFMSB, freq >> 16)
-        self.writeReg(REG_FRFMID, freq >> 8)
-        self.writeReg(REG_FRFLSB, freq)
+        # FRF is only latched when the LSB is written, so the three bytes go out in one burst
+        self.writeRegs(REG_FRFMSB, [(freq >> 16) & 0xFF, (freq >> 8) & 0xFF, freq & 0xFF])
 
     def getFrequency(self):
         step = 61.03515625
-        freq = (self.readReg(REG_FRFMSB) << 16) + (self.readReg(REG_FRFMID) << 8) + self.readReg(REG_FRFLSB)
+        msb, mid, lsb = self.readRegs(REG_FRFMSB, 3)
+        freq = (msb << 16) + (mid << 8) + lsb
         return int(round(freq * step))
 
     def setMode(self, newMode):
@@ -151,19 +427,19 @@ class RFM69(object):
             return
 
         if newMode == RF69_MODE_TX:
-            self.writeReg(REG_OPMODE, (self.readReg(REG_OPMODE) & 0xE3) | RF_OPMODE_TRANSMITTER)
+            self.updateReg(REG_OPMODE, 0xE3, RF_OPMODE_TRANSMITTER)
             if self.isRFM69HW:
-                self.setHighPowerRegs(True)
+                self.setHighPowerRegs(self.highPowerRegs)
         elif newMode == RF69_MODE_RX:
-            self.writeReg(REG_OPMODE, (self.readReg(REG_OPMODE) & 0xE3) | RF_OPMODE_RECEIVER)
+            self.updateReg(REG_OPMODE, 0xE3, RF_OPMODE_RECEIVER)
             if self.isRFM69HW:
                 self.setHighPowerRegs(False)
         elif newMode == RF69_MODE_SYNTH:
-            self.writeReg(REG_OPMODE, (self.readReg(REG_OPMODE) & 0xE3) | RF_OPMODE_SYNTHESIZER)
+            self.updateReg(REG_OPMODE, 0xE3, RF_OPMODE_SYNTHESIZER)
         elif newMode == RF69_MODE_STANDBY:
-            self.writeReg(REG_OPMODE, (self.readReg(REG_OPMODE) & 0xE3) | RF_OPMODE_STANDBY)
+            self.updateReg(REG_OPMODE, 0xE3, RF_OPMODE_STANDBY)
         elif newMode == RF69_MODE_SLEEP:
-            self.writeReg(REG_OPMODE, (self.readReg(REG_OPMODE) & 0xE3) | RF_OPMODE_SLEEP)
+            self.updateReg(REG_OPMODE, 0xE3, RF_OPMODE_SLEEP)
         else:
             return
 
@@ -191,24 +467,101 @@ class RFM69(object):
         if powerLevel > 31:
             powerLevel = 31
         self.powerLevel = powerLevel
-        self.writeReg(REG_PALEVEL, (self.readReg(REG_PALEVEL) & 0xE0) | self.powerLevel)
+        self.updateReg(REG_PALEVEL, 0xE0, self.powerLevel)
+
+    # Output power in dBm: -2..+20 on the PA_BOOST pin of an RFM69HW, -18..+13 on PA0 of an
+    # RFM69. Picks PA1 alone, PA1+PA2, or PA1+PA2 with the +20 dBm boost registers, whichever
+    # reaches the level, and returns the power actually set.
+    def setOutputPower(self, dBm):
+        dBm = int(round(dBm))
+        if not self.isRFM69HW:
+            dBm = max(-18, min(13, dBm))
+            pa, level, boost = RF_PALEVEL_PA0_ON, dBm + 18, False
+        else:
+            dBm = max(-2, min(20, dBm))
+            if dBm <= 13:
+                pa, level, boost = RF_PALEVEL_PA1_ON, dBm + 18, False
+            elif dBm <= 17:
+                pa, level, boost = RF_PALEVEL_PA1_ON | RF_PALEVEL_PA2_ON, dBm + 14, False
+            else:
+                pa, level, boost = RF_PALEVEL_PA1_ON | RF_PALEVEL_PA2_ON, dBm + 11, True
+        # over-current protection would clip PA2 and the boost stage
+        self.writeReg(REG_OCP, RF_OCP_OFF if pa & RF_PALEVEL_PA2_ON else RF_OCP_ON)
+        self.writeReg(REG_PALEVEL, pa | level)
+        self.powerLevel = level
+        self.highPowerRegs = boost
+        self.outputPower = dBm
+        return dBm
 
     def canSend(self):
-        if self.mode == RF69_MODE_STANDBY:
+        # a frame still held in DATA (receiveDone() without receiveBegin()) is released here,
+        # as the original driver did when receiveDone() left the radio in standby
+        if self.mode == RF69_MODE_STANDBY or self.PAYLOADLEN > 0:
             self.receiveBegin()
             return True
-        #if signal stronger than -100dBm is detected assume channel activity
-        elif self.mode == RF69_MODE_RX and self.PAYLOADLEN == 0 and self.readRSSI() < CSMA_LIMIT:
+        elif self.mode == RF69_MODE_RX and self.PAYLOADLEN == 0 and self.channelClear():
             self.setMode(RF69_MODE_STANDBY)
             return True
         return False
 
-    def send(self, toAddress, buff = "", requestACK = False):
-        self.writeReg(REG_PACKETCONFIG2, (self.readReg(REG_PACKETCONFIG2) & 0xFB) | RF_PACKET2_RXRESTART)
-        now = time.time()
-        while (not self.canSend()) and time.time() - now < RF69_CSMA_LIMIT_S:
-            self.receiveDone()
-        self.sendFrame(toAddress, buff, requestACK, False)
+    # One clear-channel assessment: nothing above csmaThreshold on air and no frame being
+    # received. RSSIVALUE and IRQFLAGS1 come back in one burst.
+    def channelClear(self):
+        rssiValue, dio1, dio2, flags1 = self.readRegs(REG_RSSIVALUE, 4)
+        return not flags1 & RF_IRQFLAGS1_SYNCADDRESSMATCH and -rssiValue >> 1 < self.csmaThreshold
+
+    # Backoff slot in seconds at the current bitrate
+    def csmaSlotTime(self):
+        bitrate = self.profile.bitrate if self.profile is not None else self.readBitrate()
+        return CSMA_SLOT_BITS / bitrate + CSMA_TURNAROUND_S
+
+    # Listen to the channel for `samples` slots and put csmaThreshold `margin` dB above the
+    # quietest quarter of what was heard, so CCA tracks this radio's real noise floor
+    # (antenna, local interference) instead of a fixed -90 dBm. Returns the threshold.
+    def calibrateCsma(self, samples = 16, margin = CSMA_NOISE_MARGIN):
+        if self.mode != RF69_MODE_RX:
+            self.receiveBegin()
+        slot = self.csmaSlotTime()
+        levels = []
+        for i in range(samples):
+            time.sleep(slot)
+            levels.append(self.readRSSI())
+        self.noiseFloor = sorted(levels)[len(levels) // 4]
+        self.csmaThreshold = self.noiseFloor + margin
+        return self.csmaThreshold
+
+    # Listen before talk. Transmits straight away on a clear channel; otherwise backs off a
+    # random 1..2^BE slots, doubling the window after every busy assessment, so nodes that
+    # all waited out the same frame do not all key up the moment it ends. Gives up after
+    # RF69_CSMA_LIMIT_S (and sends anyway, as before). Frames that arrive while backing
+    # off are drained by the interrupt as usual.
+    def waitForChannel(self):
+        if self.mode != RF69_MODE_RX or self.PAYLOADLEN > 0:
+            # the RSSI needs a slot in RX before it means anything
+            self.receiveBegin()
+            time.sleep(self.csmaSlotTime())
+        start = time.monotonic()
+        exponent = self.csmaMinBE
+        slot = None
+        while not self.channelClear():
+            now = time.monotonic()
+            self.csmaDeferrals += 1
+            if now - start >= RF69_CSMA_LIMIT_S:
+                self.csmaFailures += 1
+                break
+            if slot is None:
+                slot = self.csmaSlotTime()
+            slots = self.csmaRandom.randint(1, 1 << exponent)
+            self.csmaBackoffSlots += slots
+            time.sleep(slots * slot)
+            exponent = min(exponent + 1, self.csmaMaxBE)
+        if slot is not None:
+            self.csmaBusyTime += time.monotonic() - start
+
+    def send(self, toAddress, buff = "", requestACK = False, seq = 0):
+        self.updateReg(REG_PACKETCONFIG2, 0xFB, RF_PACKET2_RXRESTART)
+        self.waitForChannel()
+        self.sendFrame(toAddress, buff, requestACK, False, seq)
 
 #    to increase the chance of getting a packet across, call this function instead of send
 #    and it handles all the ACK requesting/retrying for you :)
@@ -230,6 +583,90 @@ class RFM69(object):
                 time.sleep(0.01)
         return False
 
+    # Event-driven counterpart of one sendWithRetry() attempt: sends with an ACK request and
+    # waits up to `timeout` seconds for the ACK, which is returned as a Frame (None if it never
+    # came). The ACK is taken off the RX path like sendReliable()'s, so frames that turn up
+    # meanwhile stay queued as they are. One call per peer at a time.
+    def sendAcked(self, toAddress, buff, timeout):
+        waiter = [threading.Event(), None]
+        with self.ackLock:
+            self.ackWaiters[(toAddress, 0)] = waiter
+        try:
+            self.send(toAddress, buff, True)
+            self.waitRx(waiter[0], timeout)
+            return waiter[1]
+        finally:
+            with self.ackLock:
+                del self.ackWaiters[(toAddress, 0)]
+
+    # Stop-and-wait with sequence numbers: sends with an ACK request and seq in the CTL
+    # byte, and retransmits (same seq) up to `retries` times until the ACK for exactly this
+    # (peer, seq) arrives. The interrupt wakes the caller, so there is no polling, and the
+    # timeout is the peer's adaptive RTO. RTT is sampled from first attempts only (Karn).
+    # Returns the ACK Frame, or None if every attempt went unanswered.
+    def sendReliable(self, toAddress, buff, retries = 3):
+        link = self.peerLink(toAddress)
+        seq = link.nextSeq()
+        waiter = [threading.Event(), None]
+        with self.ackLock:
+            self.ackWaiters[(toAddress, seq)] = waiter
+        link.sent += 1
+        try:
+            for attempt in range(retries + 1):
+                if attempt:
+                    link.retries += 1
+                self.send(toAddress, buff, True, seq)
+                sentAt = time.monotonic()
+                if self.waitRx(waiter[0], link.rto):
+                    if attempt == 0:
+                        link.sample(time.monotonic() - sentAt)
+                    else:
+                        link.restore()
+                    link.acked += 1
+                    return waiter[1]
+                link.backoff()
+            link.failures += 1
+            return None
+        finally:
+            with self.ackLock:
+                del self.ackWaiters[(toAddress, seq)]
+
+    # Wait up to `timeout` seconds for `event`, set from the RX path. Where RX edges go to an
+    # I/O worker (RFM69twin) and this runs on it, the edge that would set it is queued behind
+    # us, so irqWait services them meanwhile. Returns whether `event` was set.
+    def waitRx(self, event, timeout):
+        if self.irqWait is not None:
+            return self.irqWait(event, timeout)
+        return event.wait(timeout)
+
+    def peerLink(self, nodeID):
+        link = self.peerLinks.get(nodeID)
+        if link is None:
+            link = self.peerLinks[nodeID] = PeerLink()
+        return link
+
+    # sendReliable() counters, RTO and RTT percentiles (seconds) for every peer sent to
+    def peerStats(self):
+        return dict((nodeID, link.stats()) for nodeID, link in self.peerLinks.items())
+
+    # Interrupt thread: hand an ACK to the sendReliable() or sendAcked() waiting for it.
+    # Returns False for an unsequenced ACK nobody waits for, which is queued for
+    # ACKReceived(). A sequenced one nobody waits for any more (a late ACK for an earlier
+    # attempt) is counted and dropped rather than queued.
+    def matchAck(self, frame):
+        with self.ackLock:
+            waiter = self.ackWaiters.get((frame.senderID, frame.seq))
+            if waiter is None:
+                if not frame.seq:
+                    return False
+                link = self.peerLinks.get(frame.senderID)
+                if link is not None:
+                    link.staleAcks += 1
+                return True
+            waiter[1] = frame
+        waiter[0].set()
+        return True
+
     def ACKReceived(self, fromNodeID):
         if self.receiveDone():
             return (self.SENDERID == fromNodeID or fromNodeID == RF69_BROADCAST_ADDR) and self.ACK_RECEIVED
@@ -238,94 +675,404 @@ class RFM69(object):
     def ACKRequested(self):
         return self.ACK_REQUESTED and self.TARGETID != RF69_BROADCAST_ADDR
 
-    def sendACK(self, toAddress = 0, buff = ""):
+    # Echoes the sequence number of the frame being acknowledged: the last one loaded by
+    # receiveDone() unless `seq` is given (Frame.seq when using receive())
+    def sendACK(self, toAddress = 0, buff = "", seq = None):
+        if self.autoAck:
+            # the interrupt has already answered
+            return
         toAddress = toAddress if toAddress > 0 else self.SENDERID
+        seq = seq if seq is not None else self.SEQ
         while not self.canSend():
             self.receiveDone()
-        self.sendFrame(toAddress, buff, False, True)
+        self.sendFrame(toAddress, buff, False, True, seq)
 
-    def sendFrame(self, toAddress, buff, requestACK, sendACK):
-        #turn off receiver to prevent reception while filling fifo
-        self.setMode(RF69_MODE_STANDBY)
-        #wait for modeReady
-        while (self.readReg(REG_IRQFLAGS1) & RF_IRQFLAGS1_MODEREADY) == 0x00:
-            pass
+    def sendFrame(self, toAddress, buff, requestACK, sendACK, seq = 0):
+        # waits for the interrupt to finish draining (and auto-ACKing) a frame first
+        with self.chipLock:
+            #turn off receiver to prevent reception while filling fifo
+            self.setMode(RF69_MODE_STANDBY)
+            #wait for modeReady
+            while (self.readReg(REG_IRQFLAGS1) & RF_IRQFLAGS1_MODEREADY) == 0x00:
+                pass
 
-        if (len(buff) > RF69_MAX_DATA_LEN):
-            buff = buff[0:RF69_MAX_DATA_LEN]
+            ack = 0
+            if sendACK:
+                ack = 0x80
+            elif requestACK:
+                ack = 0x40
+            pos, end = self.writeFifo(toAddress, buff, ack | seq & CTL_SEQ_MASK)
 
-        ack = 0
-        if sendACK:
-            ack = 0x80
-        elif requestACK:
-            ack = 0x40
-        if isinstance(buff, str):
-            self.spi.xfer2([REG_FIFO | 0x80, len(buff) + 3, toAddress, self.address, ack] + [int(ord(i)) for i in list(buff)])
-        else:
-            self.spi.xfer2([REG_FIFO | 0x80, len(buff) + 3, toAddress, self.address, ack] + buff)
-
-        self.DATASENT = False
-        self.setMode(RF69_MODE_TX)
-        while (self.readReg(REG_IRQFLAGS2) & RF_IRQFLAGS2_PACKETSENT) == 0x00:
-            pass
-        self.setMode(RF69_MODE_RX)
+            self.DATASENT = False
+            self.txDone.clear()
+            self.txPending = True
+            #set DIO0 to "PACKETSENT" in transmit mode
+            self.writeReg(REG_DIOMAPPING1, RF_DIOMAPPING1_DIO0_00)
+            txStart = time.monotonic()
+            self.setMode(RF69_MODE_TX)
+        timeout = self.txTimeout
+        if pos < end and self.longPackets:
+            timeout += self.refillFifo(pos, end)
+        if not self.txDone.wait(timeout):
+            # edge missed or DIO0 not wired: check the flag once before counting a timeout
+            if (self.readReg(REG_IRQFLAGS2) & RF_IRQFLAGS2_PACKETSENT) == 0x00:
+                self.txTimeouts += 1
+        self.txPending = False
+        self.txLatency = time.monotonic() - txStart
+        with self.chipLock:
+            self.writeReg(REG_DIOMAPPING1, self.dio0RxMapping)
+            self.setMode(RF69_MODE_RX)
 
     def interruptHandler(self, pin):
+        self.irqAt = time.monotonic()
         self.intLock = True
-        self.DATASENT = True
-        if self.mode == RF69_MODE_RX and self.readReg(REG_IRQFLAGS2) & RF_IRQFLAGS2_PAYLOADREADY:
-            self.setMode(RF69_MODE_STANDBY)
-            self.PAYLOADLEN, self.TARGETID, self.SENDERID, CTLbyte = self.spi.xfer2([REG_FIFO & 0x7f,0,0,0,0])[1:]
-            if self.PAYLOADLEN > 66:
-                self.PAYLOADLEN = 66
-            if not (self.promiscuousMode or self.TARGETID == self.address or self.TARGETID == RF69_BROADCAST_ADDR):
-                self.PAYLOADLEN = 0
-                self.intLock = False
-                return
-            self.DATALEN = self.PAYLOADLEN - 3
-            self.ACK_RECEIVED = CTLbyte & 0x80
-            self.ACK_REQUESTED = CTLbyte & 0x40
+        # self.mode is only updated after the OPMODE write, so a short frame can finish
+        # before setMode() returns: while txPending, the flag tells whether this edge is
+        # PacketSent or one from RX still queued on the callback thread
+        if self.txPending:
+            if self.readReg(REG_IRQFLAGS2) & RF_IRQFLAGS2_PACKETSENT:
+                self.txPending = False
+                self.DATASENT = True
+                self.txDone.set()
+            else:
+                self.txStrayIrqs += 1
+            self.intLock = False
+            return
+        if self.irqWorker is not None:
+            # RX edges are serviced on the owner's I/O thread, see RFM69twin.TwinRadio
+            self.intLock = False
+            self.irqWorker()
+            return
+        self.serviceRx()
 
-            self.DATA = self.spi.xfer2([REG_FIFO & 0x7f] + [0 for i in range(0, self.DATALEN)])[1:]
+    # Drain whatever DIO0 signalled in RX into the queue, auto-ACKing it, under chipLock
+    def serviceRx(self):
+        with self.chipLock:
+            self.drainRx()
 
-            self.RSSI = self.readRSSI()
-            #print(f"received {self.PAYLOADLEN} raw bytes from {self.SENDERID} ack={self.ACK_RECEIVED}")
+    # serviceRx() for a caller already holding chipLock
+    def drainRx(self):
+        self.intLock = True
+        timestamp = self.irqAt if self.irqAt is not None else time.monotonic()
+        self.irqAt = None
+        if self.mode == RF69_MODE_RX and self.longPackets:
+            # DIO0 is SyncAddress: the frame is still arriving, so drain it as it streams in.
+            # AutoRxRestart re-arms the receiver once the FIFO is emptied.
+            frame = self.readFifoStream(timestamp)
+            if frame is not None:
+                self.lastFrameAt = timestamp
+                self.deliver(frame)
+            self.setMode(RF69_MODE_RX)
+        elif self.mode == RF69_MODE_RX:
+            # still in RX, so RSSI/AFC/FEI are the values latched for this frame
+            telemetry = self.spi.xfer2(TELEMETRY_READ_CMD)
+            if telemetry[-1] & RF_IRQFLAGS2_PAYLOADREADY:
+                self.lastFrameAt = timestamp
+                self.setMode(RF69_MODE_STANDBY)
+                frame = self.readFifo(telemetry, timestamp)
+                if frame is not None:
+                    #print(f"received {len(frame.data)} bytes from {frame.senderID} ack={frame.ackReceived}")
+                    self.deliver(frame)
+                # listen again straight away; the frame waits in the queue, not in the FIFO
+                self.setMode(RF69_MODE_RX)
         self.intLock = False
 
+    # Auto-ACK, filter through frameHook and queue a drained frame
+    def deliver(self, frame):
+        if not self.answer(frame):
+            return
+        if self.frameHook is not None:
+            frame = self.frameHook(frame)
+            if frame is None:
+                return
+        self.queueFrame(frame)
+
+    # Have the interrupt path ACK every frame addressed to this node that asks for one, the
+    # moment it is drained, instead of waiting for the application to notice ACKRequested().
+    # Retransmissions of a sequenced frame (sendReliable) are ACKed again but not queued
+    # twice. sendACK() becomes a no-op, so code written for manual ACKs keeps working.
+    def setAutoAck(self, onOff):
+        self.autoAck = onOff
+        self.lastSeq = {}
+
+    # Auto-ACK `frame` if it wants one. Returns False for a duplicate that should not be queued.
+    def answer(self, frame):
+        if not self.autoAck or not frame.ctl & 0x40 or frame.targetID != self.address:
+            return True
+        self.sendAutoAck(frame)
+        if frame.seq:
+            if self.lastSeq.get(frame.senderID) == frame.seq:
+                self.rxDuplicates += 1
+                return False
+            self.lastSeq[frame.senderID] = frame.seq
+        return True
+
+    # Send the ACK template from the interrupt thread. PacketSent is polled rather than
+    # waited for: its DIO0 edge would be delivered on this same thread, after we return.
+    def sendAutoAck(self, frame):
+        buf = self.ackBuf
+        buf[2] = frame.senderID
+        buf[3] = self.address
+        buf[4] = 0x80 | frame.seq
+        self.setMode(RF69_MODE_STANDBY)
+        self.spi.writebytes2(buf)
+        self.writeReg(REG_DIOMAPPING1, RF_DIOMAPPING1_DIO0_00)
+        self.setMode(RF69_MODE_TX)
+        bitrate = self.profile.bitrate if self.profile is not None else self.readBitrate()
+        time.sleep(ACK_FRAME_BYTES * 8 / bitrate)
+        deadline = time.monotonic() + self.txTimeout
+        while (self.readReg(REG_IRQFLAGS2) & RF_IRQFLAGS2_PACKETSENT) == 0x00:
+            if time.monotonic() > deadline:
+                self.txTimeouts += 1
+                break
+            time.sleep(0.0001)
+        self.writeReg(REG_DIOMAPPING1, self.dio0RxMapping)
+        self.setMode(RF69_MODE_STANDBY)
+        self.autoAcks += 1
+        self.ackTurnaround = time.monotonic() - frame.timestamp
+
+    # Load one frame into the FIFO. `buff` may be bytes, bytearray, memoryview, a list of
+    # ints or a str (one byte per character); it is copied into the preallocated txBuf and
+    # clocked out with a single writebytes2() call, without building a Python list.
+    # Returns (pos, end): txBuf[pos:end] is what did not fit and must go out via refillFifo().
+    def writeFifo(self, toAddress, buff, ctl):
+        if isinstance(buff, str):
+            buff = buff.encode("latin-1")
+        n = min(len(buff), self.maxDataLen)
+        buf = self.txBuf
+        buf[1] = n + 3
+        buf[2] = toAddress
+        buf[3] = self.address
+        buf[4] = ctl
+        buf[5:5 + n] = buff[:n] if n < len(buff) else buff
+        end = 5 + n
+        pos = min(end, 1 + RF69_FIFO_SIZE)
+        self.spi.writebytes2(self.txView[:pos])
+        return pos, end
+
+    # Top up the FIFO while a long frame is on air. Only DIO0 is wired on the TwinRF69, so
+    # FifoLevel is polled instead of waited for, and without sleeping: at 250 kbps the
+    # threshold is 1.5 ms of air, less than a sleep() can overshoot on a busy host.
+    # Returns the remaining airtime in seconds, for the PacketSent timeout.
+    def refillFifo(self, pos, end):
+        byteTime = 8.0 / self.readBitrate()
+        self.writeReg(REG_FIFOTHRESH, RF_FIFOTHRESH_TXSTART_FIFONOTEMPTY | LONG_TX_FIFO_THRESHOLD)
+        queued = pos - 1
+        chunk = RF69_FIFO_SIZE - LONG_TX_FIFO_THRESHOLD
+        while pos < end:
+            flags = self.readReg(REG_IRQFLAGS2)
+            if flags & RF_IRQFLAGS2_PACKETSENT:
+                # the FIFO ran dry and the modulator closed the frame early
+                queued = -2
+                break
+            if flags & RF_IRQFLAGS2_FIFOLEVEL:
+                time.sleep(0)
+                continue
+            n = min(chunk, end - pos)
+            # bytes before pos are already on air, so the one ahead of the chunk can carry
+            # the burst-write address and the chunk goes out without a copy
+            self.txBuf[pos - 1] = REG_FIFO | 0x80
+            self.spi.writebytes2(self.txView[pos - 1:pos + n])
+            pos += n
+            queued = LONG_TX_FIFO_THRESHOLD + n
+        self.writeReg(REG_FIFOTHRESH, RF_FIFOTHRESH_TXSTART_FIFONOTEMPTY | LONG_RX_FIFO_THRESHOLD)
+        return (queued + 2) * byteTime
+
+    # Drain the frame sitting in the FIFO. Returns a Frame, or None if address filtering
+    # rejects it. The FIFO read commands are prebuilt, so the only per-frame allocations
+    # are spidev's result list and the payload bytes. `telemetry` is the result of
+    # TELEMETRY_READ_CMD taken before leaving RX; it is read here if not given.
+    def readFifo(self, telemetry = None, timestamp = None):
+        if telemetry is None:
+            telemetry = self.spi.xfer2(TELEMETRY_READ_CMD)
+        payloadLen, targetID, senderID, CTLbyte = self.spi.xfer2(FIFO_READ_CMDS[4])[1:]
+        if payloadLen > 66:
+            payloadLen = 66
+        if not self.acceptTarget(targetID):
+            self.rxRejectedSw += 1
+            return None
+        data = bytes(self.spi.xfer2(FIFO_READ_CMDS[max(payloadLen - 3, 0)]))[1:]
+        return self.makeFrame(data, senderID, targetID, CTLbyte, telemetry,
+                              timestamp if timestamp is not None else time.monotonic())
+
+    # Frame with the RSSI, FEI and AFC out of a TELEMETRY_READ_CMD result
+    def makeFrame(self, data, senderID, targetID, ctl, telemetry, timestamp):
+        afc = (telemetry[1] << 8) | telemetry[2]
+        fei = (telemetry[3] << 8) | telemetry[4]
+        # both are two's complement, in FSTEP units
+        afc -= (afc & 0x8000) << 1
+        fei -= (fei & 0x8000) << 1
+        return Frame(data, senderID, targetID, ctl, -telemetry[6] >> 1, timestamp,
+                     self.freqBand, fei * FSTEP, afc * FSTEP)
+
+    # Long-packet counterpart of readFifo(), entered on SyncAddress while the frame is still
+    # arriving. Reads LONG_RX_FIFO_THRESHOLD bytes whenever FifoLevel says more than that
+    # are queued and the remainder once PayloadReady (CRC OK) is set, polling the flags
+    # without sleeping in between. Returns None if the frame is filtered out or never
+    # completes (CRC failure clears the FIFO and restarts RX).
+    def readFifoStream(self, timestamp = None):
+        byteTime = 8.0 / self.readBitrate()
+        deadline = time.monotonic() + (RF69_MAX_LONG_DATA_LEN + 8) * byteTime + 0.01
+        got = bytearray()
+        # the frame has only just synced: take the telemetry (and the first flags) now
+        telemetry = self.spi.xfer2(TELEMETRY_READ_CMD)
+        flags1, flags = telemetry[-2:]
+        while True:
+            if flags & RF_IRQFLAGS2_PAYLOADREADY:
+                if not got:
+                    got += bytes(self.spi.xfer2(FIFO_READ_CMDS[1]))[1:]
+                rest = got[0] + 1 - len(got)
+                while rest > 0:
+                    n = min(rest, RF69_FIFO_SIZE)
+                    got += bytes(self.spi.xfer2(FIFO_READ_CMDS[n]))[1:]
+                    rest -= n
+                break
+            if flags & RF_IRQFLAGS2_FIFOLEVEL:
+                got += bytes(self.spi.xfer2(FIFO_READ_CMDS[LONG_RX_FIFO_THRESHOLD]))[1:]
+            else:
+                if self.hwAddressFilter and not got and not flags1 & RF_IRQFLAGS1_SYNCADDRESSMATCH:
+                    # the address byte did not match: the chip cleared the FIFO and restarted RX
+                    self.rxRejectedHw += 1
+                    return None
+                if time.monotonic() > deadline:
+                    self.updateReg(REG_PACKETCONFIG2, 0xFB, RF_PACKET2_RXRESTART)
+                    return None
+                time.sleep(0)
+            flags1, flags = self.readRegs(REG_IRQFLAGS1, 2)
+        if len(got) < 4:
+            return None
+        if not self.acceptTarget(got[1]):
+            self.rxRejectedSw += 1
+            return None
+        return self.makeFrame(bytes(got[4:]), got[2], got[1], got[3], telemetry,
+                              timestamp if timestamp is not None else time.monotonic())
+
+    def acceptTarget(self, targetID):
+        return self.promiscuousMode or targetID == self.address or targetID == RF69_BROADCAST_ADDR
+
+    # Long-packet mode: frames of up to RF69_MAX_LONG_DATA_LEN bytes go out as one frame with
+    # one preamble, streamed through the 66-byte FIFO while on air. Both ends must agree.
+    # The chip's AES engine only handles FIFO-sized frames, so leave encryption off.
+    # Set the bit rate first: a frame is lost whenever the host falls LONG_SLACK_BYTES
+    # behind the air, so this raises ValueError if that is less than `hostLatency`, where
+    # fragments would get through and long frames would not.
+    def setLongPackets(self, onOff, hostLatency = LONG_HOST_LATENCY_S):
+        if onOff:
+            bitrate = self.readBitrate()
+            slack = LONG_SLACK_BYTES * 8.0 / bitrate
+            if slack < hostLatency:
+                raise ValueError("%.1f kbps leaves the host %.1f ms to service the FIFO, %.1f ms needed"
+                                 % (bitrate / 1000, slack * 1000, hostLatency * 1000))
+        self.setMode(RF69_MODE_STANDBY)
+        self.longPackets = onOff
+        if onOff:
+            self.maxDataLen = RF69_MAX_LONG_DATA_LEN
+            self.writeReg(REG_PAYLOADLENGTH, 255)
+            self.writeReg(REG_FIFOTHRESH, RF_FIFOTHRESH_TXSTART_FIFONOTEMPTY | LONG_RX_FIFO_THRESHOLD)
+            # DIO0 = SyncAddress in RX, so the interrupt fires as soon as a frame starts
+            self.dio0RxMapping = RF_DIOMAPPING1_DIO0_10
+        else:
+            self.maxDataLen = RF69_MAX_DATA_LEN
+            self.writeReg(REG_PAYLOADLENGTH, 66)
+            self.writeReg(REG_FIFOTHRESH, RF_FIFOTHRESH_TXSTART_FIFONOTEMPTY | RF_FIFOTHRESH_VALUE)
+            self.dio0RxMapping = RF_DIOMAPPING1_DIO0_01
+
+    # Switch modem settings (see RFM69profiles) in standby: the profile's registers go out
+    # as two bursts plus the DC-free bits of PACKETCONFIG1, so the chip never runs with a
+    # half-applied mix. Returns to RX afterwards if that is where it was.
+    def setProfile(self, profile):
+        wasRx = self.mode == RF69_MODE_RX
+        self.setMode(RF69_MODE_STANDBY)
+        self.writeConfig(profile.config())
+        self.updateReg(REG_PACKETCONFIG1, 0x9F, profile.dcFree())
+        self.profile = profile
+        if wasRx:
+            self.receiveBegin()
+
+    def readBitrate(self):
+        msb, lsb = self.readRegs(REG_BITRATEMSB, 2)
+        return 32000000.0 / ((msb << 8) | lsb)
+
+    def queueFrame(self, frame):
+        if self.timeToFirstFrame is None:
+            self.timeToFirstFrame = frame.timestamp - self.startedAt
+        if frame.ctl & 0x80 and self.matchAck(frame):
+            return
+        with self.rxCond:
+            if len(self.rxQueue) >= self.rxQueueSize:
+                self.rxDropped += 1
+                if self.rxOverflow == RX_OVERFLOW_DROP_NEWEST:
+                    return
+                self.rxQueue.popleft()
+            self.rxQueue.append(frame)
+            self.rxCond.notify_all()
+        if self.onFrame is not None:
+            self.onFrame()
+
+    # Pop the oldest queued frame into DATA/SENDERID/... for the polling API
+    def loadFrame(self):
+        with self.rxCond:
+            if not self.rxQueue:
+                return False
+            frame = self.rxQueue.popleft()
+        self.DATA = frame.data
+        self.DATALEN = len(frame.data)
+        self.PAYLOADLEN = self.DATALEN + 3
+        self.SENDERID = frame.senderID
+        self.TARGETID = frame.targetID
+        self.ACK_RECEIVED = frame.ctl & 0x80
+        self.ACK_REQUESTED = frame.ctl & 0x40
+        self.SEQ = frame.ctl & CTL_SEQ_MASK
+        self.RSSI = frame.rssi
+        return True
+
     def receiveBegin(self):
         # FIX: was time.sleep(0.1) — 100ms stall is far too long at 250kbps and
         # would exceed ACK timeouts, causing spurious retries.
-        while self.intLock:
-            time.sleep(0.001)
+        # chipLock waits for the interrupt to finish a drain instead.
         self.DATALEN = 0
         self.SENDERID = 0
         self.TARGETID = 0
         self.PAYLOADLEN = 0
         self.ACK_REQUESTED = 0
         self.ACK_RECEIVED = 0
+        self.SEQ = 0
         self.RSSI = 0
-        if (self.readReg(REG_IRQFLAGS2) & RF_IRQFLAGS2_PAYLOADREADY):
-            # avoid RX deadlocks
-            self.writeReg(REG_PACKETCONFIG2, (self.readReg(REG_PACKETCONFIG2) & 0xFB) | RF_PACKET2_RXRESTART)
-        #set DIO0 to "PAYLOADREADY" in receive mode
-        self.writeReg(REG_DIOMAPPING1, RF_DIOMAPPING1_DIO0_01)
-        self.setMode(RF69_MODE_RX)
+        with self.chipLock:
+            if (self.readReg(REG_IRQFLAGS2) & RF_IRQFLAGS2_PAYLOADREADY):
+                # avoid RX deadlocks
+                self.updateReg(REG_PACKETCONFIG2, 0xFB, RF_PACKET2_RXRESTART)
+            #set DIO0 to "PAYLOADREADY" in receive mode ("SYNCADDRESS" in long-packet mode)
+            self.writeReg(REG_DIOMAPPING1, self.dio0RxMapping)
+            self.setMode(RF69_MODE_RX)
 
+    # The receiver stays armed while frames wait in the queue, so unlike the original
+    # driver this does not drop to standby when a frame is available.
     def receiveDone(self):
-        if (self.mode == RF69_MODE_RX or self.mode == RF69_MODE_STANDBY) and self.PAYLOADLEN > 0:
-            self.setMode(RF69_MODE_STANDBY)
+        if self.PAYLOADLEN > 0 or self.loadFrame():
             return True
         if self.readReg(REG_IRQFLAGS1) & RF_IRQFLAGS1_TIMEOUT:
             # https://github.com/russss/rfm69-python/blob/master/rfm69/rfm69.py#L112
             # Russss figured out that if you leave alone long enough it times out
             # tell it to stop being silly and listen for more packets
-            self.writeReg(REG_PACKETCONFIG2, (self.readReg(REG_PACKETCONFIG2) & 0xFB) | RF_PACKET2_RXRESTART)
+            self.updateReg(REG_PACKETCONFIG2, 0xFB, RF_PACKET2_RXRESTART)
         elif self.mode == RF69_MODE_RX:
             # already in RX no payload yet
             return False
         self.receiveBegin()
         return False
 
+    # Block until a frame arrives or `timeout` seconds pass (None waits forever).
+    # Returns a Frame, or None on timeout, and leaves the receiver armed either way.
+    # Shares the queue with receiveDone(), so both APIs can be mixed.
+    def receive(self, timeout = None):
+        if self.mode != RF69_MODE_RX:
+            self.receiveBegin()
+        with self.rxCond:
+            if not self.rxCond.wait_for(lambda: self.rxQueue, timeout):
+                return None
+            return self.rxQueue.popleft()
+
     def readRSSI(self, forceTrigger = False):
         rssi = 0
         if forceTrigger:
@@ -339,25 +1086,127 @@ class RFM69(object):
     def encrypt(self, key):
         self.setMode(RF69_MODE_STANDBY)
         if key != 0 and len(key) == 16:
-            self.spi.xfer([REG_AESKEY1 | 0x80] + [int(ord(i)) for i in list(key)])
-            self.writeReg(REG_PACKETCONFIG2,(self.readReg(REG_PACKETCONFIG2) & 0xFE) | RF_PACKET2_AES_ON)
+            self.aesKey = key
+            self.writeKey(key)
+            self.updateReg(REG_PACKETCONFIG2, 0xFE, RF_PACKET2_AES_ON)
         else:
-            self.writeReg(REG_PACKETCONFIG2,(self.readReg(REG_PACKETCONFIG2) & 0xFE) | RF_PACKET2_AES_OFF)
+            self.aesKey = None
+            self.updateReg(REG_PACKETCONFIG2, 0xFE, RF_PACKET2_AES_OFF)
+
+    def writeKey(self, key):
+        self.spi.xfer([REG_AESKEY1 | 0x80] + [int(ord(i)) for i in list(key)])
 
     def readReg(self, addr):
         return self.spi.xfer([addr & 0x7F, 0])[1]
 
     def writeReg(self, addr, value):
         self.spi.xfer([addr | 0x80, value])
+        if self.shadow is not None and addr in SHADOW_REGS:
+            self.shadow[addr] = value & SHADOW_REGS[addr]
+
+    # Read-modify-write of the bits outside `mask`. With the shadow enabled the
+    # current value comes from the cache, so the update costs one SPI transaction.
+    def updateReg(self, addr, mask, bits):
+        if self.shadow is not None and addr in self.shadow:
+            current = self.shadow[addr]
+        else:
+            current = self.readReg(addr)
+            if self.shadow is not None and addr in SHADOW_REGS:
+                self.shadow[addr] = current & SHADOW_REGS[addr]
+        self.writeReg(addr, (current & mask) | bits)
+
+    # Drop every cached value; called after a chip reset, when the register file is back to defaults
+    def invalidateShadow(self):
+        self.shadow = {} if self.shadowRegs else None
+
+    # Load the shadow with what the chip holds now for every SHADOW_REGS register, turning
+    # it on if it was off, so it is a complete image of the expected configuration
+    def fillShadow(self):
+        self.shadowRegs = True
+        actual = dict(enumerate(self.readRegs(1, REG_TEMP2), 1))
+        self.shadow = {}
+        for addr, mask in SHADOW_REGS.items():
+            value = actual[addr] if addr in actual else self.readReg(addr)
+            self.shadow[addr] = value & mask
+
+    # Compare the shadow against the chip. Returns a list of (register, cached, actual)
+    # for every mismatch; an empty list means the cache is coherent.
+    def verifyShadow(self):
+        if self.shadow is None:
+            return []
+        actual = dict(enumerate(self.readRegs(1, REG_TEMP2), 1))
+        mismatches = []
+        for addr in sorted(self.shadow):
+            value = actual[addr] if addr in actual else self.readReg(addr)
+            if value & SHADOW_REGS[addr] != self.shadow[addr]:
+                mismatches.append((addr, self.shadow[addr], value))
+        return mismatches
+
+    # Burst access: the chip auto-increments the register address while CS stays
+    # asserted, so a contiguous block moves in a single SPI transaction.
+    # Note that REG_FIFO (0x00) does not auto-increment; use the FIFO helpers for that.
+    def readRegs(self, start, n):
+        return self.spi.xfer2([start & 0x7F] + [0] * n)[1:]
+
+    def writeRegs(self, start, values):
+        values = list(values)
+        self.spi.xfer2([start | 0x80] + values)
+        if self.shadow is not None:
+            for addr, value in enumerate(values, start):
+                if addr in SHADOW_REGS:
+                    self.shadow[addr] = value & SHADOW_REGS[addr]
+
+    # Write a {key: [register, value]} table (the same layout as self.CONFIG),
+    # coalescing consecutive register addresses into burst writes.
+    # Returns the number of SPI transactions used.
+    def writeConfig(self, config):
+        regs = {}
+        for reg, value in config.values():
+            # 255 is the end-of-table marker carried over from the Arduino driver
+            if reg > 0x7F:
+                continue
+            regs[reg] = value
+
+        transactions = 0
+        runStart = None
+        run = []
+        for reg in sorted(regs):
+            if runStart is not None and reg == runStart + len(run):
+                run.append(regs[reg])
+                continue
+            if run:
+                self.writeRegs(runStart, run)
+                transactions += 1
+            runStart = reg
+            run = [regs[reg]]
+        if run:
+            self.writeRegs(runStart, run)
+            transactions += 1
+        return transactions
 
     def promiscuous(self, onOff):
         self.promiscuousMode = onOff
+        if self.hwAddressFilter:
+            self.writeAddressFiltering(not onOff)
+
+    # Have the chip drop frames whose target byte is neither this node's address nor the
+    # broadcast address, so foreign traffic costs no interrupt and no FIFO drain. The
+    # software check in acceptTarget() stays in place; promiscuous(True) suspends this.
+    def setAddressFiltering(self, onOff):
+        self.hwAddressFilter = onOff
+        if onOff:
+            self.writeRegs(REG_NODEADRS, [self.address, RF69_BROADCAST_ADDR])
+        self.writeAddressFiltering(onOff and not self.promiscuousMode)
+
+    def writeAddressFiltering(self, onOff):
+        bits = RF_PACKET1_ADRSFILTERING_NODEBROADCAST if onOff else RF_PACKET1_ADRSFILTERING_OFF
+        self.updateReg(REG_PACKETCONFIG1, 0xF9, bits)
 
     def setHighPower(self, onOff):
         if onOff:
             self.writeReg(REG_OCP, RF_OCP_OFF)
             #enable P1 & P2 amplifier stages
-            self.writeReg(REG_PALEVEL, (self.readReg(REG_PALEVEL) & 0x1F) | RF_PALEVEL_PA1_ON | RF_PALEVEL_PA2_ON)
+            self.updateReg(REG_PALEVEL, 0x1F, RF_PALEVEL_PA1_ON | RF_PALEVEL_PA2_ON)
         else:
             self.writeReg(REG_OCP, RF_OCP_ON)
             #enable P0 only
@@ -375,8 +1224,8 @@ class RFM69(object):
 
     def readAllRegs(self):
         results = []
-        for address in range(1, 0x50):
-            results.append([str(hex(address)), str(bin(self.readReg(address)))])
+        for address, value in enumerate(self.readRegs(1, 0x4F), 1):
+            results.append([str(hex(address)), str(bin(value))])
         return results
 
     def readTemperature(self, calFactor):
@@ -397,4 +1246,23 @@ class RFM69(object):
     def shutdown(self):
         self.setHighPower(False)
         self.sleep()
-        GPIO.cleanup()
+        self.gpio.cleanup()
+
+
+# Bring up several radios created with init=False in one go: all reset lines are pulsed
+# together, so the chips' start-up times overlap, then each is polled until it answers
+# (bounded by `timeout`) and configured with `profile` already applied. Returns the
+# seconds taken.
+def startRadios(radios, profile = None, timeout = RESET_TIMEOUT_S):
+    start = time.monotonic()
+    for radio in radios:
+        radio.gpio.output(radio.rstPin, radio.gpio.HIGH)
+    time.sleep(RESET_PULSE_S)
+    for radio in radios:
+        radio.gpio.output(radio.rstPin, radio.gpio.LOW)
+    for radio in radios:
+        radio.invalidateShadow()
+        radio.startedAt = start
+        radio.timeToFirstFrame = None
+        radio.begin(profile, timeout)
+    return time.monotonic() - start
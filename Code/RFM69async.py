@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+# asyncio facade for an RFM69. Received frames still come off the chip in the GPIO
+# interrupt; the radio's onFrame hook hands each one to the event loop through
+# call_soon_threadsafe, so recv() and `async for` wake on the edge instead of polling.
+# Sends run on one worker thread per radio, which waits for PacketSent while the loop
+# carries on with other radios, the TUN fd (loop.add_reader) and timers.
+#
+#   aradio = AsyncRFM69(radio)        # inside a coroutine, or pass loop=
+#   await aradio.send(OTHERNODE, b"hello")
+#   async for frame in aradio:
+#       ...
+
+import asyncio
+import concurrent.futures
+
+
+class AsyncRFM69(object):
+    def __init__(self, radio, loop = None):
+        self.radio = radio
+        self.loop = loop if loop is not None else asyncio.get_running_loop()
+        self.frameReady = asyncio.Event()
+        self.closed = False
+        # a single worker keeps this radio's SPI traffic in order, and off the loop thread
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers = 1)
+        radio.onFrame = self.notify
+        # arm the receiver; sendFrame() leaves it in RX after every transmission
+        self.executor.submit(radio.receiveBegin)
+
+    # interrupt thread
+    def notify(self):
+        if not self.closed:
+            self.loop.call_soon_threadsafe(self.frameReady.set)
+
+    def pop(self):
+        with self.radio.rxCond:
+            return self.radio.rxQueue.popleft() if self.radio.rxQueue else None
+
+    async def run(self, fn, *args):
+        return await self.loop.run_in_executor(self.executor, fn, *args)
+
+    async def send(self, toAddress, buff = "", requestACK = False):
+        await self.run(self.radio.send, toAddress, buff, requestACK)
+
+    async def sendACK(self, toAddress = 0, buff = "", seq = None):
+        await self.run(self.radio.sendACK, toAddress, buff, seq)
+
+    # Send with an ACK request and return the ACK Frame, or None after `timeout` seconds
+    async def sendAcked(self, toAddress, buff, timeout):
+        return await self.run(self.radio.sendAcked, toAddress, buff, timeout)
+
+    # RFM69.sendReliable(): the ACK Frame, or None once every retry went unanswered
+    async def sendReliable(self, toAddress, buff, retries = 3):
+        return await self.run(self.radio.sendReliable, toAddress, buff, retries)
+
+    # Next received Frame, or None after `timeout` seconds (None waits forever) or once closed
+    async def recv(self, timeout = None):
+        deadline = None if timeout is None else self.loop.time() + timeout
+        while not self.closed:
+            # clear before looking, so a frame queued in between still sets the event
+            self.frameReady.clear()
+            frame = self.pop()
+            if frame is not None:
+                return frame
+            try:
+                if deadline is None:
+                    await self.frameReady.wait()
+                else:
+                    await asyncio.wait_for(self.frameReady.wait(), max(0, deadline - self.loop.time()))
+            except asyncio.TimeoutError:
+                return self.pop()
+        return None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        frame = await self.recv()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+    # Detach from the radio and end any `async for`; pending sends finish first
+    def close(self):
+        self.closed = True
+        self.radio.onFrame = None
+        self.frameReady.set()
+        self.executor.shutdown(wait = False)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+# Where the driver's SPI transfers and pin events go. A backend has a `gpio` attribute
+# with the RPi.GPIO calls the driver makes (setmode, setup, output, add_event_detect,
+# remove_event_detect, cleanup and the pin constants) and an openSpi(bus, device) that
+# returns a spidev.SpiDev-like object (xfer, xfer2, writebytes2, max_speed_hz, close).
+#
+# HardwareBackend is the Pi: spidev and RPi.GPIO are only imported when the first radio is
+# created on it, so RFM69 itself imports on any machine. RFM69sim.SimBackend runs the same
+# driver against simulated chips; RFM69sim.install() makes it the default.
+
+_default = None
+
+
+class HardwareBackend(object):
+    def __init__(self):
+        import spidev
+        # For Orange Pi: import OPi.GPIO as GPIO (pip install OrangePi.GPIO)
+        import RPi.GPIO as GPIO
+        self.spidev = spidev
+        self.gpio = GPIO
+
+    def openSpi(self, bus, device):
+        spi = self.spidev.SpiDev()
+        spi.open(bus, device)
+        return spi
+
+
+# Backend used by radios created without one
+def default():
+    global _default
+    if _default is None:
+        _default = HardwareBackend()
+    return _default
+
+
+def setDefault(backend):
+    global _default
+    _default = backend
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+
+# Exact time on air and duty-cycle pacing for one RFM69. Airtime decodes the modem
+# registers the chip is running with: bit rate, preamble length, sync word on/size, fixed
+# or variable length, CRC, Manchester coding, AES padding and the PA ramp, so frameTime()
+# is what the frame really costs on air, not a nominal figure. With the shadow enabled
+# (RFM69(..., shadowRegs = True)) that costs no SPI at all, otherwise one burst read, which
+# update() only repeats after setProfile(), setLongPackets() or encrypt(): refresh() by
+# hand after retuning a radio without the shadow.
+#
+# A Scheduler sends through its radio and keeps, per regulatory sub-band, a record of
+# every frame it put on air in the last `window` seconds. Before each frame it works out
+# the earliest moment the frame can start without any window ending after it going over
+# the sub-band's limit, sleeps until then and sends. Where no limit applies (bands = ())
+# it only keeps minGap (MIN_FRAME_GAP_S by default) after every frame. A signal that is
+# not wholly inside one of `bands`, carrier +/- (Fdev + BR/2), raises DutyCycleError
+# rather than going out unpaced or spilling into the next sub-band. Frames
+# the radio sends by itself (auto-ACKs) are not seen, record() them if they matter.
+#
+#   pacer = Scheduler(radio868)                # EU_BANDS; pass bands = () where no limit applies
+#   send_packet(pkt, pacer, OTHERNODE)         # pacer.send() has RFM69.send()'s signature
+#   pacer.stats()
+
+import collections
+import time
+
+from RFM69registers import *
+from RFM69profiles import FSTEP, FXOSC, PA_RAMP_S
+
+# Modem registers Airtime decodes, read in one burst when the shadow cannot supply them
+AIRTIME_FIRST = REG_DATAMODUL
+AIRTIME_LAST = REG_PACKETCONFIG2
+AIRTIME_REGS = [REG_DATAMODUL, REG_BITRATEMSB, REG_BITRATELSB, REG_FDEVMSB, REG_FDEVLSB, REG_FRFMSB, REG_FRFMID, REG_FRFLSB, REG_PARAMP,
+                REG_PREAMBLEMSB, REG_PREAMBLELSB, REG_SYNCCONFIG, REG_PACKETCONFIG1, REG_PAYLOADLENGTH,
+                REG_PACKETCONFIG2]
+
+# Bytes the driver puts after the length byte ahead of the data: target, sender, CTL
+FRAME_HEADER = 3
+
+# (first Hz, last Hz, fraction of the window on air) for the sub-bands of ERC
+# Recommendation 70-03 annex 1 (non-specific short range devices) without LBT+AFA. A
+# signal counts in a sub-band only if all of it is inside: 868.0 MHz at 250 kbps
+# (+/- 200 kHz) straddles two and fits neither.
+EU_BANDS = [
+    (433050000, 434790000, 0.10),
+    (863000000, 865000000, 0.001),
+    (865000000, 868000000, 0.01),
+    (868000000, 868600000, 0.01),
+    (868700000, 869200000, 0.001),
+    (869400000, 869650000, 0.10),
+    (869700000, 870000000, 0.01),
+]
+
+# ETSI EN 300 220 measures duty cycle over one hour
+DUTY_CYCLE_WINDOW_S = 3600.0
+
+# Seconds a Scheduler leaves between the end of one frame and the start of the next
+# whatever the band: the receiver's PayloadReady latency plus its FIFO drain and re-arm,
+# before which the chip does not look for the next sync word and the frame is lost
+MIN_FRAME_GAP_S = 0.001
+
+
+class DutyCycleError(ValueError):
+    pass
+
+
+# The (first, last, limit) entry of `bands` that holds freqHz +/- halfWidth, or None
+def subBand(freqHz, bands = EU_BANDS, halfWidth = 0):
+    for band in bands:
+        if band[0] <= freqHz - halfWidth and freqHz + halfWidth < band[1]:
+            return band
+    return None
+
+
+class Airtime(object):
+    def __init__(self, radio):
+        self.radio = radio
+        self.refresh()
+
+    # The driver settings that change the registers decoded here
+    def settings(self):
+        radio = self.radio
+        return (radio.profile, radio.longPackets, radio.aesKey)
+
+    # refresh() if the registers may have changed: always from the shadow, where it costs no
+    # SPI, otherwise only once settings() differ from the last decode
+    def update(self):
+        if self.radio.shadow or self.settings() != self.decoded:
+            self.refresh()
+
+    # Decode the modem settings from the shadow if it holds them all, else from one burst read
+    def refresh(self):
+        self.decoded = self.settings()
+        shadow = self.radio.shadow
+        if shadow and all(reg in shadow for reg in AIRTIME_REGS):
+            regs = shadow
+        else:
+            regs = dict(enumerate(self.radio.readRegs(AIRTIME_FIRST, AIRTIME_LAST - AIRTIME_FIRST + 1), AIRTIME_FIRST))
+        self.bitrate = FXOSC / ((regs[REG_BITRATEMSB] << 8) | regs[REG_BITRATELSB])
+        self.fdev = (((regs[REG_FDEVMSB] & 0x3F) << 8) | regs[REG_FDEVLSB]) * FSTEP
+        self.frequency = ((regs[REG_FRFMSB] << 16) | (regs[REG_FRFMID] << 8) | regs[REG_FRFLSB]) * FSTEP
+        self.ramp = PA_RAMP_S[regs[REG_PARAMP] & 0x0F]
+        self.preamble = (regs[REG_PREAMBLEMSB] << 8) | regs[REG_PREAMBLELSB]
+        sync = regs[REG_SYNCCONFIG]
+        self.sync = ((sync >> 3) & 0x07) + 1 if sync & RF_SYNC_ON else 0
+        config = regs[REG_PACKETCONFIG1]
+        self.variable = bool(config & RF_PACKET1_FORMAT_VARIABLE)
+        self.payloadLength = regs[REG_PAYLOADLENGTH]
+        self.manchester = config & 0x60 == RF_PACKET1_DCFREE_MANCHESTER
+        self.crc = 2 if config & RF_PACKET1_CRC_ON else 0
+        self.addressFiltering = bool(config & 0x06)
+        self.aes = bool(regs[REG_PACKETCONFIG2] & RF_PACKET2_AES_ON)
+
+    # Hz the signal takes up either side of the carrier (Carson's rule)
+    def halfBandwidth(self):
+        return self.fdev + self.bitrate / 2
+
+    # Bytes after the sync word for a frame carrying `nbytes` of data: length byte, header,
+    # data (padded to whole AES blocks, the address byte staying in the clear) and CRC
+    def frameBytes(self, nbytes):
+        payload = FRAME_HEADER + nbytes if self.variable else self.payloadLength
+        if self.aes:
+            clear = 1 if self.addressFiltering else 0
+            payload = clear + (payload - clear + 15) // 16 * 16
+        return (1 if self.variable else 0) + payload + self.crc
+
+    # Seconds the transmitter is on for a frame carrying `nbytes` of data. Manchester
+    # coding doubles everything after the sync word.
+    def frameTime(self, nbytes):
+        coded = self.frameBytes(nbytes) * (2 if self.manchester else 1)
+        return (self.preamble + self.sync + coded) * 8 / self.bitrate + 2 * self.ramp
+
+
+# Sliding-window airtime budget for one sub-band: at most `limit` of any `window` seconds on air
+class DutyCycle(object):
+    def __init__(self, limit, window = DUTY_CYCLE_WINDOW_S):
+        self.limit = limit
+        self.window = window
+        # (start, seconds on air), oldest first
+        self.sends = collections.deque()
+        self.used = 0.0
+
+    def expire(self, now):
+        while self.sends and self.sends[0][0] + self.sends[0][1] <= now - self.window:
+            self.used -= self.sends.popleft()[1]
+
+    def add(self, start, duration):
+        self.sends.append((start, duration))
+        self.used += duration
+
+    # Seconds from `now` until a frame of `duration` can start: once it has gone out, the
+    # window ending with it must not hold more than limit * window. Frames already sent
+    # drop out of that window as it slides, the newest last.
+    def delay(self, duration, now):
+        spare = self.limit * self.window - duration
+        if spare < 0:
+            raise DutyCycleError("a %.1f ms frame is more than %.2f%% of a %.0f s window"
+                                 % (duration * 1000, self.limit * 100, self.window))
+        self.expire(now)
+        if self.used <= spare:
+            return 0.0
+        counted = 0.0
+        for start, length in reversed(self.sends):
+            if counted + length > spare:
+                # the window may take in at most `spare - counted` seconds of this frame
+                windowStart = start + length - (spare - counted)
+                return max(0.0, windowStart + self.window - duration - now)
+            counted += length
+        return 0.0
+
+    # Fraction of the window ending at `now` spent on air
+    def utilisation(self, now):
+        self.expire(now)
+        since = now - self.window
+        return sum(length - max(0.0, since - start) for start, length in self.sends) / self.window
+
+
+class Scheduler(object):
+    def __init__(self, radio, bands = EU_BANDS, window = DUTY_CYCLE_WINDOW_S, minGap = MIN_FRAME_GAP_S):
+        self.radio = radio
+        self.bands = bands
+        self.window = window
+        # seconds kept free after every frame whatever the band, for the receiver
+        self.minGap = minGap
+        self.airtime = Airtime(radio)
+        # DutyCycle per sub-band, created on first use
+        self.budgets = {}
+        self.lastEnd = 0.0
+        self.frames = 0
+        self.onAir = 0.0
+        self.waited = 0.0
+
+    # DutyCycle for the sub-band the radio is tuned to, or None if no limit applies
+    def budget(self):
+        if not self.bands:
+            return None
+        airtime = self.airtime
+        band = subBand(airtime.frequency, self.bands, airtime.halfBandwidth())
+        if band is None:
+            raise DutyCycleError("%.3f MHz +/- %.0f kHz is not inside any one sub-band this Scheduler paces"
+                                 % (airtime.frequency / 1e6, airtime.halfBandwidth() / 1e3))
+        if band not in self.budgets:
+            self.budgets[band] = DutyCycle(band[2], self.window)
+        return self.budgets[band]
+
+    # Seconds to wait before a frame of `duration` may go out
+    def delay(self, duration, now = None):
+        now = time.monotonic() if now is None else now
+        wait = max(0.0, self.lastEnd + self.minGap - now)
+        budget = self.budget()
+        if budget is not None:
+            wait = max(wait, budget.delay(duration, now + wait))
+        return wait
+
+    # Count a frame that has just finished on air against the current sub-band
+    def record(self, duration, end = None):
+        end = time.monotonic() if end is None else end
+        budget = self.budget()
+        if budget is not None:
+            budget.add(end - duration, duration)
+        self.lastEnd = end
+        self.frames += 1
+        self.onAir += duration
+
+    # Drop-in for RFM69.send(): waits as long as the sub-band's duty cycle requires, then sends
+    def send(self, toAddress, buff = "", requestACK = False):
+        self.airtime.update()
+        duration = self.airtime.frameTime(min(len(buff), self.radio.maxDataLen))
+        wait = self.delay(duration)
+        if wait > 0:
+            time.sleep(wait)
+            self.waited += wait
+        self.radio.send(toAddress, buff, requestACK)
+        # send() returns once PacketSent is in, so the frame ended just now
+        self.record(duration)
+
+    def stats(self):
+        now = time.monotonic()
+        return {"frames": self.frames, "onAir": self.onAir, "waited": self.waited,
+                "utilisation": dict(("%.3f-%.3f MHz" % (band[0] / 1e6, band[1] / 1e6), budget.utilisation(now))
+                                    for band, budget in self.budgets.items())}
+
+
+# The Scheduler for `radio`, created on first use and kept as radio.scheduler, so every
+# send through the radio shares one budget: for scripts that pass bare radios around.
+# Asking again with other bands raises DutyCycleError rather than pacing to the first ones.
+def schedulerFor(radio, bands = EU_BANDS):
+    if radio.scheduler is None:
+        radio.scheduler = Scheduler(radio, bands)
+    elif list(radio.scheduler.bands) != list(bands):
+        raise DutyCycleError("this radio's Scheduler already paces other bands")
+    return radio.scheduler
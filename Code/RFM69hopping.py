@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+
+# Frequency hopping for one RFM69 link. Both ends build the same ChannelPlan (a band's
+# channels and a hop sequence shuffled from a shared seed) and start on its first, home,
+# channel. Every data frame carries a 2-byte header: the channel the receiver should
+# listen on next, and a frame number for dropping repeats. The receiver retunes to that
+# channel from the interrupt, right after its auto-ACK went out on the current one, so it
+# is always on either the sender's current or its announced next channel; the sender
+# alternates its retries between the two and moves on once a frame is ACKed. A receiver
+# that hears nothing on its new channel for fallbackTime seconds goes back to the channel
+# it last heard a frame on, and from fallbackTime after its last ACK the sender tries
+# that channel first, so a jammed hop costs one fallbackTime rather than a silenceTimeout.
+# A Hopper drives one direction of a link, as the TwinRF69 gives each direction its own
+# radio.
+#
+# The sender keeps the loss rate of every channel from its ACKs and leaves out of the hop
+# sequence any channel that crosses lossThreshold, for blacklistTime seconds. A failed
+# attempt only counts against a channel while the receiver must still be on it: the
+# current channel before fallbackTime is up, never the announced next one. Only the
+# sender needs to know: the receiver just follows the announcements. After
+# silenceTimeout seconds without an ACK (sender) or a frame (receiver) both ends go back
+# to the home channel.
+#
+# Sender:   hopper = Hopper(radio433, OTHERNODE, channelPlan(RF69_433MHZ, LINK_SEED, radio433.profile))
+#           hopper.send(payload)             # True once ACKed
+# Receiver: hopper = Hopper(radio433, OTHERNODE, channelPlan(RF69_433MHZ, LINK_SEED, radio433.profile))
+#           hopper.listen()                  # auto-ACK, and follow hops from the interrupt
+#           frame = hopper.receive(timeout)  # Frame with the header stripped, or None
+#
+# Channels are laid out for the link's modem profile. The SX1231's RxBw is single-sided,
+# so the filter passes the carrier +/- RxBw: channels are 2 x RxBw + Fdev apart and the
+# first sits half a spacing inside the band edge, so no channel's filter overlaps its
+# neighbour's or reaches out of the band. Each retune is the single FRF burst of
+# RFM69.setFrequency(), plus an RX restart while listening (a new FRF only takes effect
+# in RX once the receiver restarts).
+
+import collections
+import math
+import random
+import struct
+import time
+
+from RFM69registers import *
+from RFM69profiles import PROFILES
+
+# (first Hz, last Hz) of the ISM allocation each band's channels are laid out in
+CHANNEL_BANDS = {
+    RF69_433MHZ: (433050000, 434790000),
+    RF69_915MHZ: (902000000, 928000000),
+}
+
+# Channel spacings are rounded up to this raster
+CHANNEL_RASTER_HZ = 25000
+
+# next channel, frame number
+HOP_HEADER = struct.Struct(">BB")
+
+# Seconds the sender waits after an ACK before its first frame on the new channel: the
+# receiver only retunes once its ACK has gone out and PacketSent has been seen, a little
+# after the sender already has that ACK
+HOP_GUARD_S = 0.002
+
+# Seconds without a frame on an announced channel before the receiver goes back to the
+# channel it last heard one on: a few RTO_MIN_S attempts. Both ends of a link must agree.
+HOP_FALLBACK_S = 0.1
+
+
+class ChannelPlan(object):
+    def __init__(self, first, spacing, count, seed = 0):
+        self.channels = [first + i * spacing for i in range(count)]
+        self.sequence = list(range(count))
+        random.Random(seed).shuffle(self.sequence)
+
+    def frequency(self, channel):
+        return self.channels[channel]
+
+    # channel every link on this plan starts on, and falls back to
+    def home(self):
+        return self.sequence[0]
+
+
+# Channel plan for `profile` (an RFM69profiles.Profile, normally radio.profile) across
+# `freqBand`. Without one the plan is spaced for the widest preset, so it holds whatever
+# profile the link switches to.
+def channelPlan(freqBand, seed = 0, profile = None):
+    low, high = CHANNEL_BANDS[freqBand]
+    if profile is None:
+        profile = max(PROFILES.values(), key = lambda p: 2 * p.rxBw + p.fdev)
+    spacing = int(math.ceil((2 * profile.rxBw + profile.fdev) / CHANNEL_RASTER_HZ)) * CHANNEL_RASTER_HZ
+    count = (high - low) // spacing
+    if count < 2:
+        raise ValueError("%s leaves %d channel(s) of %.0f kHz between %.3f and %.3f MHz"
+                         % (profile.name, count, spacing / 1000.0, low / 1e6, high / 1e6))
+    return ChannelPlan(low + spacing // 2, spacing, count, seed)
+
+
+class Hopper(object):
+    def __init__(self, radio, peer, plan, retries = 4, window = 16, minSamples = 6, lossThreshold = 0.5,
+                 blacklistTime = 10.0, minChannels = 2, silenceTimeout = 2.0, guard = HOP_GUARD_S,
+                 fallbackTime = HOP_FALLBACK_S):
+        self.radio = radio
+        self.peer = peer
+        self.plan = plan
+        self.retries = retries
+        # loss rate per channel over its last `window` attempts; a channel is blacklisted once
+        # it has minSamples and a loss rate above lossThreshold, but never below minChannels left
+        self.window = window
+        self.minSamples = minSamples
+        self.lossThreshold = lossThreshold
+        self.blacklistTime = blacklistTime
+        self.minChannels = minChannels
+        self.silenceTimeout = silenceTimeout
+        self.guard = guard
+        self.fallbackTime = fallbackTime
+        self.hoppedAt = None
+        self.outcomes = dict((channel, collections.deque(maxlen = window)) for channel in range(len(plan.channels)))
+        # channel -> monotonic time it comes off the blacklist
+        self.blacklist = {}
+        self.tuned = None
+        self.frameNo = 0
+        self.lastFrameNo = None
+        self.retunes = 0
+        self.blacklisted = 0
+        self.failures = 0
+        self.duplicates = 0
+        self.fallbacks = 0
+        self.goHome()
+
+    def goHome(self):
+        self.channel = self.plan.home()
+        # channel the last frame was heard (receiver) or ACKed (sender) on
+        self.previous = self.channel
+        self.position = 0
+        self.next = None
+        self.hoppedAt = None
+        self.lastHeard = time.monotonic()
+        self.tune(self.channel)
+
+    def tune(self, channel):
+        if channel == self.tuned:
+            return
+        self.radio.setFrequency(self.plan.frequency(channel))
+        if self.radio.mode == RF69_MODE_RX:
+            self.radio.updateReg(REG_PACKETCONFIG2, 0xFB, RF_PACKET2_RXRESTART)
+        self.tuned = channel
+        self.retunes += 1
+
+    def usable(self, channel):
+        until = self.blacklist.get(channel)
+        if until is not None and time.monotonic() >= until:
+            del self.blacklist[channel]
+            self.outcomes[channel].clear()
+            until = None
+        return until is None
+
+    # Next channel of the hop sequence that is not blacklisted, other than the current one
+    def nextChannel(self):
+        sequence = self.plan.sequence
+        for i in range(len(sequence)):
+            self.position = (self.position + 1) % len(sequence)
+            channel = sequence[self.position]
+            if channel != self.channel and self.usable(channel):
+                return channel
+        return self.channel
+
+    def lossRate(self, channel):
+        outcomes = self.outcomes[channel]
+        if not outcomes:
+            return 0.0
+        return 1.0 - sum(outcomes) / float(len(outcomes))
+
+    def record(self, channel, delivered):
+        outcomes = self.outcomes[channel]
+        outcomes.append(delivered)
+        if channel in self.blacklist or len(outcomes) < self.minSamples or self.lossRate(channel) <= self.lossThreshold:
+            return
+        if len(self.plan.channels) - len(self.blacklist) > self.minChannels:
+            self.blacklist[channel] = time.monotonic() + self.blacklistTime
+            self.blacklisted += 1
+
+    # ---- sending side ----
+
+    # Send `buff` (up to maxDataLen - HOP_HEADER.size bytes) with an ACK request, hopping
+    # as described above. Returns True once ACKed.
+    def send(self, buff):
+        if time.monotonic() - self.lastHeard > self.silenceTimeout:
+            self.goHome()
+        if self.next is None:
+            self.next = self.nextChannel()
+        self.frameNo = (self.frameNo + 1) & 0xFF
+        data = HOP_HEADER.pack(self.next, self.frameNo) + bytes(buff)
+        if self.hoppedAt is not None:
+            wait = self.hoppedAt + self.guard - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        for attempt in range(self.retries + 1):
+            fallback = self.fellBack()
+            if fallback:
+                # back on previous unless a frame got through on channel (and its ACK was
+                # lost), in which case it is on next or has fallen back from there
+                candidates = [self.previous, self.next, self.channel]
+            else:
+                candidates = [self.channel, self.next]
+            candidates = sorted(set(candidates), key=candidates.index)
+            channel = candidates[attempt % len(candidates)]
+            self.tune(channel)
+            ack = self.radio.sendReliable(self.peer, data, 0)
+            if ack is not None:
+                self.record(channel, True)
+                self.lastHeard = self.hoppedAt = time.monotonic()
+                self.previous = channel
+                self.channel = self.next
+                self.next = None
+                return True
+            if channel == self.channel and not fallback and not self.fellBack():
+                self.record(channel, False)
+        self.failures += 1
+        return False
+
+    # True once the receiver may have given up on the channel announced by the last ACKed
+    # frame and gone back to the one that frame was sent on
+    def fellBack(self):
+        return self.hoppedAt is not None and time.monotonic() - self.hoppedAt >= self.fallbackTime
+
+    # ---- receiving side ----
+
+    def listen(self):
+        self.radio.setAutoAck(True)
+        self.radio.frameHook = self.handleFrame
+
+    # Next frame from the peer with the hop header stripped, or None after `timeout`
+    # seconds (None waits forever). Frames from other nodes are returned untouched.
+    # Also takes the receiver back to the channel it last heard the sender on after
+    # fallbackTime, and home once the sender has been silent for silenceTimeout.
+    def receive(self, timeout = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.silenceTimeout
+            if self.channel != self.previous:
+                wait = max(0.0, min(wait, self.lastHeard + self.fallbackTime - time.monotonic()))
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return None
+            frame = self.radio.receive(timeout = wait)
+            if frame is not None:
+                return frame
+            silent = time.monotonic() - self.lastHeard
+            if silent > self.silenceTimeout and self.channel != self.plan.home():
+                self.goHome()
+            elif silent >= self.fallbackTime and self.channel != self.previous:
+                self.channel = self.previous
+                self.tune(self.previous)
+                self.fallbacks += 1
+
+    # RFM69.frameHook, on the interrupt thread after the auto-ACK: follow the hop announced
+    # in `frame`. Returns the frame with its header stripped, or None for a repeat.
+    def handleFrame(self, frame):
+        if frame.senderID != self.peer or len(frame.data) < HOP_HEADER.size:
+            return frame
+        nextChannel, frameNo = HOP_HEADER.unpack_from(frame.data)
+        self.lastHeard = time.monotonic()
+        if nextChannel < len(self.plan.channels):
+            self.previous = self.tuned
+            self.channel = nextChannel
+            self.tune(nextChannel)
+        if frameNo == self.lastFrameNo:
+            self.duplicates += 1
+            return None
+        self.lastFrameNo = frameNo
+        frame.data = frame.data[HOP_HEADER.size:]
+        return frame
+
+    def stats(self):
+        return {"channel": self.channel, "retunes": self.retunes, "failures": self.failures,
+                "duplicates": self.duplicates, "fallbacks": self.fallbacks, "blacklisted": self.blacklisted,
+                "blacklist": sorted(self.blacklist), "lossRate": dict((channel, self.lossRate(channel))
+                                                                    for channel in self.outcomes)}
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+# A shared RF medium for simulated RFM69s (RFM69sim), so two or more in-process nodes can
+# exchange frames through the unmodified driver. Each node is a SimBackend placed on the
+# medium at a position in metres:
+#
+#   medium = Medium(loss=0.05)
+#   node1 = RFM69sim.SimBackend(medium, (0, 0))
+#   node2 = RFM69sim.SimBackend(medium, (500, 0))
+#   radio = RFM69.RFM69(RF69_433MHZ, 1, 0, backend=node1)
+#
+# A transmission reaches every other chip tuned within its RxBw of the carrier (the SX1231
+# gives RxBw single-sided: the filter passes the carrier +/- RxBw), at the transmitter's
+# output power less log-distance path loss. The receiver locks on only if the sync word
+# comes through, and passes the CRC only if no bit of the frame is in error (bit error
+# rate of non-coherent 2-FSK at the frame's Eb/N0) and no other transmission on the
+# channel overlapped it within captureThreshold dB. `loss` drops a further fraction of
+# frames outright. timeScale stretches airtime so that a slow host still keeps up with
+# the FIFO; airtime and the counters are kept in unscaled radio time.
+
+import math
+import random
+import threading
+import time
+
+from RFM69profiles import NOISE_FIGURE
+
+SPEED_OF_LIGHT = 299792458.0
+
+# transmissions are kept this long (seconds, wall clock) to find overlaps
+HISTORY_S = 1.0
+
+
+class Transmission(object):
+    __slots__ = ("source", "tx", "freq", "power", "start", "end")
+
+    def __init__(self, source, tx, freq, power, start, end):
+        self.source = source
+        self.tx = tx
+        self.freq = freq
+        self.power = power
+        self.start = start
+        self.end = end
+
+
+class Medium(object):
+    def __init__(self, pathLossExponent=2.7, loss=0.0, captureThreshold=6.0, timeScale=1.0, seed=0):
+        self.pathLossExponent = pathLossExponent
+        self.loss = loss
+        self.captureThreshold = captureThreshold
+        self.timeScale = timeScale
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.positions = {}
+        self.history = []
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0
+        # seconds of radio time on air, per carrier frequency in Hz
+        self.airtime = {}
+        self.lost = 0
+        self.crcErrors = 0
+        self.collisions = 0
+
+    def attach(self, device, position):
+        self.positions[device] = position
+        device.medium = self
+        device.timeScale = self.timeScale
+        device.realtime = True
+
+    def move(self, device, position):
+        self.positions[device] = position
+
+    def distance(self, a, b):
+        (ax, ay), (bx, by) = self.positions[a], self.positions[b]
+        return math.hypot(ax - bx, ay - by)
+
+    def path_loss(self, a, b, freq):
+        # free space to 1 m, then log-distance
+        d = max(1.0, self.distance(a, b))
+        return 20 * math.log10(4 * math.pi * max(freq, 1.0) / SPEED_OF_LIGHT) + 10 * self.pathLossExponent * math.log10(d)
+
+    def rssi(self, transmission, device):
+        return transmission.power - self.path_loss(transmission.source, device, transmission.freq)
+
+    def tuned(self, device, freq):
+        return abs(device.frequency() - freq) <= device.rx_bandwidth()
+
+    def ber(self, device, rssi):
+        rxBw = device.rx_bandwidth()
+        snr = rssi - (-174 + 10 * math.log10(rxBw) + NOISE_FIGURE)
+        ebn0 = 10 ** (snr / 10.0) * rxBw / device.bitrate()
+        return 0.5 * math.exp(-ebn0 / 2)
+
+    # Called by a chip entering TX: put the frame on air and let every chip in range hear it
+    def transmit(self, source, tx):
+        freq = source.frequency()
+        nbytes = tx["total"] if tx["total"] is not None else source.FIFO_SIZE
+        airtime = source.airtime(nbytes)
+        transmission = Transmission(source, tx, freq, source.tx_power(), tx["start"], tx["start"] + airtime)
+        tx["transmission"] = transmission
+        with self.lock:
+            now = time.monotonic()
+            self.history = [t for t in self.history if t.end > now - HISTORY_S]
+            self.history.append(transmission)
+            self.frames += 1
+            self.airtime[freq] = self.airtime.get(freq, 0.0) + airtime / self.timeScale
+        for device in self.positions:
+            if device is not source and self.tuned(device, freq):
+                device.hear(tx, self.rssi(transmission, device))
+
+    # Strongest signal on air on the channel `device` listens to, in dBm (-inf if none)
+    def channel_rssi(self, device):
+        now = time.monotonic()
+        strongest = float("-inf")
+        with self.lock:
+            for t in self.history:
+                if t.start <= now < t.end and t.source is not device and self.tuned(device, t.freq):
+                    strongest = max(strongest, self.rssi(t, device))
+        return strongest
+
+    # Does the receiver pick up the sync word?
+    def syncs(self, device, tx, rssi):
+        transmission = tx.get("transmission")
+        if transmission is not None and not self.tuned(device, transmission.freq):
+            # retuned (a scan, a hop) since the frame started: the sync word never reaches it
+            return False
+        with self.lock:
+            if self.random.random() < self.loss:
+                self.lost += 1
+                return False
+            bits = 8 * device.overhead()
+            if self.random.random() > (1 - self.ber(device, rssi)) ** bits:
+                self.lost += 1
+                return False
+        return True
+
+    # Does the whole frame come through: no bit errors, and no overlapping transmission
+    # on the channel strong enough to corrupt it?
+    def crc_ok(self, device, tx, rssi):
+        transmission = tx.get("transmission")
+        with self.lock:
+            if transmission is not None:
+                for other in self.history:
+                    if other is transmission or other.source is device or not self.tuned(device, other.freq):
+                        continue
+                    if other.start < transmission.end and other.end > transmission.start and \
+                            rssi - self.rssi(other, device) < self.captureThreshold:
+                        self.collisions += 1
+                        return False
+            bits = 8 * (len(tx["sent"]) + 2)
+            if self.random.random() > (1 - self.ber(device, rssi)) ** bits:
+                self.crcErrors += 1
+                return False
+        return True
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# Closed-loop transmit power control for one RFM69 link. The peer puts the RSSI it heard
+# each frame at into the ACK (ackWithRssi()); the sender walks setOutputPower() down until
+# that RSSI sits targetMargin dB above the receiver's sensitivity, and jumps back up as
+# soon as frames go unacknowledged. Energy spent on air is accumulated so joules per
+# delivered byte can be compared against running at full power.
+#
+# Sender:   pc = PowerController(txRadio, OTHERNODE)
+#           send_packet(pkt, pc, OTHERNODE)   # pc.send() has RFM69.send()'s signature
+# Receiver: for every data frame with frame.ackRequested: ackWithRssi(rxRadio, frame),
+#           with auto-ACK off
+
+import struct
+
+from RFM69profiles import FRAME_OVERHEAD, sensitivity
+
+SUPPLY_VOLTAGE = 3.3
+
+# Supply current in mA while transmitting at a given output power (RFM69HW datasheet,
+# PA_BOOST pin), interpolated in between
+TX_CURRENT_MA = [(-2, 16.0), (0, 20.0), (10, 33.0), (13, 45.0), (17, 95.0), (20, 130.0)]
+RX_CURRENT_MA = 16.0
+
+
+def txCurrent(dBm):
+    points = TX_CURRENT_MA
+    if dBm <= points[0][0]:
+        return points[0][1]
+    for (p0, i0), (p1, i1) in zip(points, points[1:]):
+        if dBm <= p1:
+            return i0 + (i1 - i0) * (dBm - p0) / float(p1 - p0)
+    return points[-1][1]
+
+
+# ACK a frame with the RSSI it arrived at, one signed byte in dBm. With auto-ACK on, the
+# interrupt has already sent a bare ACK and sendACK() does nothing, so that raises ValueError.
+def ackWithRssi(radio, frame):
+    if radio.autoAck:
+        raise ValueError("auto-ACK is on: the ACK has gone out without the RSSI byte")
+    radio.sendACK(frame.senderID, struct.pack("b", max(-128, min(127, int(round(frame.rssi))))))
+
+
+class PowerController(object):
+    def __init__(self, radio, peer, targetMargin = 10.0, minPower = None, maxPower = 20, stepDown = 1,
+                 stepUp = 6):
+        self.radio = radio
+        self.peer = peer
+        # dB above the peer's sensitivity the peer should hear us at
+        self.targetMargin = targetMargin
+        self.minPower = minPower if minPower is not None else (-2 if radio.isRFM69HW else -18)
+        self.maxPower = maxPower if radio.isRFM69HW else min(maxPower, 13)
+        # the way down is gradual, the way up after a lost frame is not
+        self.stepDown = stepDown
+        self.stepUp = stepUp
+        self.peerRssi = None
+        self.lossStreak = 0
+        self.joules = 0.0
+        self.deliveredBytes = 0
+        self.frames = 0
+        self.delivered = 0
+        self.power = radio.setOutputPower(self.maxPower)
+
+    def bitrate(self):
+        profile = self.radio.profile
+        return profile.bitrate if profile is not None else self.radio.readBitrate()
+
+    def peerSensitivity(self):
+        # both ends run the same profile; without one, assume the CONFIG's 125 kHz RxBw
+        profile = self.radio.profile
+        return profile.sensitivity() if profile is not None else sensitivity(125000)
+
+    # Drop-in for RFM69.send(): every frame asks for an ACK carrying the peer's RSSI.
+    # Returns True if the frame was ACKed.
+    def send(self, toAddress, buff = "", requestACK = False):
+        bitrate = self.bitrate()
+        airtime = (len(buff) + FRAME_OVERHEAD) * 8 / bitrate
+        ackTime = (FRAME_OVERHEAD + 1) * 8 / bitrate
+        ack = self.radio.sendAcked(toAddress, buff, airtime + ackTime + 0.02)
+        self.joules += SUPPLY_VOLTAGE * (txCurrent(self.power) * airtime + RX_CURRENT_MA * ackTime) / 1000
+        self.frames += 1
+        peerRssi = None
+        if ack is not None:
+            self.delivered += 1
+            self.deliveredBytes += len(buff)
+            if len(ack.data) >= 1:
+                peerRssi = struct.unpack("b", ack.data[:1])[0]
+        self.record(ack is not None, peerRssi)
+        return ack is not None
+
+    def record(self, delivered, peerRssi = None):
+        if not delivered:
+            self.lossStreak += 1
+            # a second loss in a row means the estimate is stale: go straight to full power
+            self.setPower(self.maxPower if self.lossStreak > 1 else self.power + self.stepUp)
+            return
+        self.lossStreak = 0
+        if peerRssi is None:
+            return
+        self.peerRssi = peerRssi
+        excess = peerRssi - (self.peerSensitivity() + self.targetMargin)
+        if excess >= self.stepDown:
+            self.setPower(self.power - min(excess, self.stepDown))
+        elif excess < 0:
+            self.setPower(self.power - excess)
+
+    def setPower(self, dBm):
+        dBm = max(self.minPower, min(self.maxPower, dBm))
+        if dBm != self.power:
+            self.power = self.radio.setOutputPower(dBm)
+
+    def joulesPerByte(self):
+        return self.joules / self.deliveredBytes if self.deliveredBytes else None
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+# Modem profiles for the RFM69: the bitrate, frequency deviation, RX/AFC bandwidth,
+# Gaussian shaping and whitening registers computed from a bitrate and modulation index,
+# checked against the SX1231 FSK rules and applied by RFM69.setProfile() in one go.
+
+import math
+
+from RFM69registers import *
+
+FXOSC = 32000000.0
+FSTEP = FXOSC / (1 << 19)
+
+# (mantissa, register bits) for RxBw/AfcBw; bandwidth = FXOSC / (mant * 2^(exp + 2))
+BW_MANTISSAS = [(16, RF_RXBW_MANT_16), (20, RF_RXBW_MANT_20), (24, RF_RXBW_MANT_24)]
+
+# Receiver noise figure and the SNR 2-FSK needs for about 1% frame loss, in dB
+NOISE_FIGURE = 7.0
+REQUIRED_SNR = 10.0
+
+# Bytes sent around each frame's data: preamble 3, sync word 2, length 1, header 3, CRC 2
+FRAME_OVERHEAD = 11
+
+# PA ramp time in seconds for each PaRamp setting (RegPaRamp); the PA is on while it
+# ramps up before the preamble and down after the CRC
+PA_RAMP_S = [3.4e-3, 2e-3, 1e-3, 500e-6, 250e-6, 125e-6, 100e-6, 62e-6, 50e-6, 40e-6, 31e-6, 25e-6, 20e-6,
+             15e-6, 12e-6, 10e-6]
+
+# SX1231 wake-up times: the frequency synthesizer locking from standby (TS_FS), and the
+# transmitter from FS, 5 us plus 1.25 PA ramps (TS_TR)
+SYNTH_WAKEUP_S = 60e-6
+
+
+def txWakeup(paRamp):
+    return 5e-6 + 1.25 * PA_RAMP_S[paRamp & 0x0F]
+
+
+class ProfileError(ValueError):
+    pass
+
+
+# Estimated sensitivity in dBm of a receiver with a channel filter rxBw Hz wide
+def sensitivity(rxBw):
+    return -174 + 10 * math.log10(rxBw) + NOISE_FIGURE + REQUIRED_SNR
+
+
+# All (bandwidth in Hz, mantissa bits | exponent) settings, narrowest first
+BW_SETTINGS = sorted((FXOSC / (mant * (1 << (exp + 2))), bits | exp)
+                     for mant, bits in BW_MANTISSAS for exp in range(8))
+
+
+def bwSetting(minHz):
+    for hz, bits in BW_SETTINGS:
+        if hz >= minHz:
+            return hz, bits
+    raise ProfileError("no channel filter is %.0f Hz wide" % minHz)
+
+
+class Profile(object):
+    # bitrate in bit/s; modIndex h = 2 * Fdev / bitrate. shaping is one of the
+    # RF_DATAMODUL_MODULATIONSHAPING_* values (01 = Gaussian BT 1.0, 10 = BT 0.5).
+    def __init__(self, bitrate, modIndex = 1.0, shaping = RF_DATAMODUL_MODULATIONSHAPING_01,
+                 whitening = True, name = None):
+        if not 1200 <= bitrate <= 300000:
+            raise ProfileError("FSK bitrate must be 1.2 to 300 kbps, got %d" % bitrate)
+        if modIndex < 0.5:
+            raise ProfileError("modulation index %.2f is below 0.5" % modIndex)
+        self.name = name or "%gk" % (bitrate / 1000.0)
+        self.bitrateReg = int(round(FXOSC / bitrate))
+        self.bitrate = FXOSC / self.bitrateReg
+        # round the deviation up so h never ends up under what was asked for
+        self.fdevReg = int(math.ceil(modIndex * self.bitrate / 2 / FSTEP - 1e-9))
+        self.fdev = self.fdevReg * FSTEP
+        self.modIndex = 2 * self.fdev / self.bitrate
+        self.shaping = shaping
+        self.whitening = whitening
+        if self.fdevReg > 0x3FFF or self.fdev + self.bitrate / 2 > 500000:
+            raise ProfileError("Fdev + BR/2 = %.0f Hz exceeds 500 kHz" % (self.fdev + self.bitrate / 2))
+        # the channel filter must pass the whole deviated signal: RxBw >= Fdev + BR/2
+        self.rxBw, self.rxBwBits = bwSetting(self.fdev + self.bitrate / 2)
+        # AFC needs room to capture a carrier that is off by up to a channel width,
+        # so aim for twice RxBw and settle for anything strictly wider
+        wider = [s for s in BW_SETTINGS if s[0] > self.rxBw]
+        if not wider:
+            raise ProfileError("RxBw %.0f Hz leaves no wider AFC bandwidth" % self.rxBw)
+        self.afcBw, self.afcBwBits = ([s for s in wider if s[0] >= 2 * self.rxBw] or wider[-1:])[0]
+        self.check()
+
+    # The rules, checked on the values that will actually be written
+    def check(self):
+        if self.modIndex < 0.5:
+            raise ProfileError("%s: modulation index %.3f < 0.5" % (self.name, self.modIndex))
+        if self.rxBw < self.fdev + self.bitrate / 2:
+            raise ProfileError("%s: RxBw %.0f Hz < Fdev + BR/2" % (self.name, self.rxBw))
+        if self.afcBw <= self.rxBw:
+            raise ProfileError("%s: AfcBw %.0f Hz <= RxBw" % (self.name, self.afcBw))
+
+    # Registers in RFM69.CONFIG form. PACKETCONFIG1 is left out: it also carries CRC and
+    # address filtering, so setProfile() merges the DC-free bits into the live value.
+    def config(self):
+        return {
+            0x02: [REG_DATAMODUL, RF_DATAMODUL_DATAMODE_PACKET | RF_DATAMODUL_MODULATIONTYPE_FSK | self.shaping],
+            0x03: [REG_BITRATEMSB, self.bitrateReg >> 8],
+            0x04: [REG_BITRATELSB, self.bitrateReg & 0xFF],
+            0x05: [REG_FDEVMSB, self.fdevReg >> 8],
+            0x06: [REG_FDEVLSB, self.fdevReg & 0xFF],
+            0x19: [REG_RXBW, RF_RXBW_DCCFREQ_010 | self.rxBwBits],
+            0x1A: [REG_AFCBW, RF_AFCBW_DCCFREQAFC_100 | self.afcBwBits],
+        }
+
+    def sensitivity(self):
+        return sensitivity(self.rxBw)
+
+    # Seconds on air for a frame carrying nbytes of data
+    def airtime(self, nbytes):
+        return (nbytes + FRAME_OVERHEAD) * 8 / self.bitrate
+
+    def dcFree(self):
+        return RF_PACKET1_DCFREE_WHITENING if self.whitening else RF_PACKET1_DCFREE_OFF
+
+    def __repr__(self):
+        return "Profile(%s: BR=%.1fkbps Fdev=%.1fkHz h=%.2f RxBw=%.1fkHz AfcBw=%.1fkHz)" % (
+            self.name, self.bitrate / 1000, self.fdev / 1000, self.modIndex, self.rxBw / 1000, self.afcBw / 1000)
+
+
+# Presets from long range to high throughput. Low rates use h = 2 so the deviation stays
+# well clear of crystal offsets; fast ones sit near h = 0.5 to keep RxBw under 500 kHz.
+PROFILES = dict((p.name, p) for p in [
+    Profile(4800, 2.0, name = "4k8"),
+    Profile(9600, 2.0, name = "9k6"),
+    Profile(19200, 2.0, name = "19k2"),
+    Profile(38400, 1.0, name = "38k4"),
+    Profile(55555, 1.0, name = "55k5"),
+    Profile(100000, 1.0, name = "100k"),
+    Profile(150000, 0.67, name = "150k"),
+    Profile(200000, 0.5, RF_DATAMODUL_MODULATIONSHAPING_10, name = "200k"),
+    # the bridges' profile; their old 50 kHz deviation gave h = 0.4, below the 0.5 minimum
+    Profile(250000, 0.6, RF_DATAMODUL_MODULATIONSHAPING_10, name = "250k"),
+    Profile(300000, 0.5, RF_DATAMODUL_MODULATIONSHAPING_10, name = "300k"),
+])
+PROFILES["long_range"] = PROFILES["4k8"]
+PROFILES["high_throughput"] = PROFILES["250k"]
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+# Adaptive bitrate for one RFM69 link. The sending side tracks the delivery ratio and
+# ACK RSSI of its frames and walks a ladder of modem profiles; every change is agreed
+# with the peer through a switch message on a control radio (on the TwinRF69, the
+# 433 MHz radio kept on a robust profile) before either end retunes its data radio.
+#
+# Sender:   rc = RateController(txRadio, OTHERNODE, controlRadio=radio433)
+#           send_packet(pkt, rc, OTHERNODE)   # rc.send() has RFM69.send()'s signature
+# Receiver: rc = RateController(rxRadio, OTHERNODE, controlRadio=radio433)
+#           for every frame from the control radio: rc.handleFrame(frame)
+#           for every data frame: rc.heard(), and sendACK() it if frame.ackRequested;
+#           call rc.poll() now and then to fall back if the sender goes quiet
+
+import collections
+import struct
+import time
+
+from RFM69profiles import FRAME_OVERHEAD, PROFILES
+
+RATE_LADDER = ["9k6", "19k2", "55k5", "100k", "250k"]
+
+# Fragment header (MSGID, SEQ) of a rate switch: SEQ 1..N are data and 0xFFFF is END
+RATE_SWITCH_MSGID = 0
+RATE_SWITCH_SEQ = 0xFFFE
+
+# Weight of each new ACK RSSI in the running average
+RSSI_ALPHA = 0.25
+
+
+class RateController(object):
+    def __init__(self, radio, peer, ladder = RATE_LADDER, controlRadio = None, window = 32, minSamples = 8,
+                 downRatio = 0.7, upRatio = 0.9, upMargin = 6.0, holdoff = 0.5, fallbackAfter = 8,
+                 silenceTimeout = 5.0):
+        self.radio = radio
+        self.peer = peer
+        self.ladder = ladder
+        self.controlRadio = controlRadio if controlRadio is not None else radio
+        # outcome of the last `window` frames, True if ACKed
+        self.outcomes = collections.deque(maxlen = window)
+        self.minSamples = minSamples
+        self.downRatio = downRatio
+        self.upRatio = upRatio
+        # dB the ACK RSSI must clear the next profile's sensitivity by before stepping up
+        self.upMargin = upMargin
+        # seconds to stay on a profile before judging it
+        self.holdoff = holdoff
+        # consecutive losses after which the sender drops to the bottom rung on its own
+        self.fallbackAfter = fallbackAfter
+        # seconds without traffic after which the receiver drops to the bottom rung
+        self.silenceTimeout = silenceTimeout
+        self.rssi = None
+        self.lossStreak = 0
+        self.switches = 0
+        self.lastSwitch = 0.0
+        self.lastHeard = time.monotonic()
+        self.index = 0
+        self.apply(0)
+
+    def profile(self):
+        return PROFILES[self.ladder[self.index]]
+
+    def apply(self, index):
+        self.index = index
+        self.radio.setProfile(self.profile())
+        self.outcomes.clear()
+        self.lossStreak = 0
+        self.lastSwitch = self.lastHeard = time.monotonic()
+
+    def deliveryRatio(self):
+        if not self.outcomes:
+            return 1.0
+        return sum(self.outcomes) / float(len(self.outcomes))
+
+    # ---- sending side ----
+
+    # Drop-in for RFM69.send(): every frame asks for an ACK, and the outcome feeds the
+    # controller. Returns True if the frame was ACKed.
+    def send(self, toAddress, buff = "", requestACK = False):
+        profile = self.profile()
+        ack = self.radio.sendAcked(toAddress, buff, profile.airtime(len(buff)) + profile.airtime(0) + 0.02)
+        self.record(ack is not None, ack.rssi if ack is not None else None)
+        return ack is not None
+
+    def record(self, delivered, rssi = None):
+        self.outcomes.append(delivered)
+        self.lossStreak = 0 if delivered else self.lossStreak + 1
+        if rssi is not None:
+            self.rssi = rssi if self.rssi is None else self.rssi + RSSI_ALPHA * (rssi - self.rssi)
+        self.adapt()
+
+    # Highest rung whose sensitivity the running ACK RSSI clears by upMargin
+    def rssiTarget(self):
+        target = 0
+        for i, name in enumerate(self.ladder):
+            if self.rssi - PROFILES[name].sensitivity() >= self.upMargin:
+                target = i
+        return target
+
+    def adapt(self):
+        if self.lossStreak >= self.fallbackAfter and self.index > 0:
+            # the link is gone: try to agree on the bottom rung, and go there regardless,
+            # the peer follows once it has heard nothing for silenceTimeout
+            if not self.switch(0):
+                self.apply(0)
+            return
+        if len(self.outcomes) < self.minSamples or time.monotonic() - self.lastSwitch < self.holdoff:
+            return
+        ratio = self.deliveryRatio()
+        if ratio < self.downRatio and self.index > 0:
+            target = self.index - 1
+            if self.rssi is not None:
+                target = min(target, self.rssiTarget())
+            self.switch(target)
+        elif ratio >= self.upRatio and self.index + 1 < len(self.ladder):
+            # without RSSI probe one rung up; with it, go straight to what the margin allows
+            if self.rssi is None:
+                self.switch(self.index + 1)
+            elif self.rssiTarget() > self.index:
+                self.switch(self.rssiTarget())
+
+    # Agree the new rung with the peer over the control radio, then retune. Returns False,
+    # and stays put, if the peer never ACKs the switch.
+    def switch(self, index):
+        name = self.ladder[index]
+        msg = struct.pack(">HH", RATE_SWITCH_MSGID, RATE_SWITCH_SEQ) + name.encode("ascii")
+        roundTrip = (2 * FRAME_OVERHEAD + len(msg)) * 8 / self.controlRadio.readBitrate()
+        for attempt in range(3):
+            if self.controlRadio.sendAcked(self.peer, msg, roundTrip + 0.05) is not None:
+                self.apply(index)
+                self.switches += 1
+                return True
+        return False
+
+    # ---- receiving side ----
+
+    # Returns True if `frame` (from the control radio) was a rate switch, which is then ACKed
+    # and applied to the data radio.
+    def handleFrame(self, frame):
+        if len(frame.data) < 4 or struct.unpack(">HH", frame.data[:4]) != (RATE_SWITCH_MSGID, RATE_SWITCH_SEQ):
+            return False
+        name = frame.data[4:].decode("ascii", "replace")
+        if frame.ackRequested:
+            self.controlRadio.sendACK(frame.senderID)
+        if name in self.ladder and self.ladder.index(name) != self.index:
+            # a repeat after a lost ACK is only ACKed again
+            self.apply(self.ladder.index(name))
+            self.switches += 1
+        return True
+
+    def heard(self):
+        self.lastHeard = time.monotonic()
+
+    def poll(self):
+        if self.index > 0 and time.monotonic() - self.lastHeard > self.silenceTimeout:
+            self.apply(0)
@@ -1076,7 +1076,9 @@ RF69_433MHZ = 43
 RF69_868MHZ = 86
 RF69_915MHZ = 91
 
-RF69_MAX_DATA_LEN = 72 # to take advantage of the built in AES/CRC we want to limit the frame size to the internal FIFO size (66 bytes - 3 bytes overhead)
+RF69_MAX_DATA_LEN = 62 # to take advantage of the built in AES/CRC we want to limit the frame size to the internal FIFO size (66 bytes - length byte and 3 bytes overhead; the CRC is not stored)
+RF69_MAX_LONG_DATA_LEN = 252 # long-packet mode streams through the FIFO; the length byte caps a frame at 255 bytes (3 bytes overhead)
+RF69_FIFO_SIZE = 66
 
 CSMA_LIMIT = -90 # upper RX signal sensitivity threshold in dBm for carrier sense access
 RF69_MODE_SLEEP = 0 # XTAL OFF
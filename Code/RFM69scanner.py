@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+# RSSI spectrum scanner for choosing operating channels. Sweeps a list of frequencies with
+# one radio, taking a triggered RSSI reading on each, and keeps a per-channel histogram of
+# what it heard in NumPy arrays (2 dB bins, uint32 counts), from which it reports
+# occupancy and recommends the quietest channels. Needs numpy.
+#
+#   scanner = Scanner(radio433, channels(433050000, 434750000, 100000))
+#   scanner.scan(budget = 0.002)     # in an idle gap: as many channels as fit in 2 ms
+#   scanner.recommend(3)             # frequencies in Hz, quietest first
+#
+# scan() picks up where the last call stopped, and puts the radio back on its own
+# frequency and mode before returning, so sweeps can be spread over the gaps between
+# frames. It holds the radio's chipLock throughout, so a send or an RX drain never
+# interleaves with a sweep, and a frame caught on a scanned channel is cleared from the
+# FIFO before the lock is released rather than drained as the link's. Per channel it costs a 3-byte FRF burst, an RX restart and a burst read of
+# RSSICONFIG/RSSIVALUE until RssiDone; the chip's own PLL lock and RSSI sampling are the
+# only settle time unless `settle` asks for more.
+
+import time
+
+import numpy
+
+from RFM69registers import *
+from RFM69profiles import FSTEP
+
+# RSSIVALUE is -2 * dBm in one byte; a 2 dB bin is RSSIVALUE >> 2, covering 0..-127.5 dBm
+RSSI_BINS = 64
+
+
+# Frequencies from `first` to `last` Hz inclusive, `step` Hz apart
+def channels(first, last, step):
+    return numpy.arange(first, last + step / 2.0, step, dtype = numpy.float64)
+
+
+class Scanner(object):
+    def __init__(self, radio, freqs, busyThreshold = None, settle = 0.0):
+        self.radio = radio
+        self.freqs = numpy.asarray(freqs, dtype = numpy.float64)
+        # a reading above this (dBm) counts the channel as occupied; the radio's CCA level by default
+        self.busyThreshold = busyThreshold if busyThreshold is not None else radio.csmaThreshold
+        self.settle = settle
+        # FRF burst of every channel, built once
+        frf = numpy.rint(self.freqs / FSTEP).astype(numpy.uint32)
+        self.frf = [[(value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF] for value in frf.tolist()]
+        n = len(self.freqs)
+        self.hist = numpy.zeros((n, RSSI_BINS), dtype = numpy.uint32)
+        self.busy = numpy.zeros(n, dtype = numpy.uint32)
+        self.peak = numpy.full(n, -128, dtype = numpy.int16)
+        # seconds spent on each channel over all its samples
+        self.dwell = numpy.zeros(n, dtype = numpy.float64)
+        self.position = 0
+        self.sweeps = 0
+        # frames heard on a scanned channel and cleared from the FIFO
+        self.discarded = 0
+
+    def samples(self):
+        return self.hist.sum(axis = 1)
+
+    # fraction of readings above busyThreshold
+    def occupancy(self):
+        return self.busy / numpy.maximum(self.samples(), 1)
+
+    # mean reading per channel in dBm, from the histogram bin centres
+    def meanRssi(self):
+        centres = -(numpy.arange(RSSI_BINS) * 2.0 + 0.75)
+        counts = self.samples()
+        return numpy.where(counts > 0, self.hist @ centres / numpy.maximum(counts, 1), numpy.nan)
+
+    def sweepTime(self):
+        return self.dwell / numpy.maximum(self.samples(), 1)
+
+    # The `count` quietest channels (Hz): least occupied first, lower mean RSSI breaking ties.
+    # Channels never sampled are left out.
+    def recommend(self, count = 3):
+        sampled = numpy.flatnonzero(self.samples())
+        order = numpy.lexsort((self.meanRssi()[sampled], self.occupancy()[sampled]))
+        return self.freqs[sampled[order[:count]]].tolist()
+
+    def reset(self):
+        self.hist[:] = 0
+        self.busy[:] = 0
+        self.peak[:] = -128
+        self.dwell[:] = 0.0
+        self.position = 0
+        self.sweeps = 0
+
+    # Read the RSSI on channel i: retune, restart the receiver and trigger a measurement
+    def sample(self, i):
+        radio = self.radio
+        start = time.monotonic()
+        radio.writeRegs(REG_FRFMSB, self.frf[i])
+        radio.updateReg(REG_PACKETCONFIG2, 0xFB, RF_PACKET2_RXRESTART)
+        if self.settle:
+            time.sleep(self.settle)
+        radio.writeReg(REG_RSSICONFIG, RF_RSSI_START)
+        config, value = radio.readRegs(REG_RSSICONFIG, 2)
+        while not config & RF_RSSI_DONE:
+            config, value = radio.readRegs(REG_RSSICONFIG, 2)
+        self.hist[i, min(value >> 2, RSSI_BINS - 1)] += 1
+        rssi = -value >> 1
+        if rssi > self.busyThreshold:
+            self.busy[i] += 1
+        if rssi > self.peak[i]:
+            self.peak[i] = rssi
+        self.dwell[i] += time.monotonic() - start
+        return rssi
+
+    # Sample channels from where the last call stopped, until one full sweep is done or
+    # `budget` seconds are used up (at least one channel is always taken). The radio goes
+    # back to its own frequency and mode afterwards. Nothing is sampled while the radio is
+    # sending, draining or in the middle of receiving a frame. Returns the number of
+    # channels sampled.
+    def scan(self, budget = None):
+        radio = self.radio
+        # skip this gap rather than wait for a send or a drain to finish
+        if not radio.chipLock.acquire(False):
+            return 0
+        try:
+            return self.sweep(budget)
+        finally:
+            radio.chipLock.release()
+
+    # scan() with the chipLock held
+    def sweep(self, budget):
+        radio = self.radio
+        mode = radio.mode
+        if radio.txPending or mode == RF69_MODE_TX:
+            return 0
+        if mode == RF69_MODE_RX:
+            flags1, flags2 = radio.readRegs(REG_IRQFLAGS1, 2)
+            if flags1 & RF_IRQFLAGS1_SYNCADDRESSMATCH or flags2 & RF_IRQFLAGS2_PAYLOADREADY:
+                return 0
+        deadline = None if budget is None else time.monotonic() + budget
+        home = radio.readRegs(REG_FRFMSB, 3)
+        if mode != RF69_MODE_RX:
+            radio.setMode(RF69_MODE_RX)
+        done = 0
+        while done < len(self.frf):
+            self.sample(self.position)
+            done += 1
+            self.position += 1
+            if self.position == len(self.frf):
+                self.position = 0
+                self.sweeps += 1
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+        # a frame that came in on a scanned channel is not the link's: clear it before the
+        # interrupt, waiting on chipLock for its PayloadReady edge, can drain it
+        if radio.readReg(REG_IRQFLAGS2) & RF_IRQFLAGS2_PAYLOADREADY:
+            self.discarded += 1
+        radio.writeReg(REG_IRQFLAGS2, RF_IRQFLAGS2_FIFOOVERRUN)
+        radio.writeRegs(REG_FRFMSB, home)
+        if mode == RF69_MODE_RX:
+            radio.updateReg(REG_PACKETCONFIG2, 0xFB, RF_PACKET2_RXRESTART)
+        else:
+            radio.setMode(mode)
+        return done
+
+    # Per-channel summary: frequency (Hz), samples, occupancy, mean and peak RSSI (dBm) and
+    # mean seconds per reading, one dict per channel
+    def report(self):
+        samples, occupancy, mean, sweep = self.samples(), self.occupancy(), self.meanRssi(), self.sweepTime()
+        return [{"freq": self.freqs[i].item(), "samples": int(samples[i]), "occupancy": occupancy[i].item(),
+                 "meanRssi": mean[i].item(), "peakRssi": int(self.peak[i]), "sweepTime": sweep[i].item()}
+                for i in range(len(self.freqs))]
+
+
+# Quietest `count` channels for each radio, keyed by freqBand
+def recommendAll(scanners, count = 3):
+    return dict((scanner.radio.freqBand, scanner.recommend(count)) for scanner in scanners)
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+
+# In-process simulated RFM69s behind the driver's backend interface (see RFM69backend),
+# so the driver can be profiled and benchmarked off a Pi.
+#
+# install() makes SimBackend the default backend; RFM69(..., backend = SimBackend()) picks
+# it per radio. Every SpiDev.open() binds to a SimRFM69 register file keyed by
+# (bus, device), which counts SPI transactions and bytes clocked.
+#
+# A radio's interrupt callback is bound to its device when the driver registers it,
+# and DIO0 edges are delivered on a separate callback thread like RPi.GPIO's.
+# With realtime set, the FIFO drains (TX) or fills (RX) at the bit rate implied by the
+# bitrate registers, preamble and sync word, so FIFO underruns and overruns show up;
+# otherwise frames complete as soon as the host has written them. A frame goes on air once
+# the synthesizer has locked (unless TX was entered from FS) and the PA has ramped up.
+
+import math
+import queue
+import random
+import struct
+import sys
+import threading
+import time
+import types
+
+import RFM69backend
+from RFM69registers import *
+from RFM69profiles import FSTEP, FXOSC, SYNTH_WAKEUP_S, sensitivity, txWakeup
+
+# AutoModes setting the sequencer is modelled for: TX from an idle mode on FifoNotEmpty,
+# back on PacketSent
+AUTO_TX = RF_AUTOMODES_ENTER_FIFONOTEMPTY | RF_AUTOMODES_EXIT_PACKETSENT | RF_AUTOMODES_INTERMEDIATE_TRANSMITTER
+
+# Rough cost of one spidev ioctl on a Pi Zero plus the bytes clocked at 4 MHz
+SPI_TRANSACTION_OVERHEAD_S = 60e-6
+SPI_BYTE_TIME_S = 8 / 4000000.0
+
+devices = {}
+
+
+class SimRFM69(object):
+    FIFO_SIZE = 66
+
+    # the chip answers SPI this long after its reset line is released
+    STARTUP_TIME_S = 0.005
+
+    def __init__(self, rstPin=None):
+        self.lock = threading.RLock()
+        # reset line wired to this chip, see _gpio_module(); None if it is never reset
+        self.rstPin = rstPin
+        self.inReset = False
+        self.readyAt = 0.0
+        self.power_on_reset()
+        self.transactions = 0
+        self.bytes = 0
+        self.realtime = False
+        # devices that hear this one's transmissions, see link()
+        self.peers = []
+        self.dio0 = None
+        self.irqs = None
+        self.txUnderruns = 0
+        self.rxOverruns = 0
+        self.addrRejected = 0
+        # signal level of linked peers at this receiver, and the channel without them, in dBm
+        self.rssi = -60
+        self.noiseFloor = -114
+        # if set, linked peers are heard at their output power less this many dB instead
+        self.pathLoss = None
+        # frames lost on the air: too weak for the channel filter, or a modem mismatch
+        self.rxLost = 0
+        self.random = random.Random(0)
+        # shared channel this chip is on, see RFM69medium; None for link()ed devices.
+        # Airtime is stretched by timeScale so a slow host can keep up.
+        self.medium = None
+        self.timeScale = 1.0
+        # frames that reached the end but failed the CRC: bit errors or a collision
+        self.crcErrors = 0
+        # this chip's carrier offset in Hz (crystal error); the difference between two chips'
+        # offsets is what a receiver's FEI reports and its AFC corrects
+        self.freqError = 0.0
+        # fault injection: this many of the next DIO0 edges never reach the host
+        self.lostIrqs = 0
+        # frames whose sync went past while the packet handler was still busy with, or
+        # holding, the previous one
+        self.rxBusy = 0
+
+    def power_on_reset(self):
+        self.regs = bytearray(0x80)
+        self.regs[REG_OPMODE] = RF_OPMODE_STANDBY
+        self.regs[REG_BITRATEMSB] = RF_BITRATEMSB_4800
+        self.regs[REG_BITRATELSB] = RF_BITRATELSB_4800
+        self.regs[REG_VERSION] = 0x24
+        self.regs[REG_OSC1] = RF_OSC1_RCCAL_DONE
+        self.regs[REG_IRQFLAGS1] = RF_IRQFLAGS1_MODEREADY
+        # quiet channel: the -114 dBm noise floor. On a medium, RSSIVALUE follows whatever
+        # is on air at this chip while it listens, see read()
+        self.regs[REG_RSSIVALUE] = 0xE4
+        self.regs[REG_RXBW] = RF_RXBW_DCCFREQ_010 | RF_RXBW_MANT_24 | RF_RXBW_EXP_5
+        self.regs[REG_PARAMP] = RF_PARAMP_40
+        self.regs[REG_PREAMBLELSB] = 0x03
+        self.regs[REG_SYNCCONFIG] = 0x98
+        self.regs[REG_FIFOTHRESH] = RF_FIFOTHRESH_TXSTART_FIFONOTEMPTY | RF_FIFOTHRESH_VALUE
+        self.regs[REG_PAYLOADLENGTH] = 0x40
+        self.fifo = bytearray()
+        self.tx = None
+        self.rx = None
+        # in the AutoModes intermediate TX mode, RegOpMode still holding the idle mode
+        self.autoTx = False
+
+    # RST high holds the chip in reset; releasing it restores the register defaults and
+    # leaves SPI dead until STARTUP_TIME_S has passed
+    def set_reset(self, high):
+        with self.lock:
+            if high:
+                self.inReset = True
+                return
+            if self.inReset:
+                self.inReset = False
+                self.power_on_reset()
+                self.readyAt = time.monotonic() + self.STARTUP_TIME_S
+
+    def reset_counters(self):
+        self.transactions = 0
+        self.bytes = 0
+
+    def modelled_time(self):
+        return self.transactions * SPI_TRANSACTION_OVERHEAD_S + self.bytes * SPI_BYTE_TIME_S
+
+    def bitrate(self):
+        return 32000000.0 / ((self.regs[REG_BITRATEMSB] << 8) | self.regs[REG_BITRATELSB])
+
+    def byte_time(self):
+        return 8 / self.bitrate() * self.timeScale
+
+    def frequency(self):
+        return ((self.regs[REG_FRFMSB] << 16) | (self.regs[REG_FRFMID] << 8) | self.regs[REG_FRFLSB]) * FSTEP
+
+    def overhead(self):
+        # preamble and sync word bytes sent ahead of the length byte
+        preamble = (self.regs[REG_PREAMBLEMSB] << 8) | self.regs[REG_PREAMBLELSB]
+        return preamble + ((self.regs[REG_SYNCCONFIG] >> 3) & 0x07) + 1
+
+    def airtime(self, nbytes):
+        # nbytes counts the length byte onwards; the CRC adds two more
+        return (self.overhead() + nbytes + 2) * self.byte_time()
+
+    def mode(self):
+        return RF_OPMODE_TRANSMITTER if self.autoTx else self.regs[REG_OPMODE] & 0x1C
+
+    # seconds from entering TX out of mode `previous` until the preamble starts
+    def tx_wakeup(self, previous):
+        wakeup = txWakeup(self.regs[REG_PARAMP])
+        return wakeup if previous == RF_OPMODE_SYNTHESIZER else wakeup + SYNTH_WAKEUP_S
+
+    def dio0_mapping(self):
+        return self.regs[REG_DIOMAPPING1] >> 6
+
+    def raise_dio0(self):
+        # edges are delivered on one callback thread, like RPi.GPIO
+        if self.dio0 is None:
+            return
+        if self.lostIrqs > 0:
+            self.lostIrqs -= 1
+            return
+        if self.irqs is None:
+            self.irqs = queue.Queue()
+            threading.Thread(target=self._irq_worker, daemon=True).start()
+        self.irqs.put(self.dio0)
+
+    def _irq_worker(self):
+        while True:
+            self.irqs.get()()
+
+    # ---- transmitter: the FIFO drains at the bit rate once TX starts ----
+    #
+    # Both directions are evaluated lazily against the clock on every SPI access, plus
+    # one timer per frame edge, so a late host shows up as an underrun or overrun exactly
+    # as it would on the chip without the simulation needing threads of its own.
+
+    def start_tx(self, wakeup=0.0):
+        self.regs[REG_IRQFLAGS2] &= ~RF_IRQFLAGS2_PACKETSENT & 0xFF
+        # the length byte is already in the FIFO when TX is entered
+        total = self.fifo[0] + 1 if self.fifo else None
+        self.tx = {"start": time.monotonic() + wakeup, "sent": bytearray(), "total": total, "device": self}
+        for peer in self.peers:
+            peer.hear(self.tx)
+        if self.medium is not None:
+            self.medium.transmit(self, self.tx)
+        self._schedule(self.tx, self._tx_tick)
+
+    def _schedule(self, tx, fn, retry=False):
+        # run fn at the end of the frame, or right away outside real time; a retry waits
+        # for the host to finish writing the frame
+        delay = 0.001 if retry else 0
+        if self.realtime and tx["total"] is not None:
+            delay = max(delay, tx["start"] + self.airtime(tx["total"]) - time.monotonic())
+        timer = threading.Timer(delay, fn, args=(tx,))
+        timer.daemon = True
+        timer.start()
+
+    def _advance_tx(self):
+        tx = self.tx
+        if tx is None or self.mode() != RF_OPMODE_TRANSMITTER:
+            return
+        if self.realtime:
+            due = int((time.monotonic() - tx["start"]) / self.byte_time()) - self.overhead()
+        else:
+            due = 1 << 16
+        if tx["total"] is None and self.fifo:
+            tx["total"] = self.fifo[0] + 1
+        want = due - len(tx["sent"])
+        if tx["total"] is not None:
+            want = min(want, tx["total"] - len(tx["sent"]))
+        n = max(0, min(want, len(self.fifo)))
+        tx["sent"] += self.fifo[:n]
+        del self.fifo[:n]
+        if self.realtime and n < want and tx["total"] is not None:
+            # the modulator needed a byte the host had not written yet
+            self.txUnderruns += 1
+            tx["underrun"] = True
+            tx["sent"] += bytes(tx["total"] - len(tx["sent"]))
+
+    def _tx_tick(self, tx):
+        with self.lock:
+            if self.tx is not tx:
+                return
+            self._advance_tx()
+            if tx["total"] is None or len(tx["sent"]) < tx["total"]:
+                # outside real time the host may still be writing the frame
+                self._schedule(tx, self._tx_tick, retry=True)
+                return
+            self.tx = None
+            tx["done"] = True
+            self.regs[REG_IRQFLAGS2] |= RF_IRQFLAGS2_PACKETSENT
+            # DIO0 mapping 00 is PacketSent in TX mode
+            if self.dio0_mapping() == 0:
+                self.raise_dio0()
+            if self.autoTx:
+                # the sequencer goes back to the idle mode, which clears PacketSent again
+                self.autoTx = False
+                self.regs[REG_IRQFLAGS2] &= ~RF_IRQFLAGS2_PACKETSENT & 0xFF
+
+    # ---- receiver: frames fill the FIFO at the bit rate ----
+
+    def inject(self, payload, senderID=2, targetID=1, ctl=0, rssi=None):
+        frame = bytes([len(payload) + 3, targetID, senderID, ctl]) + bytes(payload)
+        # a frame from a transmitter outside the simulation, already complete
+        tx = {"start": time.monotonic(), "sent": bytearray(frame), "total": len(frame), "device": None, "done": True}
+        return self.hear(tx, rssi)
+
+    def hear(self, tx, rssi=None):
+        # a frame arriving over the air: the receiver locks on if it is in RX by the time
+        # the sync word has gone past. Called by the transmitter with its own lock held,
+        # so the receiver's lock is only taken once that is released.
+        if not self.realtime and tx.get("done"):
+            self._rx_sync(tx, rssi)
+            return True
+        sync = threading.Timer(max(0.0, tx["start"] - time.monotonic()) + self.overhead() * self.byte_time() if self.realtime else 0,
+                               self._rx_sync, args=(tx, rssi))
+        sync.daemon = True
+        sync.start()
+        return True
+
+    def hang_rx(self, rssi=-50):
+        # fault injection: the packet handler locks onto a frame that never ends, so
+        # SyncAddressMatch and the latched RSSI stay up and no PayloadReady comes until RX
+        # is restarted or left
+        with self.lock:
+            if self.mode() != RF_OPMODE_RECEIVER:
+                return
+            self.rx = {"tx": {"start": time.monotonic(), "sent": bytearray(), "total": None, "device": None},
+                       "pushed": 0, "rssi": rssi}
+            self.fifo = bytearray()
+            self.regs[REG_RSSIVALUE] = min(255, int(-2 * rssi))
+            self.regs[REG_IRQFLAGS1] |= RF_IRQFLAGS1_SYNCADDRESSMATCH
+
+    def _rx_sync(self, tx, rssi):
+        source = tx["device"]
+        if rssi is None:
+            rssi = self.rssi if self.pathLoss is None or source is None else source.tx_power() - self.pathLoss
+        with self.lock:
+            if self.mode() != RF_OPMODE_RECEIVER:
+                return
+            if self.rx is not None or self.regs[REG_IRQFLAGS2] & RF_IRQFLAGS2_PAYLOADREADY:
+                # the packet handler is busy with a frame, or holding one the host has
+                # not read yet: no new sync is looked for until then
+                self.rxBusy += 1
+                return
+            if source is not None and source.regs[REG_BITRATEMSB:REG_FDEVLSB + 1] != self.regs[REG_BITRATEMSB:REG_FDEVLSB + 1]:
+                # the two ends disagree on bitrate or deviation: nothing demodulates
+                self.rxLost += 1
+                return
+            if self.medium is not None:
+                if not self.medium.syncs(self, tx, rssi):
+                    self.rxLost += 1
+                    return
+            elif self.random.random() > self.delivery_probability(rssi):
+                self.rxLost += 1
+                return
+            rx = self.rx = {"tx": tx, "pushed": 0, "rssi": rssi}
+            # RSSI, FEI and AFC hold their values for this frame until RX restarts
+            self.regs[REG_RSSIVALUE] = min(255, int(-2 * rssi))
+            offset = (source.freqError - self.freqError) if source is not None else 0.0
+            afc = offset if self.regs[REG_AFCFEI] & RF_AFCFEI_AFCAUTO_ON else 0.0
+            self.regs[REG_AFCMSB:REG_FEILSB + 1] = struct.pack(">hh", int(round(afc / FSTEP)), int(round((offset - afc) / FSTEP)))
+            self.fifo = bytearray()
+            self.regs[REG_IRQFLAGS1] |= RF_IRQFLAGS1_SYNCADDRESSMATCH
+            # DIO0 mapping 10 is SyncAddress in RX mode
+            if self.dio0_mapping() == 2:
+                self.raise_dio0()
+        if tx.get("done"):
+            self._rx_end(rx)
+        else:
+            self._schedule(tx, lambda tx: self._rx_end(rx))
+
+    def tx_power(self):
+        # dBm out of PA0 / PA1 (-18 + level), PA1+PA2 (-14 + level), +3 dB with the boost registers
+        value = self.regs[REG_PALEVEL]
+        level = value & 0x1F
+        if value & RF_PALEVEL_PA2_ON:
+            return level - 14 + (3 if self.regs[REG_TESTPA1] == 0x5D else 0)
+        return level - 18
+
+    def rx_bandwidth(self):
+        value = self.regs[REG_RXBW]
+        return FXOSC / ((16 + 4 * ((value >> 3) & 0x03)) * (1 << ((value & 0x07) + 2)))
+
+    def delivery_probability(self, rssi):
+        # frame loss rises steeply around the channel filter's sensitivity
+        margin = rssi - sensitivity(self.rx_bandwidth())
+        return 1 / (1 + math.exp(-margin / 1.5))
+
+    def _advance_rx(self):
+        # move the bytes that have come over the air since the last access into the FIFO
+        rx = self.rx
+        if rx is None:
+            return
+        if self.mode() != RF_OPMODE_RECEIVER:
+            self.rx = None
+            return
+        sent = rx["tx"]["sent"]
+        if rx["pushed"] == 0 and sent and sent[0] > self.regs[REG_PAYLOADLENGTH]:
+            # longer than PayloadLength: the packet handler discards it
+            self.rx = None
+            self._rx_abort()
+            return
+        if rx["pushed"] < 2 <= len(sent) and not self._address_match(sent[1]):
+            # address filtering: the frame never reaches the FIFO or the host
+            self.addrRejected += 1
+            self.rx = None
+            self._rx_abort()
+            return
+        new = sent[rx["pushed"]:]
+        if len(self.fifo) + len(new) > self.FIFO_SIZE:
+            self.rxOverruns += 1
+            self.regs[REG_IRQFLAGS2] |= RF_IRQFLAGS2_FIFOOVERRUN
+            self.rx = None
+            self._rx_abort()
+            return
+        self.fifo += new
+        rx["pushed"] += len(new)
+
+    def _address_match(self, target):
+        filtering = self.regs[REG_PACKETCONFIG1] & 0x06
+        if filtering == RF_PACKET1_ADRSFILTERING_OFF:
+            return True
+        if target == self.regs[REG_NODEADRS]:
+            return True
+        return filtering == RF_PACKET1_ADRSFILTERING_NODEBROADCAST and target == self.regs[REG_BROADCASTADRS]
+
+    def _pull_source(self):
+        # bring the transmitter up to date first; never hold both locks at once
+        rx = self.rx
+        source = rx["tx"]["device"] if rx is not None else None
+        if source is not None:
+            with source.lock:
+                source._advance_tx()
+
+    def _rx_end(self, rx):
+        self._pull_source()
+        with self.lock:
+            if self.rx is not rx:
+                return
+            self._advance_rx()
+            if self.rx is not rx:
+                return
+            source = rx["tx"]["device"]
+            if rx["pushed"] < (rx["tx"]["total"] or 1) and source is not None and source.tx is rx["tx"]:
+                self._schedule(rx["tx"], lambda tx: self._rx_end(rx), retry=True)
+                return
+            self.rx = None
+            if rx["tx"].get("underrun") or rx["pushed"] < (rx["tx"]["total"] or 0):
+                # zero-filled or cut-short frames fail the CRC
+                self._rx_abort()
+                return
+            if self.medium is not None and not self.medium.crc_ok(self, rx["tx"], rx["rssi"]):
+                self.crcErrors += 1
+                self._rx_abort()
+                return
+            self._payload_ready()
+
+    def _rx_abort(self):
+        self.fifo = bytearray()
+        self.regs[REG_IRQFLAGS1] &= ~RF_IRQFLAGS1_SYNCADDRESSMATCH & 0xFF
+
+    def _payload_ready(self):
+        self.regs[REG_IRQFLAGS2] |= RF_IRQFLAGS2_PAYLOADREADY | RF_IRQFLAGS2_CRCOK
+        # DIO0 mapping 01 is PayloadReady in RX mode
+        if self.dio0_mapping() == 1:
+            self.raise_dio0()
+
+    # ---- SPI ----
+
+    def transfer(self, data):
+        data = list(data)
+        self._pull_source()
+        with self.lock:
+            self._advance_tx()
+            self._advance_rx()
+            self.transactions += 1
+            self.bytes += len(data)
+            if self.inReset or time.monotonic() < self.readyAt:
+                return [0] * len(data)
+            addr = data[0] & 0x7F
+            write = data[0] & 0x80
+            out = [0]
+            for i, value in enumerate(data[1:]):
+                # REG_FIFO does not auto-increment, every other register does
+                reg = addr if addr == REG_FIFO else (addr + i) & 0x7F
+                if write:
+                    self.write(reg, value)
+                    out.append(0)
+                else:
+                    out.append(self.read(reg))
+        return out
+
+    def read(self, reg):
+        if reg == REG_FIFO:
+            if not self.fifo:
+                return 0
+            value = self.fifo.pop(0)
+            if not self.fifo and self.regs[REG_IRQFLAGS2] & RF_IRQFLAGS2_PAYLOADREADY:
+                # frame fully read: the packet handler restarts the receiver
+                self.regs[REG_IRQFLAGS1] &= ~RF_IRQFLAGS1_SYNCADDRESSMATCH & 0xFF
+                self.regs[REG_IRQFLAGS2] &= ~(RF_IRQFLAGS2_PAYLOADREADY | RF_IRQFLAGS2_CRCOK) & 0xFF
+            return value
+        if reg == REG_IRQFLAGS2:
+            flags = self.regs[reg] & ~(RF_IRQFLAGS2_FIFOFULL | RF_IRQFLAGS2_FIFONOTEMPTY | RF_IRQFLAGS2_FIFOLEVEL) & 0xFF
+            if self.fifo:
+                flags |= RF_IRQFLAGS2_FIFONOTEMPTY
+            if len(self.fifo) > self.regs[REG_FIFOTHRESH] & 0x7F:
+                flags |= RF_IRQFLAGS2_FIFOLEVEL
+            if len(self.fifo) >= self.FIFO_SIZE:
+                flags |= RF_IRQFLAGS2_FIFOFULL
+            return flags
+        if reg == REG_RSSIVALUE and self.medium is not None and self.rx is None and self.mode() == RF_OPMODE_RECEIVER \
+                and not self.regs[REG_IRQFLAGS2] & RF_IRQFLAGS2_PAYLOADREADY:
+            # not locked on a frame: the receiver measures the energy on the channel
+            rssi = max(self.noiseFloor, self.medium.channel_rssi(self))
+            return min(255, int(-2 * rssi))
+        return self.regs[reg]
+
+    def write(self, reg, value):
+        if reg == REG_FIFO:
+            if len(self.fifo) >= self.FIFO_SIZE:
+                self.regs[REG_IRQFLAGS2] |= RF_IRQFLAGS2_FIFOOVERRUN
+                return
+            self.fifo.append(value & 0xFF)
+            idle = self.mode()
+            if self.regs[REG_AUTOMODES] == AUTO_TX and idle in (RF_OPMODE_STANDBY, RF_OPMODE_SYNTHESIZER):
+                self.autoTx = True
+                self.start_tx(self.tx_wakeup(idle))
+            return
+        if reg == REG_IRQFLAGS2:
+            # only FifoOverrun is writable: setting it clears the FIFO and the flags with it
+            if value & RF_IRQFLAGS2_FIFOOVERRUN:
+                self.fifo = bytearray()
+                self.rx = None
+                self.regs[REG_IRQFLAGS1] &= ~RF_IRQFLAGS1_SYNCADDRESSMATCH & 0xFF
+                self.regs[reg] &= ~(RF_IRQFLAGS2_FIFOOVERRUN | RF_IRQFLAGS2_PAYLOADREADY | RF_IRQFLAGS2_CRCOK) & 0xFF
+            return
+        previous = self.mode()
+        self.regs[reg] = value & 0xFF
+        if reg == REG_OSC1:
+            # RC calibration and temperature measurement finish instantly
+            self.regs[reg] = RF_OSC1_RCCAL_DONE
+        elif reg == REG_TEMP1:
+            self.regs[reg] = 0
+        elif reg == REG_RSSICONFIG:
+            # so does a triggered RSSI measurement; RSSIVALUE is read live, see read()
+            self.regs[reg] = RF_RSSI_DONE
+        elif reg == REG_PACKETCONFIG2 and value & RF_PACKET2_RXRESTART:
+            # the bit clears itself; in RX a frame being received is dropped and the
+            # receiver looks for a new sync on whatever FRF now says
+            self.regs[reg] = value & ~RF_PACKET2_RXRESTART & 0xFF
+            if self.mode() == RF_OPMODE_RECEIVER and self.rx is not None:
+                self.rx = None
+                self.fifo = bytearray()
+                self.regs[REG_IRQFLAGS1] &= ~RF_IRQFLAGS1_SYNCADDRESSMATCH & 0xFF
+        elif reg == REG_OPMODE:
+            self.regs[REG_IRQFLAGS1] |= RF_IRQFLAGS1_MODEREADY
+            self.tx = None
+            self.rx = None
+            self.autoTx = False
+            if value & 0x1C == RF_OPMODE_TRANSMITTER:
+                self.start_tx(self.tx_wakeup(previous))
+            elif value & 0x1C == RF_OPMODE_RECEIVER:
+                self.fifo = bytearray()
+                self.regs[REG_RSSIVALUE] = min(255, -2 * self.noiseFloor)
+                self.regs[REG_IRQFLAGS1] &= ~RF_IRQFLAGS1_SYNCADDRESSMATCH & 0xFF
+                self.regs[REG_IRQFLAGS2] &= ~(RF_IRQFLAGS2_PACKETSENT | RF_IRQFLAGS2_PAYLOADREADY | RF_IRQFLAGS2_CRCOK) & 0xFF
+            else:
+                self.regs[REG_IRQFLAGS2] &= ~RF_IRQFLAGS2_PACKETSENT & 0xFF
+
+
+def link(a, b):
+    # two simulated chips in range of each other
+    a.peers.append(b)
+    b.peers.append(a)
+
+
+class SpiDev(object):
+    def __init__(self, devices=None, backend=None):
+        self.devices = devices if devices is not None else globals()["devices"]
+        self.backend = backend
+        self.device = None
+        self.max_speed_hz = 0
+
+    def open(self, bus, device):
+        key = (bus, device)
+        if key not in self.devices:
+            self.devices[key] = SimRFM69()
+            if self.backend is not None and self.backend.medium is not None:
+                self.backend.medium.attach(self.devices[key], self.backend.position)
+        self.device = self.devices[key]
+
+    def xfer(self, data):
+        return self.device.transfer(data)
+
+    def xfer2(self, data):
+        return self.device.transfer(data)
+
+    def writebytes2(self, data):
+        self.device.transfer(data)
+
+    def close(self):
+        pass
+
+
+def _gpio_module(devices):
+    gpio = types.ModuleType("RPi.GPIO")
+    gpio.BOARD = 10
+    gpio.BCM = 11
+    gpio.IN = 1
+    gpio.OUT = 0
+    gpio.HIGH = 1
+    gpio.LOW = 0
+    gpio.RISING = 31
+    gpio.callbacks = {}
+    gpio.setmode = lambda mode: None
+    gpio.setup = lambda pin, direction: None
+
+    def output(pin, value):
+        for device in devices.values():
+            if device.rstPin == pin:
+                device.set_reset(value == gpio.HIGH)
+
+    gpio.output = output
+    gpio.cleanup = lambda: None
+
+    def add_event_detect(pin, edge, callback=None):
+        gpio.callbacks[pin] = callback
+        # bind the driver's handler to the simulated chip behind its SPI device
+        owner = getattr(callback, "__self__", None)
+        if owner is not None and hasattr(owner, "spiBus"):
+            devices[(owner.spiBus, owner.spiDevice)].dio0 = lambda: callback(pin)
+
+    def remove_event_detect(pin):
+        gpio.callbacks.pop(pin, None)
+
+    gpio.add_event_detect = add_event_detect
+    gpio.remove_event_detect = remove_event_detect
+    return gpio
+
+
+# One simulated host: its own SPI devices and GPIO pins. The default instance works on
+# the module-level `devices`; give each in-process node a SimBackend of its own, on a
+# shared RFM69medium.Medium at `position` (metres), to simulate several nodes at once.
+class SimBackend(object):
+    def __init__(self, medium=None, position=(0.0, 0.0), devices=None):
+        self.devices = devices if devices is not None else {}
+        self.medium = medium
+        self.position = position
+        self.gpio = _gpio_module(self.devices)
+
+    def openSpi(self, bus, device):
+        spi = SpiDev(self.devices, self)
+        spi.open(bus, device)
+        return spi
+
+
+_default = SimBackend(devices=devices)
+gpio = _default.gpio
+
+
+def install():
+    # the chip runs alongside the host in hardware; here it shares the GIL with the
+    # driver, so hand it over often enough for real-time FIFO timing to hold
+    sys.setswitchinterval(0.0001)
+    RFM69backend.setDefault(_default)
+    return gpio
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+# Both radios of a TwinRF69 behind one object. The two modules share SPI0 (CE0/CE1);
+# every transfer goes through one bus lock, and each radio gets an I/O worker thread that
+# runs everything touching that chip: sends, calls made through call(), and the FIFO
+# drain for RX edges, which the GPIO interrupt hands over instead of doing itself. Only
+# the PacketSent edge is still taken on the interrupt thread, since it just wakes the
+# worker's send. A call that blocks for an ACK (sendReliable(), sendAcked()) services the
+# RX edges behind it while it waits. Frames from both radios come out of one queue tagged
+# with the band.
+#
+#   twin = TwinRadio([radio433, radio915])
+#   twin.send(RF69_433MHZ, OTHERNODE, pkt)          # returns a Future
+#   band, frame = twin.receive(timeout = 1.0)
+#   twin.stats()[RF69_915MHZ]["txUtilisation"]
+
+import collections
+import concurrent.futures
+import queue
+import threading
+import time
+
+# What a worker's command queue carries besides calls
+IRQ = "irq"
+STOP = "stop"
+
+
+# spidev stand-in that holds the shared bus lock for each transfer and counts the
+# traffic against its radio. Only a contended acquire is timed, to keep the uncontended
+# path as short as a bare transfer.
+class LockedSpi(object):
+    def __init__(self, spi, lock, stats):
+        self.spi = spi
+        self.lock = lock
+        self.stats = stats
+
+    def transfer(self, fn, data):
+        if not self.lock.acquire(False):
+            start = time.monotonic()
+            self.lock.acquire()
+            self.stats.spiWait += time.monotonic() - start
+            self.stats.spiContended += 1
+        try:
+            return fn(data)
+        finally:
+            self.lock.release()
+            self.stats.spiTransfers += 1
+            self.stats.spiBytes += len(data)
+
+    def xfer(self, data):
+        return self.transfer(self.spi.xfer, data)
+
+    def xfer2(self, data):
+        return self.transfer(self.spi.xfer2, data)
+
+    def writebytes2(self, data):
+        return self.transfer(self.spi.writebytes2, data)
+
+    def close(self):
+        self.spi.close()
+
+
+class RadioStats(object):
+    def __init__(self):
+        self.txFrames = 0
+        self.txBytes = 0
+        self.txBusy = 0.0  # seconds spent in send(), CSMA wait included
+        self.rxFrames = 0
+        self.rxBytes = 0
+        self.spiTransfers = 0
+        self.spiBytes = 0
+        self.spiContended = 0  # transfers that found the other radio on the bus
+        self.spiWait = 0.0  # seconds spent waiting for it
+
+
+class RadioWorker(object):
+    def __init__(self, band, radio, twin):
+        self.band = band
+        self.radio = radio
+        self.twin = twin
+        self.stats = RadioStats()
+        self.commands = queue.Queue()
+        # RX edges not yet serviced; each also queues an IRQ command, which finds nothing
+        # left to do if waitRx() got to it first
+        self.irqCond = threading.Condition()
+        self.pendingIrqs = 0
+        self.thread = threading.Thread(target = self.run, name = "rfm69-%s" % band)
+        self.thread.daemon = True
+
+    # GPIO interrupt thread: hand the RX edge over
+    def interrupt(self):
+        with self.irqCond:
+            self.pendingIrqs += 1
+            self.irqCond.notify()
+        self.commands.put(IRQ)
+
+    # Take one pending RX edge, waiting up to `timeout` seconds for it. Returns whether there was one.
+    def takeIrq(self, timeout = 0):
+        with self.irqCond:
+            if not self.irqCond.wait_for(lambda: self.pendingIrqs, max(0.0, timeout)):
+                return False
+            self.pendingIrqs -= 1
+            return True
+
+    # The radio's irqWait: on the worker thread, service RX edges until `event` is set or
+    # `timeout` runs out, since any ACK has to be drained here
+    def waitRx(self, event, timeout):
+        if threading.current_thread() is not self.thread:
+            return event.wait(timeout)
+        deadline = time.monotonic() + timeout
+        while not event.is_set():
+            if not self.takeIrq(deadline - time.monotonic()):
+                break
+            self.radio.serviceRx()
+        return event.is_set()
+
+    def submit(self, fn, *args):
+        future = concurrent.futures.Future()
+        self.commands.put((fn, args, future))
+        return future
+
+    def run(self):
+        while True:
+            command = self.commands.get()
+            if command == STOP:
+                return
+            if command == IRQ:
+                if self.takeIrq():
+                    self.radio.serviceRx()
+                continue
+            fn, args, future = command
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+    def send(self, toAddress, buff, requestACK):
+        start = time.monotonic()
+        self.radio.send(toAddress, buff, requestACK)
+        self.stats.txBusy += time.monotonic() - start
+        self.stats.txFrames += 1
+        self.stats.txBytes += len(buff)
+        return self.radio.txTimeouts
+
+    # worker thread, via the radio's onFrame hook: move frames onto the shared queue
+    def frameQueued(self):
+        with self.radio.rxCond:
+            frames = list(self.radio.rxQueue)
+            self.radio.rxQueue.clear()
+        for frame in frames:
+            self.stats.rxFrames += 1
+            self.stats.rxBytes += len(frame.data)
+            self.twin.queueFrame(self.band, frame)
+
+
+class TwinRadio(object):
+    # `radios` are RFM69 instances, tagged by their freqBand. Frames beyond rxQueueSize
+    # waiting in receive()'s queue push out the oldest.
+    def __init__(self, radios, rxQueueSize = 64):
+        self.spiLock = threading.Lock()
+        self.rxCond = threading.Condition()
+        self.rxQueue = collections.deque()
+        self.rxQueueSize = rxQueueSize
+        self.rxDropped = 0
+        self.started = time.monotonic()
+        self.workers = collections.OrderedDict()
+        for radio in radios:
+            if radio.freqBand in self.workers:
+                raise ValueError("two radios on band %d" % radio.freqBand)
+            worker = RadioWorker(radio.freqBand, radio, self)
+            self.workers[radio.freqBand] = worker
+            radio.spi = LockedSpi(radio.spi, self.spiLock, worker.stats)
+            radio.onFrame = worker.frameQueued
+            radio.irqWorker = worker.interrupt
+            radio.irqWait = worker.waitRx
+            worker.thread.start()
+            worker.submit(radio.receiveBegin)
+
+    def radio(self, band):
+        return self.workers[band].radio
+
+    # Run fn(*args) on the band's I/O worker, in order with its sends and RX drains.
+    # Returns a concurrent.futures.Future.
+    def call(self, band, fn, *args):
+        return self.workers[band].submit(fn, *args)
+
+    # Queue a frame for the band's radio. The Future resolves once it is on air, to the
+    # radio's running count of TX timeouts.
+    def send(self, band, toAddress, buff = "", requestACK = False):
+        worker = self.workers[band]
+        return worker.submit(worker.send, toAddress, buff, requestACK)
+
+    def queueFrame(self, band, frame):
+        with self.rxCond:
+            if len(self.rxQueue) >= self.rxQueueSize:
+                self.rxQueue.popleft()
+                self.rxDropped += 1
+            self.rxQueue.append((band, frame))
+            self.rxCond.notify_all()
+
+    # Next (band, Frame) from either radio, or None after `timeout` seconds (None waits
+    # forever)
+    def receive(self, timeout = None):
+        with self.rxCond:
+            if not self.rxCond.wait_for(lambda: self.rxQueue, timeout):
+                return None
+            return self.rxQueue.popleft()
+
+    # Per band counters, plus the share of time since start-up each radio spent
+    # transmitting and clocking bytes over SPI (at the bus speed, per-transfer overhead
+    # not included)
+    def stats(self):
+        elapsed = time.monotonic() - self.started
+        result = {}
+        for band, worker in self.workers.items():
+            stats = dict(vars(worker.stats))
+            stats["txUtilisation"] = worker.stats.txBusy / elapsed
+            stats["spiUtilisation"] = worker.stats.spiBytes * 8.0 / worker.radio.spi.spi.max_speed_hz / elapsed
+            stats["pending"] = worker.commands.qsize()
+            result[band] = stats
+        return result
+
+    # Stop the workers once their queued work is done and hand the radios back
+    def close(self):
+        for worker in self.workers.values():
+            worker.commands.put(STOP)
+        for worker in self.workers.values():
+            worker.thread.join()
+            radio = worker.radio
+            radio.irqWorker = None
+            radio.irqWait = None
+            radio.onFrame = None
+            radio.spi = radio.spi.spi
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+# Health watchdog for one RFM69. Each check reads OPMODE..PACKETCONFIG2 in one SPI burst
+# and compares it with the register image the driver expects: the shadow copy that every
+# writeReg()/writeRegs() keeps current, which arm() turns on and loads from the chip. The
+# same burst carries RSSIVALUE and both IRQ flag registers, so it also shows a receiver
+# that has stopped delivering. What it looks for, and what it does about it:
+#
+#   config     registers that differ from the image, as after a brown-out reset: only
+#              those are rewritten (contiguous ones in one burst), plus the test
+#              registers and the AES key, then OPMODE last
+#   mode       the chip is in another mode than the driver put it in: OPMODE rewritten
+#   missedIrq  PayloadReady pending for irqGrace seconds with nothing drained meanwhile:
+#              the FIFO is drained, as the lost DIO0 edge would have had it
+#   stuckRx    SyncAddressMatch with nothing coming into the FIFO at every check for
+#              stuckTimeout (a real frame's bytes follow its sync word within a byte
+#              time), or RSSI above the CCA threshold on and off for quietTimeout without
+#              a single frame drained: RX restart, never while a frame is arriving
+#
+# A check holds the radio's chipLock from the first read to the end of any recovery, so a
+# send or an RX drain cannot start halfway through a restore; if the lock is taken, the
+# check is skipped. A register mismatch is only acted on once a second read confirms it.
+# Nothing is checked while a frame is being sent or drained. Every incident is counted by
+# kind, with the seconds from detection to a verified recovery.
+#
+#   watchdog = Watchdog(radio433)
+#   watchdog.arm()           # once the radio is configured (after begin()/setProfile())
+#   watchdog.poll()          # now and then from the thread driving the radio; rate-limited
+#   watchdog.stats()
+
+import collections
+import time
+
+from RFM69 import SHADOW_REGS
+from RFM69registers import *
+
+# Registers in the per-check burst: the configuration up to PACKETCONFIG2, which takes in
+# RSSIVALUE and the IRQ flags
+CHECK_FIRST = REG_OPMODE
+CHECK_LAST = REG_PACKETCONFIG2
+CHECK_READ_CMD = [CHECK_FIRST & 0x7F] + [0] * (CHECK_LAST - CHECK_FIRST + 1)
+
+# Shadowed registers outside the burst (the test registers), read only once a reset is seen
+EXTRA_REGS = [reg for reg in sorted(SHADOW_REGS) if reg > CHECK_LAST]
+
+# Recovery times kept for stats()
+RECOVERY_SAMPLES = 256
+
+INCIDENTS = ("config", "mode", "missedIrq", "stuckRx")
+
+
+class Watchdog(object):
+    def __init__(self, radio, interval = 0.1, irqGrace = 0.05, stuckTimeout = None, quietTimeout = 5.0):
+        self.radio = radio
+        self.interval = interval
+        self.irqGrace = irqGrace
+        # None: four times the airtime of the longest frame, at least 50 ms, see stuckAfter()
+        self.stuckTimeout = stuckTimeout
+        self.quietTimeout = quietTimeout
+        self.nextCheck = 0.0
+        self.checks = 0
+        # checks not made because the chip was in use
+        self.skipped = 0
+        self.incidents = dict((kind, 0) for kind in INCIDENTS)
+        self.failed = 0
+        self.recoveryTimes = collections.deque(maxlen = RECOVERY_SAMPLES)
+        # (monotonic time, kind, registers rewritten, seconds to recover), newest last
+        self.log = collections.deque(maxlen = 64)
+        self.rearm()
+
+    # Take the chip's current configuration as the expected image
+    def arm(self):
+        self.radio.fillShadow()
+        self.rearm()
+
+    # Forget the RX state tracked so far
+    def rearm(self):
+        self.pendingSince = None
+        self.syncSince = None
+        self.activeSince = None
+        self.lastFrameAt = self.radio.lastFrameAt
+
+    # Seconds SyncAddressMatch may stay set before the receiver counts as stuck
+    def stuckAfter(self):
+        if self.stuckTimeout is not None:
+            return self.stuckTimeout
+        radio = self.radio
+        bitrate = radio.profile.bitrate if radio.profile is not None else radio.readBitrate()
+        return max(0.05, 4 * (radio.maxDataLen + 16) * 8 / bitrate)
+
+    def poll(self):
+        now = time.monotonic()
+        if now < self.nextCheck:
+            return None
+        self.nextCheck = now + self.interval
+        return self.check()
+
+    def read(self):
+        return self.radio.spi.xfer2(CHECK_READ_CMD)[1:]
+
+    # Registers in the burst `regs` that differ from the image
+    def mismatches(self, regs):
+        shadow = self.radio.shadow
+        return [reg for reg in range(CHECK_FIRST, CHECK_LAST + 1)
+                if reg in shadow and regs[reg - CHECK_FIRST] & SHADOW_REGS[reg] != shadow[reg]]
+
+    # sendFrame() lets go of chipLock while the frame is on air and until it has put the
+    # chip back in RX, so holding the lock is not enough to know nothing is being sent
+    def busy(self):
+        radio = self.radio
+        return radio.intLock or radio.txPending or radio.mode == RF69_MODE_TX
+
+    # One check, whatever the interval. Returns the kind of incident found and dealt with, or
+    # None, also when the radio is busy.
+    def check(self):
+        radio = self.radio
+        if not radio.chipLock.acquire(False):
+            self.skipped += 1
+            return None
+        try:
+            return self.inspect()
+        finally:
+            radio.chipLock.release()
+
+    # check() with chipLock held
+    def inspect(self):
+        radio = self.radio
+        if not radio.shadow:
+            # shadow off, or emptied by a re-init through startRadios()
+            self.arm()
+        if self.busy():
+            self.skipped += 1
+            return None
+        self.checks += 1
+        regs = self.read()
+        if not any(regs):
+            # held in reset, or still starting up: nothing answers yet
+            return None
+        start = time.monotonic()
+        if self.mismatches(regs):
+            regs = self.read()
+            wrong = self.mismatches(regs)
+            if wrong:
+                return self.restore(wrong, start)
+        if radio.mode != RF69_MODE_RX:
+            self.rearm()
+            return None
+        return self.checkRx(regs, start)
+
+    # Rewrite the registers in `wrong`, and everything else a reset would have cleared if
+    # more than OPMODE is off, then read back to verify
+    def restore(self, wrong, start):
+        radio = self.radio
+        shadow = radio.shadow
+        reset = wrong != [REG_OPMODE]
+        rewrite = [reg for reg in wrong if reg != REG_OPMODE]
+        if reset:
+            rewrite += [reg for reg in EXTRA_REGS if reg in shadow and radio.readReg(reg) & SHADOW_REGS[reg] != shadow[reg]]
+        radio.writeConfig(dict((i, [reg, shadow[reg]]) for i, reg in enumerate(rewrite)))
+        if reset and radio.aesKey is not None:
+            radio.writeKey(radio.aesKey)
+        if REG_OPMODE in wrong:
+            radio.writeReg(REG_OPMODE, shadow[REG_OPMODE])
+            rewrite.append(REG_OPMODE)
+        self.rearm()
+        if self.mismatches(self.read()):
+            self.failed += 1
+        return self.recovered("config" if reset else "mode", start, rewrite)
+
+    def checkRx(self, regs, start):
+        radio = self.radio
+        flags1 = regs[REG_IRQFLAGS1 - CHECK_FIRST]
+        flags2 = regs[REG_IRQFLAGS2 - CHECK_FIRST]
+        if radio.lastFrameAt != self.lastFrameAt:
+            # the radio has drained a frame since the last check, so it is not stuck
+            self.rearm()
+        if flags2 & RF_IRQFLAGS2_PAYLOADREADY and not radio.longPackets:
+            if self.pendingSince is None:
+                self.pendingSince = start
+            elif start - self.pendingSince >= self.irqGrace:
+                radio.drainRx()
+                self.rearm()
+                return self.recovered("missedIrq", start)
+            return None
+        self.pendingSince = None
+        synced = flags1 & RF_IRQFLAGS1_SYNCADDRESSMATCH
+        if synced and not flags2 & RF_IRQFLAGS2_FIFONOTEMPTY:
+            if self.syncSince is None:
+                self.syncSince = start
+            elif start - self.syncSince >= self.stuckAfter():
+                return self.restartRx(start)
+        else:
+            self.syncSince = None
+        if synced or -(regs[REG_RSSIVALUE - CHECK_FIRST] >> 1) > radio.csmaThreshold:
+            if self.activeSince is None:
+                self.activeSince = start
+            elif start - self.activeSince >= self.quietTimeout and not flags2 & RF_IRQFLAGS2_FIFONOTEMPTY:
+                return self.restartRx(start)
+        return None
+
+    def restartRx(self, start):
+        self.radio.updateReg(REG_PACKETCONFIG2, 0xFB, RF_PACKET2_RXRESTART)
+        self.rearm()
+        return self.recovered("stuckRx", start)
+
+    def recovered(self, kind, start, regs = ()):
+        took = time.monotonic() - start
+        self.incidents[kind] += 1
+        self.recoveryTimes.append(took)
+        self.log.append((start, kind, list(regs), took))
+        return kind
+
+    def stats(self):
+        times = sorted(self.recoveryTimes)
+
+        def percentile(p):
+            return times[min(len(times) - 1, int(p * len(times)))] if times else None
+        return {"checks": self.checks, "skipped": self.skipped, "incidents": dict(self.incidents), "failed": self.failed,
+                "recoveryP50": percentile(0.5), "recoveryMax": times[-1] if times else None}
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# The TwinRF69_tx_rx_radios TUN bridge on one asyncio event loop: the TUN fd is watched
+# with add_reader, both radios wake the loop from their interrupts through AsyncRFM69,
+# and nothing sleeps to poll. Same fragment format (MSGID, SEQ, END = 0xFFFF), so it
+# interoperates with the polling bridge. REGION and NODE_ID are set in
+# TwinRF69_tx_rx_radios.py.
+
+import asyncio
+import os
+import struct
+import time
+
+from RFM69registers import *
+from RFM69async import AsyncRFM69
+from RFM69dutycycle import Scheduler
+from TwinRF69_tx_rx_radios import (CHUNK_SIZE, DUTY_CYCLE_BANDS, FREQUENCY0, FREQUENCY1, MODULE0, MODULE1, NODE_ID,
+                                   OTHERNODE, REGION, RegionNotSetError, create_tun_for_node, read_tun_nonblocking,
+                                   start_radios)
+
+# seconds an incomplete message is kept
+REASSEMBLY_TIMEOUT = 10.0
+
+
+async def send_packet(pkt: bytes, aradio: AsyncRFM69, pacer: Scheduler, to_node: int, msgid: int,
+                      chunk_size: int = CHUNK_SIZE) -> None:
+    """Fragment `pkt` and send each chunk, then the END marker with (total_chunks, orig_len).
+    Every frame goes through `pacer` on the radio's worker thread, so waiting out the duty
+    cycle holds up that radio only."""
+    total_chunks = (len(pkt) + chunk_size - 1) // chunk_size
+    for seq in range(total_chunks):
+        chunk = pkt[seq * chunk_size:(seq + 1) * chunk_size]
+        await aradio.run(pacer.send, to_node, struct.pack(">HH", msgid, seq + 1) + chunk)
+    await aradio.run(pacer.send, to_node, struct.pack(">HHHH", msgid, 0xFFFF, total_chunks & 0xFFFF, len(pkt) & 0xFFFF))
+    print(f"TX >> {to_node}: msgid={msgid} chunks={total_chunks} len={len(pkt)}")
+
+
+class Reassembler(object):
+    """Collects chunks per (sender, msgid); add() returns (sender, packet) on a complete END."""
+
+    def __init__(self):
+        self.buffers = {}
+        self.started = {}
+
+    def add(self, frame):
+        if len(frame.data) < 4:
+            return None
+        msgid, seq = struct.unpack(">HH", frame.data[:4])
+        key = (frame.senderID, msgid)
+        now = time.monotonic()
+        for stale in [k for k, t in self.started.items() if now - t > REASSEMBLY_TIMEOUT]:
+            self.buffers.pop(stale, None)
+            self.started.pop(stale, None)
+        if seq != 0xFFFF:
+            self.buffers.setdefault(key, {})[seq] = frame.data[4:]
+            self.started.setdefault(key, now)
+            return None
+        chunks = self.buffers.pop(key, {})
+        self.started.pop(key, None)
+        if len(frame.data) < 8:
+            return None
+        total_chunks, orig_len = struct.unpack(">HH", frame.data[4:8])
+        if sorted(chunks) != list(range(1, total_chunks + 1)):
+            print(f"[RX ERROR] {frame.senderID}: msgid={msgid} expected {total_chunks}, got {len(chunks)}. Dropping.")
+            return None
+        return frame.senderID, b"".join(chunks[i] for i in range(1, total_chunks + 1))[:orig_len]
+
+
+async def bridge(tun_file, tx_radio, rx_radio):
+    loop = asyncio.get_running_loop()
+    # reads the modem registers, so before the radio's worker thread takes over its SPI
+    pacer = Scheduler(tx_radio, bands=DUTY_CYCLE_BANDS)
+    tx = AsyncRFM69(tx_radio, loop)
+    rx = AsyncRFM69(rx_radio, loop)
+    outgoing = asyncio.Queue()
+
+    def tun_readable():
+        pkt = read_tun_nonblocking(tun_file)
+        if pkt is not None:
+            outgoing.put_nowait(pkt)
+
+    async def transmit():
+        msgid = int(time.time() * 1000) & 0xFFFF
+        while True:
+            pkt = await outgoing.get()
+            msgid = (msgid + 1) & 0xFFFF
+            await send_packet(pkt, tx, pacer, OTHERNODE, msgid)
+
+    async def receive():
+        reassembler = Reassembler()
+        print_startup = True
+        async for frame in rx:
+            if print_startup:
+                print(f"[STARTUP] First frame {rx_radio.timeToFirstFrame*1000:.0f} ms after reset")
+                print_startup = False
+            result = reassembler.add(frame)
+            if result is None:
+                continue
+            sender_id, pkt = result
+            try:
+                os.write(tun_file.fileno(), pkt)
+                print(f"[TUN WRITE] Wrote {len(pkt)} bytes from {sender_id}")
+            except OSError as e:
+                print(f"[TUN ERROR] Failed to write: {e}")
+
+    loop.add_reader(tun_file.fileno(), tun_readable)
+    try:
+        await asyncio.gather(transmit(), receive())
+    finally:
+        loop.remove_reader(tun_file.fileno())
+        tx.close()
+        rx.close()
+
+
+def main():
+    if REGION not in (1, 2):
+        raise RegionNotSetError("You have not defined a region. Exiting program.")
+
+    tun_file, ifname, ip = create_tun_for_node(NODE_ID)
+    print(ifname, ip)
+
+    radio0, radio1 = start_radios([(MODULE0, FREQUENCY0, 16, 15, 0, 0),
+                                   (MODULE1, FREQUENCY1, 18, 22, 0, 1)])
+    tx_radio, rx_radio = (radio0, radio1) if NODE_ID == 1 else (radio1, radio0)
+    try:
+        asyncio.run(bridge(tun_file, tx_radio, rx_radio))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Shutting down RFM69 modules")
+        tx_radio.shutdown()
+        rx_radio.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,9 @@
 
 import RFM69
 from RFM69registers import *
+from RFM69profiles import PROFILES
+from RFM69dutycycle import schedulerFor
+from TwinRF69_tx_rx_radios import DUTY_CYCLE_BANDS, FREQUENCY0, FREQUENCY1, MODULE0, MODULE1, REGION
 import time
 import RPi.GPIO as GPIO
 import os
@@ -11,9 +14,8 @@ import subprocess
 from typing import Optional, Union, IO
 import errno
 
-#You must set these two variables
+#You must set this variable, and REGION in TwinRF69_tx_rx_radios.py
 
-REGION = 1 # Set to 1 for 433/915 and 2 for 433/868
 NODE_ID = 1 #Set this to an integer between 0 and 9
 OTHERNODE = 2
 NETWORK_ID = 0
@@ -56,10 +58,7 @@ def setup_radios(MODULE, FREQUENCY, NODE_ID, NETWORK_ID, INT_PIN, RST_PIN, SPI_B
     print(radio.readTemperature(0))
 
     radio.setFrequency(FREQUENCY)
-    radio.writeReg(REG_BITRATEMSB, RF_BITRATEMSB_250000)
-    radio.writeReg(REG_BITRATELSB, RF_BITRATELSB_250000)
-    radio.writeReg(REG_FDEVMSB, RF_FDEVMSB_50000)
-    radio.writeReg(REG_FDEVLSB, RF_FDEVLSB_50000)
+    radio.setProfile(PROFILES["250k"])
 
     return(radio)
 
@@ -204,7 +203,7 @@ def neighbour_discovery(radio0):
     while (neighbour_discovered is False):
         # Broadcasting Node ID on control
         hello_msg = "%d\n" % (NODE_ID) 
-        radio0.send(OTHERNODE, hello_msg) #Send without retrying for ack
+        schedulerFor(radio0, DUTY_CYCLE_BANDS).send(OTHERNODE, hello_msg) #Send without retrying for ack
         
         radio0.receiveBegin()
         start_time = time.time()
@@ -223,7 +222,7 @@ def neighbour_discovery(radio0):
             print(f"Received data: {radio0.DATA}")
             neighbour_discovered = True
             print("Neighbour discovery process completed.")
-            radio0.send(OTHERNODE, hello_msg) #Send without retrying for ack
+            schedulerFor(radio0, DUTY_CYCLE_BANDS).send(OTHERNODE, hello_msg) #Send without retrying for ack
 
 def check_missing_packets(OUTPUT_FILE): 
 
@@ -277,14 +276,12 @@ def send_packet(file_path, chunk_size, radio0, radio1):
             data_as_list = list(chunk)
             msg = "%d, %d, %d\n" % (NODE_ID, sequence, chunky)
 
-            radio1.send(OTHERNODE, msg)  # Send without retrying for ACK
+            schedulerFor(radio1, DUTY_CYCLE_BANDS).send(OTHERNODE, msg)  # Send without retrying for ACK
             print("TX >> {OTHERNODE}: 915 {msg}")
-            time.sleep(0.16)
 
         ack = "%d, %d, %d\n" % (NODE_ID, 99, 0)
         print("TX >> {OTHERNODE}: 433 {ack}")
-        radio0.send(OTHERNODE, ack)  # Send without retrying for ACK
-        time.sleep(0.16)
+        schedulerFor(radio0, DUTY_CYCLE_BANDS).send(OTHERNODE, ack)  # Send without retrying for ACK
 
     except KeyboardInterrupt:
         # Clean up properly to not leave GPIO/SPI in an unusable state
@@ -295,9 +292,8 @@ def send_ack(radio0, missing_packet):
     try:
         msg = "%d, %d, %d\n" % (NODE_ID, missing_packet, chunky)
 
-        radio0.send(OTHERNODE, msg)  # Send without retrying for ACK
+        schedulerFor(radio0, DUTY_CYCLE_BANDS).send(OTHERNODE, msg)  # Send without retrying for ACK
         print("TX >> {OTHERNODE}: 433 {msg}")
-        time.sleep(0.16)
 
     except KeyboardInterrupt:
         # Clean up properly to not leave GPIO/SPI in an unusable state
@@ -364,19 +360,11 @@ def main():
 
     if (REGION == 1):
         print("Entering 433MHz and 915MHz mode")
-        MODULE1 = RF69_915MHZ
-        FREQUENCY1 = 915000000
     elif (REGION == 2):
         print("Entering 433MHz and 868MHz mode")
-        MODULE1 = RF69_868MHZ #Untested
-        FREQUENCY1 = 868000000 #Untested
     else:
         raise RegionNotSetError("You have not defined a region. Exiting program.")
 
-    # Constants for configuration
-    MODULE0 = RF69_433MHZ
-    FREQUENCY0 = 433000000
-
     OUTPUT_FILE = 'received_file.png'  # File to write received data
     file_path = 'logo.png'
     chunk_size = 60
@@ -2,8 +2,9 @@
 
 import RFM69
 from RFM69registers import *
+from RFM69profiles import PROFILES
+from RFM69dutycycle import EU_BANDS, Scheduler
 import time
-import RPi.GPIO as GPIO
 import os
 import fcntl
 import struct
@@ -19,6 +20,18 @@ OTHERNODE = 2
 NETWORK_ID = 0
 TOSLEEP = 0.064
 TIMEOUT = 1
+# Fragment bytes per frame: the FIFO less the length byte, target, sender and CTL, and the
+# 4-byte MSGID/SEQ header (the CRC is checked on the fly, never stored in the FIFO).
+# Anything longer never fits the receiver's FIFO and is dropped.
+CHUNK_SIZE = RF69_FIFO_SIZE - 1 - 3 - 4
+# The bridge scripts take the region's radios and duty-cycle limits from here. In the EU
+# the whole 250 kbps signal (+/- 200 kHz) must sit inside one sub-band: 433.05-434.79 MHz
+# for the 433 MHz radio and 868.0-868.6 MHz for the 868 MHz one, which is untested.
+MODULE0 = RF69_433MHZ
+FREQUENCY0 = 433000000 if REGION == 1 else 433920000
+MODULE1, FREQUENCY1 = (RF69_915MHZ, 915000000) if REGION == 1 else (RF69_868MHZ, 868300000)
+# sends are paced to these sub-bands' duty cycles
+DUTY_CYCLE_BANDS = EU_BANDS if REGION == 2 else ()
 
 _rx_buffers = {}
 _rx_timestamps = {}
@@ -63,58 +76,50 @@ def setup_radios(MODULE, FREQUENCY, NODE_ID, NETWORK_ID, INT_PIN, RST_PIN, SPI_B
 
     radio.setFrequency(FREQUENCY)
 
-    # Bitrate: 250 kbps
-    radio.writeReg(REG_BITRATEMSB, RF_BITRATEMSB_250000)
-    radio.writeReg(REG_BITRATELSB, RF_BITRATELSB_250000)
-
-    # FIX 1 — Gaussian BT=0.5 shaping: tightens TX spectrum, improves sensitivity ~1-2 dB.
-    # Was RF_DATAMODUL_MODULATIONSHAPING_00 (no shaping).
-    radio.writeReg(REG_DATAMODUL,
-                   RF_DATAMODUL_DATAMODE_PACKET |
-                   RF_DATAMODUL_MODULATIONTYPE_FSK |
-                   RF_DATAMODUL_MODULATIONSHAPING_01)
-
-    # FIX 2 — Fdev = 75 kHz: modulation index h = 2*75k/250k = 0.6 (must be >= 0.5).
-    # Previous RF_FDEVMSB/LSB_50000 gave h=0.4 — too low, partial eye closure.
-    # 75000 Hz / 61.03515625 Hz/step = 0x04D0
-    radio.writeReg(REG_FDEVMSB, 0x04)
-    radio.writeReg(REG_FDEVLSB, 0xD0)
-
-    # FIX 3 — RxBw = 200 kHz: must satisfy RxBw >= Fdev + BitRate/2 = 75k + 125k = 200 kHz.
-    # Library default was MANT_16|EXP_2 = 125 kHz — too narrow, the main cause of
-    # constant CRC failures and corrupted packets.
-    # MANT_20|EXP_1 -> 32e6 / (20 * 2 * 4) = 200 kHz.
-    radio.writeReg(REG_RXBW,
-                   RF_RXBW_DCCFREQ_010 |
-                   RF_RXBW_MANT_20 |
-                   RF_RXBW_EXP_1)
-
-    # FIX 4 — AfcBw = 400 kHz: AFC bandwidth must be wider than RxBw to lock on
-    # during the preamble. Was never set — defaulted to ~83 kHz, causing the AFC
-    # to pull the LO the wrong direction on weak signals.
-    # MANT_20|EXP_0 -> 32e6 / (20 * 1 * 4) = 400 kHz.
-    # REG_AFCBW = 0x1A
-    radio.writeReg(0x1A,
-                   RF_RXBW_DCCFREQ_010 |
-                   RF_RXBW_MANT_20 |
-                   RF_RXBW_EXP_0)
-
-    # FIX 5 — DC-free whitening: prevents long 0/1 runs from drifting the receiver's
-    # DC baseline at 250 kbps. Was DCFREE_OFF.
-    radio.writeReg(REG_PACKETCONFIG1,
-                   RF_PACKET1_FORMAT_VARIABLE |
-                   RF_PACKET1_DCFREE_WHITENING |
-                   RF_PACKET1_CRC_ON |
-                   RF_PACKET1_CRCAUTOCLEAR_ON |
-                   RF_PACKET1_ADRSFILTERING_OFF)
+    # 250 kbps, Fdev 75 kHz (h = 0.6), RxBw >= Fdev + BR/2, AfcBw wider than RxBw,
+    # Gaussian BT=0.5 shaping and whitening: computed and checked by RFM69profiles
+    radio.setProfile(PROFILES["250k"])
 
     # Arm the receiver
     radio.receiveBegin()
 
-    print(f"Radio ready: freq={FREQUENCY/1e6:.3f}MHz  Fdev=75kHz  RxBw=200kHz  AfcBw=400kHz  BR=250kbps")
+    print(f"Radio ready: freq={FREQUENCY/1e6:.3f}MHz  {radio.profile}")
 
     return radio
 
+def start_radios(configs, verbose=False):
+    """Fast start: reset all radios together and configure them with the 250 kbps profile
+    in one pass. `configs` holds (MODULE, FREQUENCY, INT_PIN, RST_PIN, SPI_BUS, SPI_DEV)
+    per radio; the register dump and temperature check only run with verbose=True."""
+
+    radios = [RFM69.RFM69(
+        freqBand=MODULE,
+        nodeID=NODE_ID,
+        networkID=NETWORK_ID,
+        isRFM69HW=True,
+        intPin=INT_PIN,
+        rstPin=RST_PIN,
+        spiBus=SPI_BUS,
+        spiDevice=SPI_DEV,
+        init=False
+    ) for MODULE, FREQUENCY, INT_PIN, RST_PIN, SPI_BUS, SPI_DEV in configs]
+
+    elapsed = RFM69.startRadios(radios, PROFILES["250k"])
+
+    for radio, (MODULE, FREQUENCY, INT_PIN, RST_PIN, SPI_BUS, SPI_DEV) in zip(radios, configs):
+        radio.setPowerLevel(31)
+        radio.promiscuous(True)
+        radio.setFrequency(FREQUENCY)
+        if verbose:
+            for result in radio.readAllRegs():
+                print(result)
+            print(radio.readTemperature(0))
+        radio.receiveBegin()
+        print(f"Radio ready: freq={FREQUENCY/1e6:.3f}MHz  {radio.profile}")
+
+    print(f"Radios started in {elapsed*1000:.1f} ms")
+    return radios
+
 def setup_radios1(MODULE, FREQUENCY, NODE_ID, NETWORK_ID, INT_PIN, RST_PIN, SPI_BUS, SPI_DEV):
 
     # Initialize the 915MHz radio
@@ -147,10 +152,7 @@ def setup_radios1(MODULE, FREQUENCY, NODE_ID, NETWORK_ID, INT_PIN, RST_PIN, SPI_
     print(radio.readTemperature(0))
 
     radio.setFrequency(FREQUENCY)
-    radio.writeReg(REG_BITRATEMSB, RF_BITRATEMSB_250000)
-    radio.writeReg(REG_BITRATELSB, RF_BITRATELSB_250000)
-    radio.writeReg(REG_FDEVMSB, RF_FDEVMSB_50000)
-    radio.writeReg(REG_FDEVLSB, RF_FDEVLSB_50000)
+    radio.setProfile(PROFILES["250k"])
 
     return(radio)
 
@@ -246,10 +248,13 @@ def read_tun_nonblocking(tun: Union[IO, int], bufsize: int = 4096) -> Optional[b
             return None
         raise
 
-def send_packet(pkt: bytes, radio, OTHERNODE: int, chunk_size: int = 60, pause: float = 0.1) -> None:
+def send_packet(pkt: bytes, radio, OTHERNODE: int, chunk_size: int = CHUNK_SIZE, pause: float = 0.0) -> None:
     """
     Send the given pkt (bytes) over `radio` to `OTHERNODE` in chunks.
 
+    `radio` may be an RFM69dutycycle.Scheduler, which paces the chunks as tightly as the
+    sub-band's duty cycle allows; `pause` adds a fixed sleep after every chunk on top.
+
     Protocol:
       - Each payload = 4-byte header + chunk
       - Header = MSGID (uint16 BE), SEQ (uint16 BE)
@@ -291,7 +296,8 @@ def send_packet(pkt: bytes, radio, OTHERNODE: int, chunk_size: int = 60, pause:
                 radio.send(OTHERNODE, list(payload))
 
             print(f"TX >> {OTHERNODE}: msgid={msgid} seq={actual_seq}/{total_chunks} chunk_len={len(chunk)}")
-            time.sleep(pause)
+            if pause:
+                time.sleep(pause)
 
         # send END marker with total_chunks and original length (both uint16 BE)
         end_header = struct.pack(">HH", msgid, 0xFFFF)
@@ -414,19 +420,11 @@ def main():
 
     if (REGION == 1):
         print("Entering 433MHz and 915MHz mode")
-        MODULE1 = RF69_915MHZ
-        FREQUENCY1 = 915000000
     elif (REGION == 2):
         print("Entering 433MHz and 868MHz mode")
-        MODULE1 = RF69_868MHZ #Untested
-        FREQUENCY1 = 868000000 #Untested
     else:
         raise RegionNotSetError("You have not defined a region. Exiting program.")
 
-    # Constants for configuration
-    MODULE0 = RF69_433MHZ
-    FREQUENCY0 = 433000000
-
     packet_size = 62
 
     tun_file, ifname, ip = create_tun_for_node(NODE_ID)
@@ -434,20 +432,28 @@ def main():
 
     try:
         
+        radio0, radio1 = start_radios([(MODULE0, FREQUENCY0, 16, 15, 0, 0),
+                                       (MODULE1, FREQUENCY1, 18, 22, 0, 1)])
         if NODE_ID == 1: 
-            tx_radio = setup_radios(MODULE0, FREQUENCY0, NODE_ID, NETWORK_ID, 16, 15, 0, 0) 
-            rx_radio = setup_radios(MODULE1, FREQUENCY1, NODE_ID, NETWORK_ID, 18, 22, 0, 1)
+            tx_radio, rx_radio = radio0, radio1
         if NODE_ID == 2:
-            rx_radio = setup_radios(MODULE0, FREQUENCY0, NODE_ID, NETWORK_ID, 16, 15, 0, 0) 
-            tx_radio = setup_radios(MODULE1, FREQUENCY1, NODE_ID, NETWORK_ID, 18, 22, 0, 1)
+            rx_radio, tx_radio = radio0, radio1
+        # chunks go out as fast as the band's duty cycle allows: EU limits in REGION 2, and in
+        # REGION 1 just the Scheduler's minGap for the receiver to drain each frame
+        pacer = Scheduler(tx_radio, bands=DUTY_CYCLE_BANDS)
+        first_frame_reported = False
 
         while True:
 
+            if not first_frame_reported and rx_radio.timeToFirstFrame is not None:
+                print(f"[STARTUP] First frame {rx_radio.timeToFirstFrame*1000:.0f} ms after reset")
+                first_frame_reported = True
+
             pkt = read_tun_nonblocking(tun_file)
             if pkt is None:
                 pass
             else:
-                send_packet(pkt, tx_radio, OTHERNODE, chunk_size=60, pause=0.3)
+                send_packet(pkt, pacer, OTHERNODE)
 
 			# Non-blocking receive (packets from RX - write them to TUN)
             result = receive_packet_reassemble(rx_radio)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+# A co-located link at 250 kbps chatting to another node: interrupts and SPI transactions the
+# receiver spends on foreign frames with software filtering (promiscuous, as
+# setup_radios does), software filtering by TARGETID, and chip address filtering.
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+
+FOREIGN = 200   # frames for node 3 on the same channel
+OWN = 20        # frames for this node
+
+
+def run(name, spiDevice, promiscuous, hwFilter):
+    radio = RFM69.RFM69(RF69_915MHZ, 2, 0, isRFM69HW=True, spiDevice=spiDevice, rxQueueSize=OWN + FOREIGN)
+    dev = RFM69sim.devices[(radio.spiBus, radio.spiDevice)]
+    radio.writeRegs(REG_BITRATEMSB, [RF_BITRATEMSB_250000, RF_BITRATELSB_250000])
+    radio.promiscuous(promiscuous)
+    radio.setAddressFiltering(hwFilter)
+    radio.receiveBegin()
+    interrupts = [0]
+    handler = radio.interruptHandler
+
+    def counted(pin):
+        interrupts[0] += 1
+        handler(pin)
+    dev.dio0 = lambda: counted(radio.intPin)
+    dev.reset_counters()
+    frameTime = dev.airtime(44)
+    for i in range(FOREIGN + OWN):
+        time.sleep(frameTime)
+        dev.inject(bytes(40), senderID=1, targetID=2 if i % 11 == 0 else 3)
+    received = 0
+    while radio.receive(timeout=0.2) is not None:
+        received += 1
+    print(f"{name:<26} interrupts {interrupts[0]:4d}  SPI xfers {dev.transactions:5d}  received {received:3d}"
+          f"  rejected hw {dev.addrRejected:3d} sw {radio.rxRejectedSw:3d}")
+
+
+def main():
+    run("promiscuous", 0, True, False)
+    run("software filter", 1, False, False)
+    run("hardware filter", 2, False, True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# Application-side receive latency on a simulated 55.5 kbps link carrying a frame every
+# 20 ms: the bridge scripts' loop (receiveDone() then time.sleep(TOSLEEP)) versus
+# AsyncRFM69, where the interrupt wakes the event loop. The async run also keeps a 10 ms
+# timer going on the same loop, standing in for the second radio and the TUN fd.
+
+import asyncio
+import os
+import statistics
+import struct
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+from RFM69profiles import PROFILES
+from RFM69async import AsyncRFM69
+
+FRAMES = 100
+INTERVAL = 0.02
+TOSLEEP = 0.064
+
+
+def sender(tx, done):
+    for i in range(FRAMES):
+        tx.send(2, struct.pack(">Hd", i, time.monotonic()))
+        time.sleep(INTERVAL)
+    time.sleep(0.2)
+    done.set()
+
+
+def latency(data, now):
+    return now - struct.unpack(">Hd", bytes(data))[1]
+
+
+def polling(tx, rx):
+    done = threading.Event()
+    latencies = []
+    thread = threading.Thread(target=sender, args=(tx, done))
+    thread.start()
+    while not done.is_set():
+        if rx.receiveDone():
+            latencies.append(latency(rx.DATA, time.monotonic()))
+            rx.PAYLOADLEN = 0
+        time.sleep(TOSLEEP)
+    thread.join()
+    return latencies
+
+
+async def eventLoop(tx, rx):
+    loop = asyncio.get_running_loop()
+    done = threading.Event()
+    latencies = []
+    ticks = [0]
+    arx = AsyncRFM69(rx, loop)
+
+    async def timer():
+        while not done.is_set():
+            ticks[0] += 1
+            await asyncio.sleep(0.01)
+
+    async def receive():
+        while not done.is_set():
+            frame = await arx.recv(timeout = 0.1)
+            if frame is not None:
+                latencies.append(latency(frame.data, time.monotonic()))
+
+    thread = threading.Thread(target=sender, args=(tx, done))
+    thread.start()
+    await asyncio.gather(timer(), receive())
+    thread.join()
+    arx.close()
+    return latencies, ticks[0]
+
+
+def report(name, latencies, cpu, extra = ""):
+    print(f"{name:<22} received {len(latencies):3d}/{FRAMES}  latency median {statistics.median(latencies) * 1000:6.2f} ms"
+          f"  max {max(latencies) * 1000:6.2f} ms  host CPU {cpu:5.2f} s{extra}")
+
+
+def main():
+    tx = RFM69.RFM69(RF69_915MHZ, 1, 0, intPin=18, spiDevice=0)
+    rx = RFM69.RFM69(RF69_915MHZ, 2, 0, intPin=16, spiDevice=1)
+    txDev = RFM69sim.devices[(0, 0)]
+    rxDev = RFM69sim.devices[(0, 1)]
+    txDev.realtime = rxDev.realtime = True
+    RFM69sim.link(txDev, rxDev)
+    for radio in (tx, rx):
+        radio.setProfile(PROFILES["55k5"])
+    rx.receiveBegin()
+
+    cpu = time.process_time()
+    latencies = polling(tx, rx)
+    report("receiveDone + sleep", latencies, time.process_time() - cpu, f"  ({rx.rxDropped} dropped)")
+
+    # start the second run with nothing left over from the first
+    with rx.rxCond:
+        rx.rxQueue.clear()
+    cpu = time.process_time()
+    latencies, ticks = asyncio.run(eventLoop(tx, rx))
+    report("AsyncRFM69", latencies, time.process_time() - cpu, f"  ({ticks} timer ticks on the same loop)")
+
+
+if __name__ == "__main__":
+    main()
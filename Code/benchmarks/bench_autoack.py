@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+# ACK turnaround on the simulated backend: one node sends sequenced frames with
+# sendReliable() while its peer either answers from the application, polling
+# receiveDone()/ACKRequested()/sendACK() every 10 ms or 64 ms like the bridge scripts, or
+# has setAutoAck(True) and answers from the interrupt. Reports the sender's RTT (end of
+# its frame to the ACK waking it) and retransmissions from peerStats(), and the
+# receiver's drain-to-PacketSent time for auto-ACKs.
+
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+from RFM69medium import Medium
+from RFM69profiles import PROFILES
+
+FRAMES = 100
+PROFILE = PROFILES["55k5"]
+
+
+def node(medium, position, nodeID):
+    radio = RFM69.RFM69(RF69_433MHZ, nodeID, 0, isRFM69HW=True, backend=RFM69sim.SimBackend(medium, position))
+    radio.setFrequency(433000000)
+    radio.setProfile(PROFILE)
+    radio.setOutputPower(20)
+    return radio
+
+
+def run(name, tx, rx, poll):
+    done = threading.Event()
+    turnarounds = []
+    tx.peerLinks.clear()
+    rx.setAutoAck(poll is None)
+
+    def polling():
+        while not done.is_set():
+            if rx.receiveDone() and rx.ACKRequested():
+                rx.sendACK()
+            time.sleep(poll)
+
+    def interrupt():
+        seen = 0
+        while not done.is_set():
+            if rx.receive(timeout = 0.05) is not None and rx.autoAcks > seen:
+                seen = rx.autoAcks
+                turnarounds.append(rx.ackTurnaround)
+
+    thread = threading.Thread(target=interrupt if poll is None else polling)
+    thread.start()
+    start = time.monotonic()
+    for i in range(FRAMES):
+        tx.sendReliable(2, bytes(32))
+        time.sleep(0.005)
+    elapsed = time.monotonic() - start
+    done.set()
+    thread.join()
+
+    stats = tx.peerStats()[2]
+    line = (f"{name:<22} acked {stats['acked']:3d}/{FRAMES}  retries {stats['retries']:3d}"
+            f"  RTT p50 {stats['rttP50'] * 1000:6.2f} p95 {stats['rttP95'] * 1000:6.2f} p99 {stats['rttP99'] * 1000:6.2f} ms"
+            f"  {elapsed / FRAMES * 1000:5.1f} ms/frame")
+    if turnarounds:
+        line += f"  drain->ACK sent median {statistics.median(turnarounds) * 1000:.2f} ms"
+    print(line)
+
+
+def main():
+    medium = Medium()
+    tx, rx = node(medium, (0, 0), 1), node(medium, (100, 0), 2)
+    tx.receiveBegin()
+    rx.receiveBegin()
+    print(f"{FRAMES} frames at {PROFILE.bitrate / 1000:.1f} kbps; an ACK is"
+          f" {RFM69.ACK_FRAME_BYTES * 8 / PROFILE.bitrate * 1000:.2f} ms on air")
+    run("app polls every 64 ms", tx, rx, 0.064)
+    run("app polls every 10 ms", tx, rx, 0.01)
+    run("auto-ACK", tx, rx, None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+# Counts SPI transactions for per-register vs burst register access against a
+# simulated RFM69, for the operations that dominate profile changes and health dumps.
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+
+
+def report(name, legacy, burst):
+    print(f"{name:<16} legacy: {legacy.transactions:3d} xfers {legacy.modelled_time() * 1000:6.2f} ms"
+          f"   burst: {burst.transactions:3d} xfers {burst.modelled_time() * 1000:6.2f} ms")
+
+
+class Counter(object):
+    def __init__(self, transactions, nbytes):
+        self.transactions = transactions
+        self.bytes = nbytes
+
+    def modelled_time(self):
+        return self.transactions * RFM69sim.SPI_TRANSACTION_OVERHEAD_S + self.bytes * RFM69sim.SPI_BYTE_TIME_S
+
+
+def measure(dev, fn):
+    dev.reset_counters()
+    fn()
+    return Counter(dev.transactions, dev.bytes)
+
+
+def main():
+    radio = RFM69.RFM69(RF69_915MHZ, 1, 0, isRFM69HW=True)
+    dev = RFM69sim.devices[(radio.spiBus, radio.spiDevice)]
+
+    def legacyConfig():
+        for reg, value in radio.CONFIG.values():
+            radio.writeReg(reg, value)
+
+    def legacyReadAll():
+        for address in range(1, 0x50):
+            radio.readReg(address)
+
+    def legacySetFrequency():
+        freq = int(round(915000000 / 61.03515625))
+        radio.writeReg(REG_FRFMSB, freq >> 16)
+        radio.writeReg(REG_FRFMID, freq >> 8)
+        radio.writeReg(REG_FRFLSB, freq)
+
+    def legacyGetFrequency():
+        return (radio.readReg(REG_FRFMSB) << 16) + (radio.readReg(REG_FRFMID) << 8) + radio.readReg(REG_FRFLSB)
+
+    report("write CONFIG", measure(dev, legacyConfig), measure(dev, lambda: radio.writeConfig(radio.CONFIG)))
+    report("readAllRegs", measure(dev, legacyReadAll), measure(dev, radio.readAllRegs))
+    report("setFrequency", measure(dev, legacySetFrequency), measure(dev, lambda: radio.setFrequency(915000000)))
+    report("getFrequency", measure(dev, legacyGetFrequency), measure(dev, radio.getFrequency))
+
+    start = time.perf_counter()
+    for i in range(1000):
+        radio.readAllRegs()
+    print(f"readAllRegs host CPU: {(time.perf_counter() - start):.3f} ms per call (simulated bus)")
+
+
+if __name__ == "__main__":
+    main()
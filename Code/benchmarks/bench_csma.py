@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+# Collision rate against node count on a simulated RF medium: N nodes spread on a 750 m
+# circle around a sink all send it short frames at random (Poisson) times, for a total
+# offered load of half the channel. Nodes on opposite sides are 1.5 km apart and hear
+# each other at about -91 dBm, just under the old fixed -90 dBm carrier-sense limit.
+# Compares the previous behaviour (transmit the moment the channel reads clear), binary
+# exponential backoff at -90 dBm, and backoff with calibrateCsma()'s threshold.
+
+import math
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+from RFM69medium import Medium
+from RFM69profiles import PROFILES
+
+FRAMES = 40
+PAYLOAD = bytes(40)
+RADIUS = 750
+LOAD = 0.5
+PROFILE = PROFILES["55k5"]
+SCHEMES = ["persistent -90 dBm", "backoff -90 dBm", "backoff calibrated"]
+
+
+def node(medium, position, nodeID):
+    radio = RFM69.RFM69(RF69_433MHZ, nodeID, 0, isRFM69HW=True, backend=RFM69sim.SimBackend(medium, position))
+    radio.setFrequency(433000000)
+    radio.setProfile(PROFILE)
+    radio.setOutputPower(20)
+    radio.promiscuous(True)
+    return radio
+
+
+def run(scheme, count, timeScale):
+    medium = Medium(timeScale=timeScale, seed=count)
+    sink = node(medium, (0, 0), 1)
+    senders = []
+    for i in range(count):
+        angle = 2 * math.pi * i / count
+        radio = node(medium, (RADIUS * math.cos(angle), RADIUS * math.sin(angle)), 10 + i)
+        radio.csmaRandom.seed(i)
+        if scheme.startswith("persistent"):
+            radio.csmaMinBE = radio.csmaMaxBE = 0
+        if scheme.endswith("calibrated"):
+            radio.calibrateCsma()
+        radio.receiveBegin()
+        senders.append(radio)
+    sinkDev = sink.backend.devices[(0, 0)]
+    sink.receiveBegin()
+
+    airtime = senders[0].backend.devices[(0, 0)].airtime(len(PAYLOAD) + 4)
+    interval = count * airtime / LOAD
+    received = []
+    done = threading.Event()
+
+    def send(radio):
+        for i in range(FRAMES):
+            time.sleep(radio.csmaRandom.expovariate(1.0 / interval))
+            radio.send(1, PAYLOAD)
+
+    def receive():
+        while not done.is_set():
+            frame = sink.receive(timeout = 0.05)
+            if frame is not None:
+                received.append(frame)
+
+    receiver = threading.Thread(target=receive)
+    receiver.start()
+    threads = [threading.Thread(target=send, args=(radio,)) for radio in senders]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(5 * airtime)
+    done.set()
+    receiver.join()
+
+    sent = count * FRAMES
+    deferrals = sum(radio.csmaDeferrals for radio in senders)
+    busy = sum(radio.csmaBusyTime for radio in senders) / timeScale
+    failures = sum(radio.csmaFailures for radio in senders)
+    threshold = sum(radio.csmaThreshold for radio in senders) / count
+    print(f"  {scheme:<20} CCA {threshold:6.1f} dBm  delivered {len(received) * 100.0 / sent:5.1f}%"
+          f"  collided at sink {sinkDev.crcErrors * 100.0 / sent:5.1f}%"
+          f"  deferrals/frame {deferrals / float(sent):4.2f}  busy {busy * 1000 / sent:5.2f} ms/frame"
+          f"  gave up {failures}")
+
+
+def main():
+    timeScale = float(sys.argv[1]) if len(sys.argv) > 1 else 4.0
+    print(f"{FRAMES} x {len(PAYLOAD)}-byte frames per node at {PROFILE.bitrate / 1000:.1f} kbps,"
+          f" offered load {LOAD:g}, time scale {timeScale:g}")
+    for count in (2, 4, 8):
+        print(f"{count} nodes")
+        for scheme in SCHEMES:
+            run(scheme, count, timeScale)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+# Airtime and duty-cycle pacing on a simulated RF medium. First, frame airtime as
+# Airtime computes it from the live registers against the nominal Profile.airtime() and
+# the time each frame really spent on the simulated air, for a few profiles, preamble and
+# sync lengths and payload sizes. Then one 1500-byte IP packet through send_packet() at
+# 915 MHz, with the fixed 0.3 s pause it used to have and with a Scheduler with no bands
+# (REGION 1), which keeps only its minGap, and without that. Then a stream of 60-byte
+# frames at 868.3 MHz (1% sub-band), with the hour-long window compressed to WINDOW_S:
+# fixed 0.16 s and 0.3 s pauses against the Scheduler, with the highest share of any
+# window actually spent on air. Then the SPI a Scheduler adds to a send without the
+# shadow. Last, the EU Scheduler refusing 433.000 MHz, below the 433.05 MHz band edge, and
+# 868.0 MHz at 250 kbps, which spills over the 868.0 MHz edge, but not 868.3 MHz.
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+from RFM69medium import Medium
+from RFM69profiles import PROFILES
+from RFM69dutycycle import EU_BANDS, Airtime, DutyCycleError, Scheduler, schedulerFor
+from TwinRF69_tx_rx_radios import CHUNK_SIZE, send_packet
+
+WINDOW_S = 5.0
+STREAM_S = 12.0
+IP_PACKET = 1500
+
+
+# Keeps every frame put on air, where Medium.history only holds the last second
+class Recorder(Medium):
+    def __init__(self):
+        Medium.__init__(self)
+        self.log = []
+
+    def transmit(self, source, tx):
+        Medium.transmit(self, source, tx)
+        transmission = tx["transmission"]
+        self.log.append((transmission.start, transmission.end - transmission.start))
+
+
+def node(medium, position, nodeID, band, freq, profile):
+    radio = RFM69.RFM69(band, nodeID, 0, isRFM69HW=True, backend=RFM69sim.SimBackend(medium, position))
+    radio.setProfile(profile)
+    radio.setFrequency(freq)
+    radio.setOutputPower(20)
+    return radio
+
+
+# Highest fraction of any `window` seconds on air, over windows ending as a frame ends
+def peakUtilisation(log, window):
+    peak = 0.0
+    for start, length in log:
+        end = start + length
+        used = sum(min(e, end) - max(s, end - window) for s, e in ((s, s + l) for s, l in log)
+                   if e > end - window and s < end)
+        peak = max(peak, used / window)
+    return peak
+
+
+def airtimes():
+    print("frame airtime, ms: registers (Airtime) / nominal (Profile.airtime) / measured on air")
+    for name, preamble, sync in [("55k5", 3, RF_SYNC_SIZE_2), ("250k", 3, RF_SYNC_SIZE_2), ("250k", 8, RF_SYNC_SIZE_4),
+                                 ("4k8", 16, RF_SYNC_SIZE_8)]:
+        medium = Recorder()
+        tx = node(medium, (0, 0), 1, RF69_915MHZ, 915000000, PROFILES[name])
+        tx.writeRegs(REG_PREAMBLEMSB, [preamble >> 8, preamble & 0xFF])
+        tx.updateReg(REG_SYNCCONFIG, 0xC7, sync)
+        airtime = Airtime(tx)
+        for nbytes in (0, 20, 61):
+            tx.send(2, bytes(nbytes))
+            measured = medium.log[-1][1]
+            # the simulator does not model the PA ramp
+            computed = airtime.frameTime(nbytes) - 2 * airtime.ramp
+            print(f"  {name:>4} preamble {preamble:2d} sync {airtime.sync} data {nbytes:2d}:"
+                  f" {computed * 1000:7.3f} / {PROFILES[name].airtime(nbytes) * 1000:7.3f} / {measured * 1000:7.3f}")
+    medium = Recorder()
+    tx = node(medium, (0, 0), 1, RF69_915MHZ, 915000000, PROFILES["55k5"])
+    tx.updateReg(REG_PACKETCONFIG1, 0x9F, RF_PACKET1_DCFREE_MANCHESTER)
+    tx.updateReg(REG_PACKETCONFIG2, 0xFE, RF_PACKET2_AES_ON)
+    print(f"  55k5 Manchester + AES, data 20: {Airtime(tx).frameTime(20) * 1000:.3f} ms"
+          f" (the simulator models neither)")
+
+
+def received(rx, done, frames):
+    while not done.is_set():
+        if rx.receive(timeout = 0.01) is not None:
+            frames[0] += 1
+
+
+def ipPacket():
+    print(f"one {IP_PACKET}-byte IP packet through send_packet() at 915 MHz, 250 kbps:")
+    for name, pacer in [("pause 0.3 s", None), ("Scheduler", lambda radio: Scheduler(radio, bands=())),
+                        ("minGap 0", lambda radio: Scheduler(radio, bands=(), minGap=0.0))]:
+        medium = Recorder()
+        tx = node(medium, (0, 0), 1, RF69_915MHZ, 915000000, PROFILES["250k"])
+        rx = node(medium, (100, 0), 2, RF69_915MHZ, 915000000, PROFILES["250k"])
+        rx.receiveBegin()
+        done, frames = threading.Event(), [0]
+        thread = threading.Thread(target=received, args=(rx, done, frames))
+        thread.start()
+        start = time.monotonic()
+        if pacer is None:
+            send_packet(bytes(IP_PACKET), tx, rx.address, chunk_size=CHUNK_SIZE, pause=0.3)
+        else:
+            send_packet(bytes(IP_PACKET), pacer(tx), rx.address, chunk_size=CHUNK_SIZE)
+        elapsed = time.monotonic() - start
+        time.sleep(0.05)
+        done.set()
+        thread.join()
+        print(f"  {name:<12} {elapsed * 1000:7.1f} ms, {frames[0]}/{len(medium.log)} frames received")
+        if name == "Scheduler":
+            # MIN_FRAME_GAP_S is there so a receiver keeping up with the link loses nothing
+            assert frames[0] == len(medium.log), "the Scheduler's minGap let frames be lost"
+
+
+def stream(pause):
+    medium = Recorder()
+    tx = node(medium, (0, 0), 1, RF69_868MHZ, 868300000, PROFILES["250k"])
+    sender = Scheduler(tx, EU_BANDS, WINDOW_S) if pause is None else tx
+    end = time.monotonic() + STREAM_S
+    while time.monotonic() < end:
+        sender.send(2, bytes(60))
+        if pause is not None:
+            time.sleep(pause)
+    return medium.log
+
+
+def dutyCycle():
+    print(f"60-byte frames at 868.3 MHz (limit 1%), 250 kbps, window compressed to {WINDOW_S:.0f} s, {STREAM_S:.0f} s run:")
+    for name, pause in [("pause 0.16 s", 0.16), ("pause 0.3 s", 0.3), ("Scheduler", None)]:
+        log = stream(pause)
+        onAir = sum(length for start, length in log)
+        print(f"  {name:<12} {len(log):4d} frames, {onAir * 1000:6.1f} ms on air,"
+              f" peak window {peakUtilisation(log, WINDOW_S) * 100:5.2f}%")
+
+
+# Without the shadow, a paced send costs the same SPI as a bare one until the profile changes
+def schedulerCost():
+    tx = node(Recorder(), (0, 0), 1, RF69_915MHZ, 915000000, PROFILES["250k"])
+    dev = tx.backend.devices[(0, 0)]
+    pacer = Scheduler(tx, bands=(), minGap=0.0)
+    # the first send also takes the chip out of standby
+    tx.send(2, bytes(60))
+    dev.reset_counters()
+    tx.send(2, bytes(60))
+    bare = dev.transactions
+    dev.reset_counters()
+    pacer.send(2, bytes(60))
+    paced = dev.transactions
+    print(f"SPI transactions per 60-byte send, no shadow: {bare} bare, {paced} through a Scheduler")
+    assert paced == bare, (bare, paced)
+    tx.setProfile(PROFILES["55k5"])
+    pacer.send(2, bytes(60))
+    assert abs(pacer.airtime.bitrate / PROFILES["55k5"].bitrate - 1) < 0.01, pacer.airtime.bitrate
+    # schedulerFor() hands out one Scheduler per radio, for the bands it was made with only
+    assert schedulerFor(tx, ()) is schedulerFor(tx, ()) is tx.scheduler
+    try:
+        schedulerFor(tx, EU_BANDS)
+        raise AssertionError("schedulerFor() paced EU_BANDS with the () Scheduler")
+    except DutyCycleError:
+        pass
+
+
+def offBand():
+    for band, freq, profile, fits in [(RF69_433MHZ, 433000000, "55k5", False), (RF69_868MHZ, 868000000, "250k", False),
+                                      (RF69_868MHZ, 868300000, "250k", True)]:
+        tx = node(Recorder(), (0, 0), 1, band, freq, PROFILES[profile])
+        try:
+            Scheduler(tx, EU_BANDS).send(2, bytes(60))
+            print(f"{freq / 1e6:.3f} MHz, {profile} with EU_BANDS: sent")
+            assert fits, "a signal outside the sub-bands went out"
+        except DutyCycleError as e:
+            print(f"{freq / 1e6:.3f} MHz, {profile} with EU_BANDS: {e}")
+            assert not fits, e
+
+
+def main():
+    airtimes()
+    ipPacket()
+    dutyCycle()
+    schedulerCost()
+    offBand()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+# Goodput of a 433 MHz link on a simulated RF medium with a narrowband jammer parked on
+# one channel (the first hop after the plan's home channel) next to the receiver, keying
+# up about 80% of the time without listening first. Compares staying on that one
+# frequency (sendReliable with 4 retries), hopping over the channel plan without a
+# blacklist, and hopping with it.
+# Each run stops after FRAMES frames or RUN_S seconds, whichever comes first. First
+# checks that the channel plan of every preset keeps each channel's +/- RxBw clear of its
+# neighbours' and inside the band.
+
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+from RFM69hopping import CHANNEL_BANDS, Hopper, channelPlan
+from RFM69medium import Medium
+from RFM69profiles import PROFILES
+
+FRAMES = 150
+RUN_S = 30.0
+PAYLOAD = bytes(50)
+PROFILE = PROFILES["55k5"]
+SEED = 7
+
+
+def node(medium, position, nodeID):
+    radio = RFM69.RFM69(RF69_433MHZ, nodeID, 0, isRFM69HW=True, backend=RFM69sim.SimBackend(medium, position))
+    radio.setProfile(PROFILE)
+    radio.setOutputPower(20)
+    return radio
+
+
+def run(name, medium, tx, rx, hopping = None, jam = None):
+    plan = channelPlan(RF69_433MHZ, SEED, PROFILE)
+    jammed = plan.frequency(plan.sequence[1])
+    for radio in (tx, rx):
+        radio.setFrequency(plan.frequency(plan.home()) if hopping is not None else jammed)
+        radio.peerLinks.clear()
+    rx.frameHook = None
+    txHop = rxHop = None
+    if hopping is not None:
+        txHop = Hopper(tx, rx.address, plan, **hopping)
+        rxHop = Hopper(rx, tx.address, plan)
+        rxHop.listen()
+    medium.reset_stats()
+    done = threading.Event()
+    received = [0]
+
+    def receiver():
+        while not done.is_set():
+            frame = rxHop.receive(timeout = 0.05) if rxHop is not None else rx.receive(timeout = 0.05)
+            if frame is not None and frame.senderID == tx.address:
+                received[0] += 1
+
+    def jammer():
+        rng = random.Random(1)
+        while not done.is_set():
+            jam.send(99, bytes(60))
+            time.sleep(rng.uniform(0, 0.004))
+
+    threads = [threading.Thread(target=receiver)]
+    if jam:
+        jam.setFrequency(jammed)
+        threads.append(threading.Thread(target=jammer))
+    for thread in threads:
+        thread.start()
+    start = time.monotonic()
+    delivered = sent = 0
+    while sent < FRAMES and time.monotonic() - start < RUN_S:
+        sent += 1
+        if txHop is not None:
+            delivered += txHop.send(PAYLOAD)
+        else:
+            delivered += tx.sendReliable(rx.address, PAYLOAD, 4) is not None
+    elapsed = time.monotonic() - start
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    line = (f"{name:<24} ACKed {delivered:3d}/{sent:3d}  goodput {delivered * len(PAYLOAD) * 8 / elapsed / 1000:5.1f} kbps"
+            f"  collisions {medium.collisions:4d}  sender CSMA busy {tx.csmaBusyTime:5.2f} s")
+    if txHop is not None:
+        stats = txHop.stats()
+        line += (f"  retunes {stats['retunes']:4d}  receiver fallbacks {rxHop.fallbacks:3d}"
+                 f"  blacklisted {stats['blacklist']}")
+    print(line)
+    tx.csmaBusyTime = 0.0
+
+
+def checkPlans():
+    for band, (low, high) in CHANNEL_BANDS.items():
+        for profile in PROFILES.values():
+            channels = sorted(channelPlan(band, profile = profile).channels)
+            assert channels[0] - profile.rxBw >= low and channels[-1] + profile.rxBw <= high, \
+                f"{profile.name}: channels reach outside {low / 1e6:.3f}-{high / 1e6:.3f} MHz"
+            assert all(b - a >= 2 * profile.rxBw + profile.fdev for a, b in zip(channels, channels[1:])), \
+                f"{profile.name}: neighbouring channels overlap"
+    print("channel plans: every preset's channels are clear of each other and of the band edges")
+
+
+def main():
+    checkPlans()
+    medium = Medium()
+    tx, rx = node(medium, (0, 0), 1), node(medium, (300, 0), 2)
+    jam = node(medium, (320, 0), 3)
+    # transmits whatever the channel looks like
+    jam.csmaThreshold = 0
+    rx.setAutoAck(True)
+    tx.receiveBegin()
+    rx.receiveBegin()
+    plan = channelPlan(RF69_433MHZ, SEED, PROFILE)
+    print(f"{FRAMES} x {len(PAYLOAD)}-byte frames at {PROFILE.bitrate / 1000:.1f} kbps over {len(plan.channels)} channels,"
+          f" jammer on {plan.frequency(plan.sequence[1]) / 1e6:.3f} MHz")
+    run("fixed, no jammer", medium, tx, rx, jam=None)
+    run("fixed", medium, tx, rx, jam=jam)
+    run("hopping, no blacklist", medium, tx, rx, {"lossThreshold": 1.1}, jam=jam)
+    run("hopping + blacklist", medium, tx, rx, {}, jam=jam)
+
+
+if __name__ == "__main__":
+    main()
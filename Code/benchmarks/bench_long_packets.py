@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+# Goodput of a 248-byte IP packet between two simulated RFM69s in real time:
+# fragmented send_packet style (4-byte header per fragment) versus one long-packet-mode
+# frame with a single preamble. Fragments carry 58 bytes so that header, payload and
+# length byte fit the 66-byte FIFO.
+#
+# Short mode is checked first: the longest payload that fits the FIFO must arrive intact,
+# and a longer one must arrive cut to that length rather than overrun the receiver.
+#
+# A long frame leaves the host LONG_SLACK_BYTES of air to refill or drain the FIFO. Where
+# that is shorter than LONG_HOST_LATENCY_S setLongPackets() refuses; the long frame is then
+# also tried with the check overridden, to show what it would cost.
+
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+
+PACKET = bytes(range(248))
+ROUNDS = 5
+BITRATES = [(RF_BITRATEMSB_19200, RF_BITRATELSB_19200, "19.2 kbps"),
+            (RF_BITRATEMSB_55555, RF_BITRATELSB_55555, "55.5 kbps"),
+            (RF_BITRATEMSB_250000, RF_BITRATELSB_250000, "250 kbps")]
+
+
+def link():
+    tx = RFM69.RFM69(RF69_915MHZ, 1, 0, isRFM69HW=True, intPin=18, spiDevice=0)
+    rx = RFM69.RFM69(RF69_915MHZ, 2, 0, isRFM69HW=True, intPin=16, spiDevice=1)
+    txDev = RFM69sim.devices[(0, 0)]
+    rxDev = RFM69sim.devices[(0, 1)]
+    txDev.realtime = rxDev.realtime = True
+    RFM69sim.link(txDev, rxDev)
+    return tx, rx, txDev, rxDev
+
+
+def fragmented(tx, rx):
+    chunks = [PACKET[i:i + 58] for i in range(0, len(PACKET), 58)]
+    for seq, chunk in enumerate(chunks, 1):
+        tx.send(2, struct.pack(">HH", 1, seq) + chunk)
+    got = b""
+    for i in range(len(chunks)):
+        frame = rx.receive(timeout=1.0)
+        if frame is None:
+            return None
+        got += frame.data[4:]
+    return got
+
+
+def single(tx, rx):
+    tx.send(2, struct.pack(">HH", 1, 1) + PACKET)
+    frame = rx.receive(timeout=1.0)
+    return frame.data[4:] if frame is not None else None
+
+
+def shortLimit(tx, rx):
+    for n in (RF69_MAX_DATA_LEN, RF69_MAX_DATA_LEN + 1):
+        payload = bytes(range(n))
+        tx.send(2, payload)
+        frame = rx.receive(timeout=1.0)
+        assert frame is not None, f"a {n}-byte short-mode frame never arrived"
+        assert frame.data == payload[:RF69_MAX_DATA_LEN], f"a {n}-byte short-mode frame arrived as {len(frame.data)} bytes"
+    print(f"short mode: {RF69_MAX_DATA_LEN} and {RF69_MAX_DATA_LEN + 1}-byte sends arrive as {RF69_MAX_DATA_LEN} bytes")
+
+
+def run(name, tx, rx, fn):
+    ok = 0
+    start = time.monotonic()
+    for i in range(ROUNDS):
+        if fn(tx, rx) == PACKET:
+            ok += 1
+    elapsed = time.monotonic() - start
+    print(f"  {name:<22} {ok}/{ROUNDS} packets intact  goodput {ok * len(PACKET) * 8 / elapsed / 1000:6.1f} kbps")
+
+
+def main():
+    tx, rx, txDev, rxDev = link()
+    rx.receiveBegin()
+    shortLimit(tx, rx)
+    for msb, lsb, label in BITRATES:
+        for radio in (tx, rx):
+            radio.setLongPackets(False)
+            radio.writeRegs(REG_BITRATEMSB, [msb, lsb])
+            radio.receiveBegin()
+        txDev.txUnderruns = rxDev.rxOverruns = 0
+        print(label)
+        run("5 x 58-byte fragments", tx, rx, fragmented)
+        name = "1 long frame"
+        try:
+            tx.setLongPackets(True)
+        except ValueError as e:
+            print(f"  setLongPackets: {e}")
+            name = "1 long frame, forced"
+        for radio in (tx, rx):
+            radio.setLongPackets(True, hostLatency = 0)
+            radio.receiveBegin()
+        run(name, tx, rx, single)
+        print(f"  txUnderruns {txDev.txUnderruns}  rxOverruns {rxDev.rxOverruns}")
+
+
+if __name__ == "__main__":
+    main()
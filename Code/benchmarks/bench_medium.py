@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# Two in-process TwinRF69 nodes on a simulated RF medium, exchanging IP-sized packets
+# through the unmodified send_packet() / receive_packet_reassemble() of
+# TwinRF69_tx_rx_radios. Reports goodput, packet latency percentiles and airtime
+# efficiency (packet bytes delivered per byte time spent on air) for a clean link, the
+# edge of range, extra random loss, and an interferer on the same and on another band,
+# after checking the receiver's selectivity.
+
+import contextlib
+import io
+import os
+import statistics
+import struct
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+from RFM69medium import Medium
+from RFM69profiles import PROFILES
+from TwinRF69_tx_rx_radios import CHUNK_SIZE, receive_packet_reassemble, send_packet
+
+PACKETS = 40
+PACKET_SIZE = 200
+PROFILE = PROFILES["55k5"]
+BANDS = {RF69_433MHZ: 433000000, RF69_915MHZ: 915000000}
+
+
+def node(medium, position, nodeID, band = RF69_433MHZ):
+    backend = RFM69sim.SimBackend(medium, position)
+    radio = RFM69.RFM69(band, nodeID, 0, isRFM69HW=True, backend=backend)
+    radio.setFrequency(BANDS[band])
+    radio.setProfile(PROFILE)
+    radio.setOutputPower(20)
+    radio.promiscuous(True)
+    return radio
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+
+# Send PACKETS packets from tx to rx while `interferer` (if any) keeps its channel busy
+def run(name, medium, tx, rx, interferer = None):
+    medium.reset_stats()
+    done = threading.Event()
+    latencies = []
+    delivered = 0
+
+    def sender():
+        for i in range(PACKETS):
+            pkt = struct.pack(">Id", i, time.monotonic())
+            send_packet(pkt + bytes(PACKET_SIZE - len(pkt)), tx, rx.address, chunk_size=CHUNK_SIZE, pause=0)
+        time.sleep(0.2)
+        done.set()
+
+    def interfere():
+        while not done.is_set():
+            interferer.send(99, bytes(30))
+            time.sleep(0.1 * medium.timeScale)
+
+    threads = [threading.Thread(target=sender)]
+    if interferer is not None:
+        threads.append(threading.Thread(target=interfere))
+    rx.receiveBegin()
+    start = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        while not done.is_set():
+            result = receive_packet_reassemble(rx)
+            if result is None:
+                time.sleep(0.0005)
+                continue
+            sender_id, pkt = result
+            latencies.append(time.monotonic() - struct.unpack(">Id", pkt[:12])[1])
+            delivered += len(pkt)
+        for thread in threads:
+            thread.join()
+    elapsed = (time.monotonic() - start) / medium.timeScale
+    airtime = medium.airtime.get(BANDS[RF69_433MHZ], 0.0)
+    latencies = [l / medium.timeScale for l in latencies] or [float("nan")]
+    print(f"{name:<22} packets {len(latencies) if delivered else 0:3d}/{PACKETS}"
+          f"  goodput {delivered * 8 / elapsed / 1000:5.1f} kbps"
+          f"  latency p50 {statistics.median(latencies) * 1000:6.1f} p95 {percentile(latencies, 95) * 1000:6.1f}"
+          f" p99 {percentile(latencies, 99) * 1000:6.1f} ms"
+          f"  airtime eff {delivered / (airtime * PROFILE.bitrate / 8) if airtime else 0:4.2f}"
+          f"  lost {medium.lost:3d} crc {medium.crcErrors:3d} coll {medium.collisions:3d}")
+
+
+# RxBw is single-sided on the SX1231: a carrier up to RxBw either side of the receiver's
+# frequency is heard, one further out is not
+def selectivity(medium, rx):
+    dev = rx.backend.devices[(0, 0)]
+    rxBw, centre = dev.rx_bandwidth(), dev.frequency()
+    assert medium.tuned(dev, centre - 0.9 * rxBw) and medium.tuned(dev, centre + 0.9 * rxBw), "RxBw treated as two-sided"
+    assert not medium.tuned(dev, centre + 1.1 * rxBw), "heard a carrier outside RxBw"
+    print(f"receiver hears carriers within +/-{rxBw / 1000:.1f} kHz")
+
+
+def main():
+    timeScale = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    print(f"{PACKETS} x {PACKET_SIZE}-byte packets at {PROFILE.bitrate / 1000:.1f} kbps, +20 dBm,"
+          f" time scale {timeScale:g}")
+
+    # a full fragment and its header fill the frame to RF69_MAX_DATA_LEN, and no further
+    assert CHUNK_SIZE + 4 == RF69_MAX_DATA_LEN, CHUNK_SIZE
+    medium = Medium(timeScale=timeScale)
+    tx, rx = node(medium, (0, 0), 1), node(medium, (100, 0), 2)
+    selectivity(medium, rx)
+    run("100 m", medium, tx, rx)
+    medium.move(rx.backend.devices[(0, 0)], (5200, 0))
+    run("5.2 km (edge)", medium, tx, rx)
+    medium.move(rx.backend.devices[(0, 0)], (100, 0))
+
+    medium.loss = 0.1
+    run("100 m, 10% loss", medium, tx, rx)
+    medium.loss = 0.0
+
+    jammer = node(medium, (150, 0), 3)
+    run("interferer, 433 MHz", medium, tx, rx, jammer)
+    other = node(medium, (150, 50), 4, RF69_915MHZ)
+    run("interferer, 915 MHz", medium, tx, rx, other)
+
+
+if __name__ == "__main__":
+    main()
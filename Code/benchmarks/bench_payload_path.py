@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+# Per-frame allocation and CPU time of the FIFO write and drain paths: the original
+# list-building code versus writeFifo()/readFifo() with preallocated buffers.
+# A null SPI that behaves like spidev (returns a fresh result list) isolates driver cost.
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+
+FRAMES = 20000
+PAYLOAD = bytes(range(60))
+PAYLOAD_STR = PAYLOAD.decode("latin-1")
+
+
+class NullSpi(object):
+    def xfer2(self, data):
+        out = [0] * len(data)
+        if len(data) == 5:
+            out[1:] = [len(PAYLOAD) + 3, 1, 2, 0]
+        return out
+
+    def xfer(self, data):
+        return [0] * len(data)
+
+    def writebytes2(self, data):
+        pass
+
+
+def legacySend(radio, buff):
+    radio.spi.xfer2([REG_FIFO | 0x80, len(buff) + 3, 2, radio.address, 0] + buff)
+
+
+def legacySendStr(radio, buff):
+    radio.spi.xfer2([REG_FIFO | 0x80, len(buff) + 3, 2, radio.address, 0] + [int(ord(i)) for i in list(buff)])
+
+
+def legacyDrain(radio):
+    payloadLen, targetID, senderID, CTLbyte = radio.spi.xfer2([REG_FIFO & 0x7f, 0, 0, 0, 0])[1:]
+    data = radio.spi.xfer2([REG_FIFO & 0x7f] + [0 for i in range(0, payloadLen - 3)])[1:]
+    return bytes(data)
+
+
+def measure(name, fn):
+    tracemalloc.start()
+    fn()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    start = time.process_time()
+    for i in range(FRAMES):
+        fn()
+    cpu = (time.process_time() - start) / FRAMES
+    print(f"{name:<28} peak alloc {peak:5d} B/frame  cpu {cpu * 1e6:6.2f} us/frame")
+
+
+def main():
+    radio = RFM69.RFM69(RF69_915MHZ, 1, 0, isRFM69HW=True)
+    radio.spi = NullSpi()
+    payloadList = list(PAYLOAD)
+    measure("TX legacy list (from bytes)", lambda: legacySend(radio, list(PAYLOAD)))
+    measure("TX legacy list (from list)", lambda: legacySend(radio, payloadList))
+    measure("TX legacy list (from str)", lambda: legacySendStr(radio, PAYLOAD_STR))
+    measure("TX writeFifo (str)", lambda: radio.writeFifo(2, PAYLOAD_STR, 0))
+    measure("TX writeFifo (bytes)", lambda: radio.writeFifo(2, PAYLOAD, 0))
+    measure("TX writeFifo (memoryview)", lambda: radio.writeFifo(2, memoryview(PAYLOAD), 0))
+    measure("RX legacy drain", lambda: legacyDrain(radio))
+    # readFifo also reads RSSI and builds the Frame the legacy path never had
+    measure("RX readFifo", radio.readFifo)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# Joules per delivered byte over a simulated 55.5 kbps link whose path loss drifts
+# between 92 and 112 dB: fixed +20 dBm, as setup_radios configures today, versus the
+# closed-loop power controller working from the RSSI the peer puts in each ACK.
+
+import math
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+from RFM69profiles import PROFILES
+from RFM69power import PowerController, ackWithRssi
+
+DURATION = 10.0
+PAYLOAD = bytes(60)
+
+
+def pathLoss(t):
+    return 102 + 10 * math.sin(2 * math.pi * t / DURATION)
+
+
+def run(name, tx, rx, controlled):
+    devs = [RFM69sim.devices[(r.spiBus, r.spiDevice)] for r in (tx, rx)]
+    controller = PowerController(tx, 2, minPower=None if controlled else 20)
+    start = time.monotonic()
+    done = threading.Event()
+    powers = []
+
+    def channel():
+        while not done.is_set():
+            for dev in devs:
+                dev.pathLoss = pathLoss(time.monotonic() - start)
+            time.sleep(0.05)
+
+    def receive():
+        while not done.is_set():
+            frame = rx.receive(timeout=0.1)
+            if frame is not None and frame.ackRequested:
+                ackWithRssi(rx, frame)
+
+    threads = [threading.Thread(target=fn) for fn in (channel, receive)]
+    for thread in threads:
+        thread.start()
+    while time.monotonic() - start < DURATION:
+        controller.send(2, PAYLOAD)
+        powers.append(controller.power)
+    done.set()
+    for thread in threads:
+        thread.join()
+    print(f"{name:<18} delivered {controller.delivered:5d}/{controller.frames:<5d}"
+          f"  mean power {sum(powers) / len(powers):5.1f} dBm"
+          f"  {controller.joulesPerByte() * 1e6:6.2f} uJ per delivered byte")
+    return controller
+
+
+def main():
+    tx = RFM69.RFM69(RF69_915MHZ, 1, 0, isRFM69HW=True, intPin=18, spiDevice=0)
+    rx = RFM69.RFM69(RF69_915MHZ, 2, 0, isRFM69HW=True, intPin=16, spiDevice=1)
+    txDev = RFM69sim.devices[(0, 0)]
+    rxDev = RFM69sim.devices[(0, 1)]
+    txDev.realtime = rxDev.realtime = True
+    RFM69sim.link(txDev, rxDev)
+    for radio in (tx, rx):
+        radio.setProfile(PROFILES["55k5"])
+    # the peer ACKs at full power throughout
+    rx.setOutputPower(20)
+    run("fixed +20 dBm", tx, rx, False)
+    controller = run("power control", tx, rx, True)
+    # the controller can only step down on the RSSI the peer's ACKs carry
+    assert controller.peerRssi is not None, "no ACK carried the peer's RSSI"
+
+    # an auto-ACKing peer has already answered without the RSSI byte
+    rx.setAutoAck(True)
+    try:
+        ackWithRssi(rx, RFM69.Frame(b"", 1, 2, 0x40, -60.0, time.monotonic()))
+        raise AssertionError("ackWithRssi() returned with auto-ACK on")
+    except ValueError as e:
+        print(f"ackWithRssi with auto-ACK on: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+# Time to switch between the long-range and high-throughput modem profiles against a
+# simulated RFM69: setup_radios-style per-register writes versus setProfile(), and the
+# register values each preset computes.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+from RFM69profiles import PROFILES
+
+SWITCHES = 100
+
+
+def handWritten(radio, profile):
+    # what setup_radios does today, one writeReg() per register
+    radio.setMode(RF69_MODE_STANDBY)
+    for reg, value in sorted(profile.config().values()):
+        radio.writeReg(reg, value)
+    radio.writeReg(REG_PACKETCONFIG1,
+                   RF_PACKET1_FORMAT_VARIABLE | profile.dcFree() | RF_PACKET1_CRC_ON |
+                   RF_PACKET1_CRCAUTOCLEAR_ON | RF_PACKET1_ADRSFILTERING_OFF)
+    radio.receiveBegin()
+
+
+def run(name, radio, dev, apply):
+    dev.reset_counters()
+    for i in range(SWITCHES):
+        apply(radio, PROFILES["long_range" if i % 2 else "high_throughput"])
+    print(f"{name:<22} {dev.transactions / SWITCHES:5.1f} SPI xfers per switch"
+          f"  {dev.modelled_time() / SWITCHES * 1000:5.2f} ms modelled bus time")
+
+
+def main():
+    for name in ["4k8", "9k6", "19k2", "38k4", "55k5", "100k", "150k", "200k", "250k", "300k"]:
+        print(PROFILES[name])
+    radio = RFM69.RFM69(RF69_915MHZ, 1, 0, isRFM69HW=True, shadowRegs=True)
+    dev = RFM69sim.devices[(radio.spiBus, radio.spiDevice)]
+    radio.receiveBegin()
+    run("per-register writes", radio, dev, handWritten)
+    run("setProfile()", radio, dev, RFM69.RFM69.setProfile)
+    expected = PROFILES["4k8"].config()
+    actual = dict((reg, radio.readReg(reg)) for reg, value in expected.values())
+    print("registers match profile:", all(actual[reg] == value for reg, value in expected.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+# Goodput over a simulated link whose signal swings from -80 to -114 dBm and back,
+# as over a day compressed into DURATION seconds: fixed 250 kbps, fixed 19.2 kbps,
+# and the adaptive rate controller switching over a separate 19.2 kbps control link.
+# The fixed high rate goes dark for the whole fade; the fixed low rate never uses the
+# good hours; the controller follows the signal.
+
+import math
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+from RFM69profiles import PROFILES
+from RFM69ratecontrol import RateController
+
+DURATION = 15.0
+PAYLOAD = bytes(60)
+
+
+def signal(t):
+    return -80 - 34 * (0.5 - 0.5 * math.cos(2 * math.pi * t / DURATION))
+
+
+def radios():
+    data = [RFM69.RFM69(RF69_915MHZ, node, 0, isRFM69HW=True, intPin=pin, spiDevice=dev)
+            for node, pin, dev in [(1, 18, 0), (2, 16, 1)]]
+    control = [RFM69.RFM69(RF69_433MHZ, node, 0, isRFM69HW=True, intPin=pin, spiDevice=dev)
+               for node, pin, dev in [(1, 15, 2), (2, 13, 3)]]
+    for a, b in (data, control):
+        devA = RFM69sim.devices[(a.spiBus, a.spiDevice)]
+        devB = RFM69sim.devices[(b.spiBus, b.spiDevice)]
+        devA.realtime = devB.realtime = True
+        RFM69sim.link(devA, devB)
+    for radio in control:
+        radio.setProfile(PROFILES["19k2"])
+        RFM69sim.devices[(radio.spiBus, radio.spiDevice)].rssi = -95
+    return data, control
+
+
+def run(name, data, control, ladder):
+    tx, rx = data
+    sender = RateController(tx, 2, ladder, controlRadio=control[0])
+    receiver = RateController(rx, 1, ladder, controlRadio=control[1])
+    devs = [RFM69sim.devices[(r.spiBus, r.spiDevice)] for r in data]
+    delivered = [0]
+    start = time.monotonic()
+    # longest stretch without a delivered frame
+    gaps = [start, 0.0]
+    done = threading.Event()
+
+    def channel():
+        while not done.is_set():
+            for dev in devs:
+                dev.rssi = signal(time.monotonic() - start)
+            time.sleep(0.05)
+
+    def receive():
+        while not done.is_set():
+            frame = rx.receive(timeout=0.1)
+            if frame is None:
+                continue
+            receiver.heard()
+            delivered[0] += len(frame.data)
+            now = time.monotonic()
+            gaps[1] = max(gaps[1], now - gaps[0])
+            gaps[0] = now
+            if frame.ackRequested:
+                rx.sendACK(frame.senderID)
+
+    def listen():
+        while not done.is_set():
+            frame = control[1].receive(timeout=0.1)
+            if frame is not None:
+                receiver.handleFrame(frame)
+            receiver.poll()
+
+    threads = [threading.Thread(target=fn) for fn in (channel, receive, listen)]
+    for thread in threads:
+        thread.start()
+    sent = 0
+    while time.monotonic() - start < DURATION:
+        sender.send(2, PAYLOAD)
+        sent += 1
+    done.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    gaps[1] = max(gaps[1], start + elapsed - gaps[0])
+    print(f"{name:<18} goodput {delivered[0] * 8 / elapsed / 1000:6.1f} kbps  delivered {delivered[0] // len(PAYLOAD):5d}/{sent:<5d}"
+          f"  longest outage {gaps[1]:5.2f} s  switches {sender.switches}")
+
+
+def main():
+    data, control = radios()
+    run("fixed 250 kbps", data, control, ["250k"])
+    run("fixed 19.2 kbps", data, control, ["19k2"])
+    run("adaptive", data, control, ["9k6", "19k2", "55k5", "100k", "250k"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# sendWithRetry() against sendReliable() between two nodes on a simulated RF medium with
+# 10% frame loss, where the receiving host is sometimes slow to answer (one ACK in five
+# goes out up to 20 ms late). Counts frames the sender believed delivered that never
+# arrived (a late ACK for an earlier frame taken for the current one), retransmissions,
+# SPI transactions the sender spent per frame and, for sendReliable, the RTT percentiles
+# and final RTO from peerStats().
+
+import os
+import random
+import struct
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+from RFM69medium import Medium
+from RFM69profiles import PROFILES
+
+FRAMES = 200
+PROFILE = PROFILES["55k5"]
+
+
+def node(medium, position, nodeID):
+    radio = RFM69.RFM69(RF69_433MHZ, nodeID, 0, isRFM69HW=True, backend=RFM69sim.SimBackend(medium, position))
+    radio.setFrequency(433000000)
+    radio.setProfile(PROFILE)
+    radio.setOutputPower(20)
+    return radio
+
+
+def run(name, medium, tx, rx, sendOne):
+    medium.reset_stats()
+    received = set()
+    done = threading.Event()
+    slow = random.Random(1)
+
+    def receiver():
+        while not done.is_set():
+            frame = rx.receive(timeout = 0.05)
+            if frame is None or not frame.ackRequested:
+                continue
+            received.add(struct.unpack(">I", frame.data[:4])[0])
+            if slow.random() < 0.2:
+                time.sleep(slow.uniform(0, 0.02))
+            rx.sendACK(frame.senderID, seq = frame.seq)
+
+    thread = threading.Thread(target=receiver)
+    thread.start()
+    txDev = tx.backend.devices[(0, 0)]
+    txDev.reset_counters()
+    claimed = []
+    start = time.monotonic()
+    for i in range(FRAMES):
+        if sendOne(tx, struct.pack(">I", i) + bytes(28)):
+            claimed.append(i)
+    elapsed = time.monotonic() - start
+    time.sleep(0.1)
+    done.set()
+    thread.join()
+
+    false = sum(1 for i in claimed if i not in received)
+    print(f"{name:<15} claimed {len(claimed):3d}/{FRAMES}  arrived {len(received):3d}"
+          f"  false ACKs {false:3d}  frames on air {medium.frames:4d}"
+          f"  {elapsed / FRAMES * 1000:5.1f} ms/frame  {txDev.transactions / float(FRAMES):6.1f} SPI transactions/frame")
+
+
+def main():
+    medium = Medium(loss=0.1)
+    tx, rx = node(medium, (0, 0), 1), node(medium, (100, 0), 2)
+    rx.receiveBegin()
+    tx.receiveBegin()
+    print(f"{FRAMES} frames at {PROFILE.bitrate / 1000:.1f} kbps, 10% loss, 1 in 5 ACKs delayed up to 20 ms")
+
+    run("sendWithRetry", medium, tx, rx, lambda radio, data: radio.sendWithRetry(2, data, retries=4, retryWaitTime=10))
+    run("sendReliable", medium, tx, rx, lambda radio, data: radio.sendReliable(2, data, retries=3) is not None)
+    stats = tx.peerStats()[2]
+    print(f"  peer 2: retries {stats['retries']}  failures {stats['failures']}  stale ACKs {stats['staleAcks']}"
+          f"  RTT p50 {stats['rttP50'] * 1000:.1f} p95 {stats['rttP95'] * 1000:.1f} p99 {stats['rttP99'] * 1000:.1f} ms"
+          f"  RTO {stats['rto'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+# Per-frame pickup delay for the receiveDone()/sleep polling loop used by the bridge
+# scripts versus the blocking receive(timeout) API, on a simulated RFM69.
+
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+
+FRAMES = 100
+
+
+def injector(dev, sent, stop):
+    seq = 0
+    while seq < FRAMES and not stop.is_set():
+        time.sleep(random.uniform(0.02, 0.05))
+        if dev.inject(bytes([seq])):
+            sent[seq] = time.monotonic()
+        seq += 1
+    stop.set()
+
+
+def run(name, radio, dev, consume):
+    sent = {}
+    picked = {}
+    stop = threading.Event()
+    radio.receiveBegin()
+    thread = threading.Thread(target=injector, args=(dev, sent, stop))
+    thread.start()
+    while not stop.is_set() or radio.PAYLOADLEN > 0:
+        data = consume(radio)
+        if data:
+            picked[data[0]] = time.monotonic()
+    thread.join()
+    delays = sorted((picked[seq] - sent[seq]) * 1000 for seq in picked if seq in sent)
+    print(f"{name:<22} frames {len(delays):3d}/{FRAMES}  median {statistics.median(delays):6.2f} ms"
+          f"  p95 {delays[int(len(delays) * 0.95) - 1]:6.2f} ms  max {delays[-1]:6.2f} ms")
+
+
+def polling(toSleep):
+    def consume(radio):
+        start = time.monotonic()
+        while not radio.receiveDone():
+            time.sleep(toSleep)
+            if time.monotonic() - start > 0.2:
+                return None
+        data = bytes(radio.DATA)
+        radio.receiveBegin()
+        return data
+    return consume
+
+
+def blocking(radio):
+    frame = radio.receive(timeout=0.2)
+    return frame.data if frame is not None else None
+
+
+def main():
+    radio = RFM69.RFM69(RF69_915MHZ, 1, 0, isRFM69HW=True)
+    dev = RFM69sim.devices[(radio.spiBus, radio.spiDevice)]
+    run("poll TOSLEEP=0.01", radio, dev, polling(0.01))
+    run("poll TOSLEEP=0.064", radio, dev, polling(0.064))
+    run("receive(timeout)", radio, dev, blocking)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+# Back-to-back fragments at 250 kbps into a slow consumer: frames delivered and
+# dropped for a single-slot receiver versus the bounded RX queue.
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+
+BURST = 40
+CONSUMER_DELAY = 0.005  # per-frame processing time in the application
+
+
+def run(name, spiDevice, **kwargs):
+    radio = RFM69.RFM69(RF69_915MHZ, 1, 0, isRFM69HW=True, spiDevice=spiDevice, **kwargs)
+    dev = RFM69sim.devices[(radio.spiBus, radio.spiDevice)]
+    radio.writeRegs(REG_BITRATEMSB, [RF_BITRATEMSB_250000, RF_BITRATELSB_250000])
+    radio.receiveBegin()
+    frameTime = dev.airtime(64)
+
+    def sender():
+        for seq in range(BURST):
+            time.sleep(frameTime)
+            dev.inject(bytes([seq]) + bytes(60))
+
+    thread = threading.Thread(target=sender)
+    thread.start()
+    received = []
+    deadline = time.monotonic() + BURST * frameTime + 1.0
+    while time.monotonic() < deadline:
+        frame = radio.receive(timeout=0.05)
+        if frame is None:
+            if not thread.is_alive():
+                break
+            continue
+        received.append(frame.data[0])
+        time.sleep(CONSUMER_DELAY)
+    thread.join()
+    print(f"{name:<28} delivered {len(received):3d}/{BURST}  rxDropped {radio.rxDropped:3d}")
+
+
+def main():
+    run("single slot (size 1)", 0, rxQueueSize=1, rxOverflow=RFM69.RX_OVERFLOW_DROP_OLDEST)
+    run("queue 16, drop oldest", 1, rxQueueSize=16, rxOverflow=RFM69.RX_OVERFLOW_DROP_OLDEST)
+    run("queue 16, drop newest", 2, rxQueueSize=16, rxOverflow=RFM69.RX_OVERFLOW_DROP_NEWEST)
+    run("queue 64", 3, rxQueueSize=64)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+# RSSI scanner on a simulated RF medium. Three emitters share the 433 MHz ISM band: a
+# strong one keying up 80% of the time on 433.45 MHz, a weaker one at 30% on 434.05 MHz
+# and a distant one at 50% on 434.55 MHz. One radio sweeps 433.05-434.75 MHz in 100 kHz
+# steps every 10 ms for a second, then reports sweep time per channel, occupancy and the quietest channels. A
+# second run spreads the sweeps over the idle gaps of a link receiving a frame every
+# 20 ms, and compares the link's frame latency and losses with and without scanning. The
+# emitters broadcast, so a frame the scanner let through to the link would be received:
+# the run asserts that none is, also with the scanner dwelling long enough on the strong
+# emitter's channel to catch whole frames there.
+
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+from RFM69medium import Medium
+from RFM69profiles import PROFILES
+from RFM69scanner import Scanner, channels
+
+PROFILE = PROFILES["55k5"]
+HOME = 433150000
+# (position, frequency, fraction of the time on air)
+EMITTERS = [((50, 0), 433450000, 0.8), ((300, 0), 434050000, 0.3), ((3000, 0), 434550000, 0.5)]
+SWEEPS = 100
+# between sweeps, so they sample the emitters at independent moments
+SWEEP_GAP_S = 0.01
+LINK_FRAMES = 100
+
+
+def node(medium, position, nodeID, freq = HOME):
+    radio = RFM69.RFM69(RF69_433MHZ, nodeID, 0, isRFM69HW=True, backend=RFM69sim.SimBackend(medium, position))
+    radio.setProfile(PROFILE)
+    radio.setFrequency(freq)
+    radio.setOutputPower(20)
+    return radio
+
+
+def emit(radio, duty, done):
+    rng = random.Random(radio.address)
+    airtime = PROFILE.airtime(60)
+    while not done.is_set():
+        radio.send(RF69_BROADCAST_ADDR, bytes(60))
+        time.sleep(rng.expovariate(duty / ((1 - duty) * airtime)))
+
+
+def link(tx, rx, scanner, budget):
+    latencies = []
+    for i in range(LINK_FRAMES):
+        sentAt = time.monotonic()
+        tx.send(rx.address, bytes(20))
+        frame = rx.receive(timeout = 0.015)
+        assert frame is None or frame.senderID == tx.address, f"a frame from {frame.senderID} on another channel reached the link"
+        if frame is not None:
+            latencies.append(frame.timestamp - sentAt)
+        if scanner is not None:
+            scanner.scan(budget)
+        time.sleep(max(0.0, sentAt + 0.02 - time.monotonic()))
+    return latencies
+
+
+# Dwell on the strong emitter's channel for longer than a frame until one has been caught
+# there; it must be cleared by the scan, not drained into the link's queue
+def foreignFrames(rx):
+    while rx.receive(timeout = 0) is not None:
+        pass
+    scanner = Scanner(rx, [EMITTERS[0][1]], settle = 3 * PROFILE.airtime(60))
+    for i in range(50):
+        scanner.scan()
+        if scanner.discarded:
+            break
+    assert scanner.discarded, "no frame was caught on the scanned channel"
+    frame = rx.receive(timeout = 0.05)
+    assert frame is None, f"a frame from {frame.senderID} caught on a scanned channel reached the link"
+    print(f"frames caught on a scanned channel: {scanner.discarded} cleared, none queued")
+
+
+def main():
+    medium = Medium()
+    done = threading.Event()
+    emitters = []
+    for i, (position, freq, duty) in enumerate(EMITTERS):
+        radio = node(medium, position, 10 + i, freq)
+        radio.csmaThreshold = 0
+        emitters.append(threading.Thread(target=emit, args=(radio, duty, done)))
+    for thread in emitters:
+        thread.start()
+
+    rx = node(medium, (0, 0), 2)
+    rx.receiveBegin()
+    scanner = Scanner(rx, channels(433050000, 434750000, 100000))
+    elapsed = 0.0
+    for i in range(SWEEPS):
+        start = time.monotonic()
+        scanner.scan()
+        elapsed += time.monotonic() - start
+        time.sleep(SWEEP_GAP_S)
+    print(f"{SWEEPS} sweeps of {len(scanner.freqs)} channels, {elapsed / SWEEPS * 1000:.2f} ms per sweep,"
+          f" {statistics.mean(c['sweepTime'] for c in scanner.report()) * 1e6:.0f} us per channel")
+    for c in scanner.report():
+        print(f"  {c['freq'] / 1e6:8.3f} MHz  occupancy {c['occupancy'] * 100:5.1f}%"
+              f"  mean {c['meanRssi']:6.1f} dBm  peak {c['peakRssi']:4d} dBm")
+    print("quietest:", ", ".join(f"{f / 1e6:.3f}" for f in scanner.recommend(3)), "MHz")
+    foreignFrames(rx)
+
+    tx = node(medium, (100, 0), 1)
+    for name, budget in [("link alone", None), ("scan 2 ms per gap", 0.002)]:
+        latencies = link(tx, rx, scanner if budget is not None else None, budget)
+        print(f"{name:<18} received {len(latencies):3d}/{LINK_FRAMES}"
+              f"  latency p50 {statistics.median(latencies) * 1000:5.2f} ms  max {max(latencies) * 1000:5.2f} ms"
+              f"  frames discarded by the scanner {scanner.discarded if budget is not None else 0}")
+    done.set()
+    for thread in emitters:
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+# Counts SPI transactions per send() with and without the shadow register cache,
+# against a simulated RFM69.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+
+FRAMES = 100
+
+
+def run(shadowRegs, spiDevice):
+    radio = RFM69.RFM69(RF69_915MHZ, 1, 0, isRFM69HW=True, spiDevice=spiDevice, shadowRegs=shadowRegs)
+    dev = RFM69sim.devices[(radio.spiBus, radio.spiDevice)]
+    radio.receiveBegin()
+    payload = bytes(range(60))
+    dev.reset_counters()
+    for i in range(FRAMES):
+        radio.send(2, list(payload))
+    perSend = dev.transactions / float(FRAMES)
+    print(f"shadowRegs={str(shadowRegs):<5}  {perSend:5.1f} SPI transactions per send()"
+          f"  {dev.modelled_time() / FRAMES * 1000:5.2f} ms modelled bus time")
+    if shadowRegs:
+        print(f"verifyShadow mismatches: {radio.verifyShadow()}")
+
+
+def main():
+    run(False, 0)
+    run(True, 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+# Time from power-up to the first received frame on both radios of a TwinRF69, with a
+# peer beaconing at 250 kbps on each band: the setup_radios sequence (100 ms reset sleeps
+# per radio, register dump, RC calibration, temperature, then the profile) one radio after
+# the other, versus startRadios() resetting both together and writing the profile with
+# the rest of CONFIG. The simulated chips take 5 ms to answer SPI after a reset.
+
+import contextlib
+import io
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+from RFM69profiles import PROFILES
+
+RUNS = 5
+PROFILE = PROFILES["250k"]
+# (band, frequency, intPin, rstPin, spiDevice) of the HAT's two radios
+RADIOS = [(RF69_433MHZ, 433000000, 16, 15, 0), (RF69_915MHZ, 915000000, 18, 22, 1)]
+
+
+def legacy():
+    radios = []
+    for band, freq, intPin, rstPin, spiDevice in RADIOS:
+        radio = RFM69.RFM69(band, 1, 0, isRFM69HW=True, intPin=intPin, rstPin=rstPin, spiDevice=spiDevice)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for result in radio.readAllRegs():
+                print(result)
+            radio.rcCalibration()
+            radio.setHighPower(True)
+            radio.setPowerLevel(31)
+            print(radio.readTemperature(0))
+        radio.promiscuous(True)
+        radio.setFrequency(freq)
+        radio.setProfile(PROFILE)
+        radio.receiveBegin()
+        radios.append(radio)
+    return radios
+
+
+def fast():
+    radios = [RFM69.RFM69(band, 1, 0, isRFM69HW=True, intPin=intPin, rstPin=rstPin, spiDevice=spiDevice, init=False)
+              for band, freq, intPin, rstPin, spiDevice in RADIOS]
+    RFM69.startRadios(radios, PROFILE)
+    for radio, (band, freq, intPin, rstPin, spiDevice) in zip(radios, RADIOS):
+        radio.setPowerLevel(31)
+        radio.promiscuous(True)
+        radio.setFrequency(freq)
+        radio.receiveBegin()
+    return radios
+
+
+def measure(setup):
+    start = time.monotonic()
+    radios = setup()
+    ready = time.monotonic() - start
+    while any(radio.timeToFirstFrame is None for radio in radios):
+        if time.monotonic() - start > 2.0:
+            raise RuntimeError("no frame within 2 s")
+        time.sleep(0.0005)
+    firstFrame = max(radio.startedAt + radio.timeToFirstFrame for radio in radios) - start
+    return ready, firstFrame
+
+
+def main():
+    devices = []
+    for band, freq, intPin, rstPin, spiDevice in RADIOS:
+        dev = RFM69sim.devices[(0, spiDevice)] = RFM69sim.SimRFM69(rstPin=rstPin)
+        dev.realtime = True
+        devices.append(dev)
+
+    # one beacon per band, on a bus of its own
+    beacons = []
+    for i, dev in enumerate(devices):
+        beacon = RFM69.RFM69(RADIOS[i][0], 2, 0, isRFM69HW=True, intPin=30 + i, rstPin=40 + i, spiBus=1, spiDevice=i)
+        beacon.setProfile(PROFILE)
+        beaconDev = RFM69sim.devices[(1, i)]
+        beaconDev.realtime = True
+        RFM69sim.link(beaconDev, dev)
+        beacons.append(beacon)
+    done = threading.Event()
+
+    def beaconLoop(beacon):
+        while not done.is_set():
+            beacon.send(1, bytes(20))
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=beaconLoop, args=(beacon,)) for beacon in beacons]
+    for thread in threads:
+        thread.start()
+    try:
+        for name, setup in [("setup_radios x2", legacy), ("startRadios", fast)]:
+            results = [measure(setup) for run in range(RUNS)]
+            print(f"{name:<16} configured in {statistics.median(r[0] for r in results) * 1000:7.1f} ms"
+                  f"  first frame on both radios after {statistics.median(r[1] for r in results) * 1000:7.1f} ms"
+                  f"  (median of {RUNS})")
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+# Per-frame telemetry on a simulated RF medium: a sender with a +3 kHz crystal error
+# sends to a receiver at several distances. Compares Frame.rssi with the level the medium
+# delivered, Frame.fei/afc with the offset (with and without AfcAutoOn), and
+# Frame.timestamp with the end of the frame on air. Also counts the receiver's SPI
+# transactions per frame, all of it included.
+
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+from RFM69medium import Medium
+from RFM69profiles import PROFILES
+
+FRAMES = 50
+PROFILE = PROFILES["55k5"]
+OFFSET_HZ = 3000.0
+
+
+def node(medium, position, nodeID):
+    radio = RFM69.RFM69(RF69_433MHZ, nodeID, 0, isRFM69HW=True, backend=RFM69sim.SimBackend(medium, position))
+    radio.setFrequency(433000000)
+    radio.setProfile(PROFILE)
+    radio.setOutputPower(20)
+    return radio
+
+
+def run(name, medium, tx, rx):
+    txDev, rxDev = tx.backend.devices[(0, 0)], rx.backend.devices[(0, 0)]
+    frames, ends, levels = [], [], []
+    rx.receiveBegin()
+    rxDev.reset_counters()
+    for i in range(FRAMES):
+        tx.send(2, bytes(20))
+        transmission = medium.history[-1]
+        ends.append(transmission.end)
+        levels.append(medium.rssi(transmission, rxDev))
+        frame = rx.receive(timeout = 0.1)
+        if frame is not None:
+            frames.append((frame, i))
+    transactions = rxDev.transactions
+    if not frames:
+        print(f"{name:<24} nothing received")
+        return
+    rssiErr = [frame.rssi - levels[i] for frame, i in frames]
+    latency = [(frame.timestamp - ends[i]) / medium.timeScale for frame, i in frames]
+    print(f"{name:<24} {len(frames):2d}/{FRAMES}  RSSI {statistics.mean(frame.rssi for frame, i in frames):6.1f} dBm"
+          f" (err {statistics.mean(rssiErr):+4.1f})  FEI {statistics.mean(frame.fei for frame, i in frames):+7.0f} Hz"
+          f"  AFC {statistics.mean(frame.afc for frame, i in frames):+7.0f} Hz  band {frames[0][0].band}"
+          f"  frame end -> IRQ entry {statistics.median(latency) * 1000:5.2f} ms"
+          f"  {transactions / float(len(frames)):4.1f} SPI transactions/frame")
+
+
+def main():
+    medium = Medium()
+    tx, rx = node(medium, (0, 0), 1), node(medium, (100, 0), 2)
+    tx.backend.devices[(0, 0)].freqError = OFFSET_HZ
+    print(f"{FRAMES} x 20-byte frames at {PROFILE.bitrate / 1000:.1f} kbps, sender {OFFSET_HZ:+.0f} Hz off")
+    for distance in (100, 1000, 4000):
+        medium.move(rx.backend.devices[(0, 0)], (distance, 0))
+        run(f"{distance} m", medium, tx, rx)
+    rx.writeReg(REG_AFCFEI, RF_AFCFEI_AFCAUTO_ON | RF_AFCFEI_AFCAUTOCLEAR_ON)
+    medium.move(rx.backend.devices[(0, 0)], (100, 0))
+    run("100 m, AfcAutoOn", medium, tx, rx)
+
+
+if __name__ == "__main__":
+    main()
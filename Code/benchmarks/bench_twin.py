@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# Full duplex through TwinRadio on the simulated HAT: the local node streams frames out
+# on 433 MHz while a peer streams frames in on 915 MHz, both at 250 kbps and both at
+# once. Reports the throughput of each direction, per-radio utilisation and how long
+# either radio waited for the shared SPI bus.
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+from RFM69profiles import PROFILES
+from RFM69twin import TwinRadio
+
+FRAMES = 300
+PAYLOAD = bytes(60)
+PROFILE = PROFILES["250k"]
+
+
+def main():
+    local433 = RFM69.RFM69(RF69_433MHZ, 1, 0, intPin=16, spiBus=0, spiDevice=0)
+    local915 = RFM69.RFM69(RF69_915MHZ, 1, 0, intPin=18, spiBus=0, spiDevice=1)
+    peer433 = RFM69.RFM69(RF69_433MHZ, 2, 0, intPin=30, spiBus=1, spiDevice=0)
+    peer915 = RFM69.RFM69(RF69_915MHZ, 2, 0, intPin=31, spiBus=1, spiDevice=1)
+    for radio in (local433, local915, peer433, peer915):
+        radio.setProfile(PROFILE)
+        RFM69sim.devices[(radio.spiBus, radio.spiDevice)].realtime = True
+    RFM69sim.link(RFM69sim.devices[(0, 0)], RFM69sim.devices[(1, 0)])
+    RFM69sim.link(RFM69sim.devices[(0, 1)], RFM69sim.devices[(1, 1)])
+
+    twin = TwinRadio([local433, local915])
+    peer433.receiveBegin()
+    received433 = []
+
+    def peerReceive():
+        while len(received433) < FRAMES:
+            frame = peer433.receive(timeout = 1.0)
+            if frame is None:
+                return
+            received433.append(frame)
+
+    def peerSend():
+        for i in range(FRAMES):
+            peer915.send(1, PAYLOAD)
+
+    start = time.monotonic()
+    threads = [threading.Thread(target = fn) for fn in (peerReceive, peerSend)]
+    for thread in threads:
+        thread.start()
+    futures = [twin.send(RF69_433MHZ, 2, PAYLOAD) for i in range(FRAMES)]
+    received915 = 0
+    while received915 < FRAMES:
+        if twin.receive(timeout = 1.0) is None:
+            break
+        received915 += 1
+    for future in futures:
+        future.result()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    print(f"433 MHz out: {len(received433)}/{FRAMES} frames  915 MHz in: {received915}/{FRAMES} frames"
+          f"  in {elapsed:.2f} s  ({(len(received433) + received915) * len(PAYLOAD) * 8 / elapsed / 1000:.1f} kbps combined)")
+    for band, stats in twin.stats().items():
+        print(f"  band {band}: tx {stats['txFrames']:4d}  rx {stats['rxFrames']:4d}"
+              f"  tx busy {stats['txUtilisation'] * 100:5.1f}%  SPI busy {stats['spiUtilisation'] * 100:5.1f}%"
+              f"  {stats['spiTransfers']:5d} transfers, {stats['spiContended']:4d} waited {stats['spiWait'] * 1000:5.1f} ms for the bus")
+    twin.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+# Compares the legacy PACKETSENT busy-wait with the DIO0/Event TX completion path
+# for a 66-byte frame at 4.8 kbps on a simulated RFM69 in real time, and checks that a
+# DIO0 edge other than PacketSent does not end a send.
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import RFM69sim
+
+RFM69sim.install()
+
+import RFM69
+from RFM69registers import *
+
+FRAMES = 5
+
+
+def legacySendFrame(radio, payload):
+    # the pre-event sendFrame: spin on IRQFLAGS2 for the whole airtime
+    radio.setMode(RF69_MODE_STANDBY)
+    radio.spi.xfer2([REG_FIFO | 0x80, len(payload) + 3, 2, radio.address, 0] + list(payload))
+    radio.setMode(RF69_MODE_TX)
+    while (radio.readReg(REG_IRQFLAGS2) & RF_IRQFLAGS2_PACKETSENT) == 0x00:
+        pass
+    radio.setMode(RF69_MODE_RX)
+
+
+def measure(name, radio, dev, tx):
+    wall = cpu = 0.0
+    dev.reset_counters()
+    for i in range(FRAMES):
+        w, c = time.perf_counter(), time.process_time()
+        tx()
+        wall += time.perf_counter() - w
+        cpu += time.process_time() - c
+    print(f"{name:<12} wall {wall / FRAMES * 1000:6.1f} ms  cpu {cpu / FRAMES * 1000:6.1f} ms"
+          f"  {dev.transactions / float(FRAMES):7.1f} SPI xfers per frame")
+
+
+def main():
+    radio = RFM69.RFM69(RF69_915MHZ, 1, 0, isRFM69HW=True)
+    dev = RFM69sim.devices[(radio.spiBus, radio.spiDevice)]
+    dev.realtime = True
+    print(f"airtime of a 66-byte frame at {dev.bitrate():.0f} bps: {dev.airtime(66) * 1000:.1f} ms")
+
+    payload = list(bytes(63))
+    measure("busy-wait", radio, dev, lambda: legacySendFrame(radio, payload))
+    measure("DIO0 event", radio, dev, lambda: radio.sendFrame(2, payload, False, False))
+    print(f"last txLatency {radio.txLatency * 1000:.1f} ms, txTimeouts {radio.txTimeouts}")
+
+    # an edge raised mid-frame, e.g. a PayloadReady queued before the switch to TX, must
+    # not end the wait early
+    stray = threading.Timer(dev.airtime(66) / 4, dev.raise_dio0)
+    stray.start()
+    radio.sendFrame(2, payload, False, False)
+    stray.join()
+    assert radio.txStrayIrqs == 1 and radio.txLatency >= dev.airtime(66) * 0.9, (radio.txStrayIrqs, radio.txLatency)
+    print(f"stray DIO0 edge a quarter into the frame: ignored, txLatency {radio.txLatency * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
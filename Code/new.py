@@ -25,9 +25,11 @@ import RPi.GPIO as GPIO
 
 import RFM69
 from RFM69registers import *
+from RFM69profiles import PROFILES
+from RFM69dutycycle import schedulerFor
+from TwinRF69_tx_rx_radios import CHUNK_SIZE, DUTY_CYCLE_BANDS, FREQUENCY0, FREQUENCY1, MODULE0, MODULE1, REGION
 
-# ---- User-configurable constants (match TwinRF69_test.py style) ----
-REGION = 1            # 1 => 433/915; 2 => 433/868
+# ---- User-configurable constants (match TwinRF69_test.py style; REGION is set in TwinRF69_tx_rx_radios.py) ----
 NODE_ID = 1           # set to 1 or 2 to pick TX/RX roles automatically
 OTHERNODE = 2
 NETWORK_ID = 0
@@ -95,13 +97,11 @@ def send_binary_over_radios(data_bytes, chunk_size, radio_tx):
             hdr = struct.pack('!H H', msgid, seq)
             frame = hdr + c
             # radio.send accepts list-of-int in this repo; pass list(frame)
-            radio_tx.send(OTHERNODE, list(frame))
-            time.sleep(0.06)
+            schedulerFor(radio_tx, DUTY_CYCLE_BANDS).send(OTHERNODE, list(frame))
         # send END marker with total and original length
         hdr = struct.pack('!H H', msgid, 0xFFFF)
         meta = struct.pack('!H H', total, len(data_bytes) if len(data_bytes) < 0xFFFF else 0xFFFF)
-        radio_tx.send(OTHERNODE, list(hdr + meta))
-        time.sleep(0.06)
+        schedulerFor(radio_tx, DUTY_CYCLE_BANDS).send(OTHERNODE, list(hdr + meta))
     except KeyboardInterrupt:
         pass
     except Exception as e:
@@ -267,32 +267,22 @@ def setup_radios(MODULE, FREQUENCY, NODE_ID, NETWORK_ID, INT_PIN, RST_PIN, SPI_B
     radio.setHighPower(isHighPower)
     radio.setPowerLevel(31)
     radio.setFrequency(FREQUENCY)
-    radio.writeReg(REG_BITRATEMSB, RF_BITRATEMSB_250000)
-    radio.writeReg(REG_BITRATELSB, RF_BITRATELSB_250000)
-    radio.writeReg(REG_FDEVMSB, RF_FDEVMSB_50000)
-    radio.writeReg(REG_FDEVLSB, RF_FDEVLSB_50000)
+    radio.setProfile(PROFILES["250k"])
     return radio
 
 def main():
-    global REGION, NODE_ID, OTHERNODE, NETWORK_ID, packet_size
+    global NODE_ID, OTHERNODE, NETWORK_ID, packet_size
 
     if (REGION == 1):
         print("Entering 433MHz and 915MHz mode")
-        MODULE1 = RF69_915MHZ
-        FREQUENCY1 = 915000000
     elif (REGION == 2):
         print("Entering 433MHz and 868MHz mode")
-        MODULE1 = RF69_868MHZ
-        FREQUENCY1 = 868000000
     else:
         raise Exception("Region not set")
 
-    MODULE0 = RF69_433MHZ
-    FREQUENCY0 = 433000000
-
     OUTPUT_FILE = 'received_file.bin'
     file_path = 'logo.png'
-    chunk_size = 60
+    chunk_size = CHUNK_SIZE  # same 4-byte MSGID/SEQ header as send_packet()
 
     # Setup GPIO like original
     GPIO.setmode(GPIO.BOARD)